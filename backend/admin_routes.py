@@ -1,16 +1,18 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, HTTPException, Query, Request, UploadFile, File, Form
 from pydantic import BaseModel
 from typing import Optional
 from models import ProductCreate
 import os
-import uuid
 from pathlib import Path
-import shutil
+from functools import partial
 
 # Import security middleware
 from security_middleware import validate_upload_file, sanitize_string, sanitize_email, sanitize_phone
 
+from catalog_cache import bump_catalog_version
+from executor import run_blocking
+from http_cache import dumps_json, json_bytes_response
+
 from database_sqlite import SessionLocal
 from database_sqlite import (
     ProductCategory as DBProductCategory,
@@ -18,8 +20,14 @@ from database_sqlite import (
     Testimonial as DBTestimonial,
     Statistics as DBStatistics,
     QuoteRequest as DBQuoteRequest,
-    ContactRequest as DBContactRequest
+    ContactRequest as DBContactRequest,
+    NotificationOutbox as DBNotificationOutbox
 )
+from notification_outbox import outbox_dispatcher, requeue
+from image_variants import delete_variants, image_pipeline
+from upload_storage import references_for, store_upload, sync_references
+from static_files import file_response, stat_cache
+from upload_catalog import SORT_KEYS, forget_upload, list_uploads, register_upload, variants_done
 
 admin_router = APIRouter(prefix="/admin", tags=["admin"])
 
@@ -47,29 +55,34 @@ async def upload_image(file: UploadFile = File(...)):
     # Validate file
     await validate_upload_file(file)
     
-    # Generate unique filename
+    # Stream to disk under the content hash (off the event loop); identical
+    # bytes uploaded before resolve to the existing file
     file_extension = file.filename.split(".")[-1].lower()
-    unique_filename = f"{uuid.uuid4()}.{file_extension}"
-    file_path = UPLOAD_DIR / unique_filename
+    stored = await run_blocking(store_upload, file.file, file_extension)
+    await run_blocking(register_upload, stored.path)
     
-    # Save file
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    # Resized WebP/AVIF/JPEG variants are encoded in the background process pool
+    # and recorded in the upload catalog when they are done
+    if stored.created:
+        future = await run_blocking(image_pipeline.submit, stored.path)
+        if future is not None:
+            future.add_done_callback(partial(variants_done, stored.filename))
     
     # Return URL for accessing the image (via public API endpoint)
-    return {"success": True, "url": f"/api/uploads/{unique_filename}"}
+    return {"success": True, "url": stored.url, "duplicate": not stored.created}
 
-@admin_router.get("/uploads/{filename}")
-async def get_uploaded_file(filename: str):
-    """Serve uploaded files"""
+@admin_router.api_route("/uploads/{filename}", methods=["GET", "HEAD"])
+async def get_uploaded_file(filename: str, request: Request):
+    """Serve uploaded files (same validators and range support as /api/uploads)"""
     file_path = UPLOAD_DIR / filename
-    if not file_path.exists():
+    info = stat_cache.cached(file_path) or await run_blocking(stat_cache.stat, file_path)
+    if info is None:
         raise HTTPException(status_code=404, detail="File not found")
-    return FileResponse(file_path)
+    return file_response(request, info, {"Cache-Control": "public, max-age=31536000"})
 
 # Categories Management
 @admin_router.get("/categories")
-async def get_admin_categories():
+def get_admin_categories():
     """Get all categories for admin"""
     db = SessionLocal()
     try:
@@ -91,7 +104,7 @@ async def get_admin_categories():
         db.close()
 
 @admin_router.post("/categories")
-async def create_category(
+def create_category(
     title: str = Form(...),
     description: str = Form(...),
     products_count: int = Form(...),
@@ -109,14 +122,17 @@ async def create_category(
             slug=slug
         )
         db.add(category)
+        db.flush()  # Get the ID
+        sync_references(db, "category", category.id)
         db.commit()
         db.refresh(category)
+        bump_catalog_version()
         return {"success": True, "id": category.id}
     finally:
         db.close()
 
 @admin_router.put("/categories/{category_id}")
-async def update_category(
+def update_category(
     category_id: str,
     title: str = Form(...),
     description: str = Form(...),
@@ -137,14 +153,16 @@ async def update_category(
             category.image = image
         category.products_count = products_count
         category.slug = slug
+        sync_references(db, "category", category_id)
         
         db.commit()
+        bump_catalog_version()
         return {"success": True}
     finally:
         db.close()
 
 @admin_router.delete("/categories/{category_id}")
-async def delete_category(category_id: str):
+def delete_category(category_id: str):
     """Delete category"""
     db = SessionLocal()
     try:
@@ -153,14 +171,16 @@ async def delete_category(category_id: str):
             raise HTTPException(status_code=404, detail="Category not found")
         
         db.delete(category)
+        sync_references(db, "category", category_id)
         db.commit()
+        bump_catalog_version()
         return {"success": True}
     finally:
         db.close()
 
 # Portfolio Management
 @admin_router.get("/portfolio")
-async def get_admin_portfolio():
+def get_admin_portfolio():
     """Get all portfolio items for admin"""
     db = SessionLocal()
     try:
@@ -183,7 +203,7 @@ async def get_admin_portfolio():
         db.close()
 
 @admin_router.post("/portfolio")
-async def create_portfolio_item(
+def create_portfolio_item(
     company: str = Form(...),
     description: str = Form(...),
     category: str = Form(...),
@@ -203,6 +223,8 @@ async def create_portfolio_item(
             year=year
         )
         db.add(item)
+        db.flush()  # Get the ID
+        sync_references(db, "portfolio", item.id)
         db.commit()
         db.refresh(item)
         return {"success": True, "id": item.id}
@@ -210,7 +232,7 @@ async def create_portfolio_item(
         db.close()
 
 @admin_router.put("/portfolio/{item_id}")
-async def update_portfolio_item(
+def update_portfolio_item(
     item_id: str,
     company: str = Form(...),
     description: str = Form(...),
@@ -233,6 +255,7 @@ async def update_portfolio_item(
         item.category = category
         item.items_count = items_count
         item.year = year
+        sync_references(db, "portfolio", item_id)
         
         db.commit()
         return {"success": True}
@@ -240,7 +263,7 @@ async def update_portfolio_item(
         db.close()
 
 @admin_router.delete("/portfolio/{item_id}")
-async def delete_portfolio_item(item_id: str):
+def delete_portfolio_item(item_id: str):
     """Delete portfolio item"""
     db = SessionLocal()
     try:
@@ -249,6 +272,7 @@ async def delete_portfolio_item(item_id: str):
             raise HTTPException(status_code=404, detail="Portfolio item not found")
         
         db.delete(item)
+        sync_references(db, "portfolio", item_id)
         db.commit()
         return {"success": True}
     finally:
@@ -256,7 +280,7 @@ async def delete_portfolio_item(item_id: str):
 
 # Quote Requests Management
 @admin_router.get("/quote-requests")
-async def get_quote_requests_admin(status: Optional[str] = None):
+def get_quote_requests_admin(status: Optional[str] = None):
     """Get quote requests for admin with optional status filter"""
     db = SessionLocal()
     try:
@@ -288,7 +312,7 @@ async def get_quote_requests_admin(status: Optional[str] = None):
         db.close()
 
 @admin_router.put("/quote-requests/{request_id}/status")
-async def update_quote_status(request_id: str, status: str = Form(...)):
+def update_quote_status(request_id: str, status: str = Form(...)):
     """Update quote request status"""
     db = SessionLocal()
     try:
@@ -304,7 +328,7 @@ async def update_quote_status(request_id: str, status: str = Form(...)):
 
 # Contact Requests Management  
 @admin_router.get("/contact-requests")
-async def get_contact_requests_admin():
+def get_contact_requests_admin():
     """Get contact requests for admin"""
     db = SessionLocal()
     try:
@@ -327,9 +351,45 @@ async def get_contact_requests_admin():
     finally:
         db.close()
 
+# Notification outbox (failed Telegram/email deliveries)
+@admin_router.get("/notifications")
+def get_notifications_admin(status: Optional[str] = "dead"):
+    """Get outbox notifications, dead-lettered ones by default"""
+    db = SessionLocal()
+    try:
+        query = db.query(DBNotificationOutbox).order_by(DBNotificationOutbox.created_at.desc())
+        if status:
+            query = query.filter(DBNotificationOutbox.status == status)
+        
+        entries = query.limit(100).all()
+        return [
+            {
+                "id": entry.id,
+                "channel": entry.channel,
+                "kind": entry.kind,
+                "status": entry.status,
+                "attempts": entry.attempts,
+                "last_error": entry.last_error,
+                "next_attempt_at": entry.next_attempt_at,
+                "created_at": entry.created_at,
+                "sent_at": entry.sent_at
+            }
+            for entry in entries
+        ]
+    finally:
+        db.close()
+
+@admin_router.post("/notifications/{entry_id}/retry")
+def retry_notification(entry_id: str):
+    """Queue a dead-lettered notification for delivery again"""
+    if not requeue(entry_id):
+        raise HTTPException(status_code=404, detail="Dead-lettered notification not found")
+    outbox_dispatcher.wake()
+    return {"success": True}
+
 # Statistics Management
 @admin_router.get("/statistics")
-async def get_admin_statistics():
+def get_admin_statistics():
     """Get statistics for admin"""
     db = SessionLocal()
     try:
@@ -348,7 +408,7 @@ async def get_admin_statistics():
         db.close()
 
 @admin_router.put("/statistics")
-async def update_statistics(
+def update_statistics(
     years_in_business: int = Form(...),
     completed_orders: int = Form(...),
     happy_clients: int = Form(...),
@@ -380,19 +440,23 @@ async def update_statistics(
 
 # Product Management Routes
 @admin_router.get("/products")
-async def admin_get_products():
+def admin_get_products():
     """Get all products for admin"""
     from services_sqlite import ProductService
-    return ProductService.get_all_products()
+    # Encoded here, in the worker thread: FastAPI would run jsonable_encoder
+    # over the whole catalog on the event loop
+    return json_bytes_response(dumps_json(ProductService.get_all_products()), {})
 
 @admin_router.post("/products")
-async def admin_create_product(product: ProductCreate):
+def admin_create_product(product: ProductCreate):
     """Create new product"""
     from services_sqlite import ProductService
-    return ProductService.create_product(product)
+    result = ProductService.create_product(product)
+    bump_catalog_version()
+    return result
 
 @admin_router.get("/products/{product_id}")
-async def admin_get_product(product_id: str):
+def admin_get_product(product_id: str):
     """Get product by ID"""
     from services_sqlite import ProductService
     product = ProductService.get_product_by_id(product_id)
@@ -401,7 +465,7 @@ async def admin_get_product(product_id: str):
     return product
 
 @admin_router.put("/products/{product_id}")
-async def admin_update_product(product_id: str, product: ProductCreate):
+def admin_update_product(product_id: str, product: ProductCreate):
     """Update product"""
     db = SessionLocal()
     try:
@@ -468,7 +532,9 @@ async def admin_update_product(product_id: str, product: ProductCreate):
                 )
                 db.add(characteristic)
         
+        sync_references(db, "product", product_id)
         db.commit()
+        bump_catalog_version()
         print(f"Product updated successfully. Final images count: {db.query(SQLProductImage).filter(SQLProductImage.product_id == product_id).count()}")
         return {"success": True, "message": "Товар обновлен", "product_id": product_id}
     except HTTPException:
@@ -480,7 +546,7 @@ async def admin_update_product(product_id: str, product: ProductCreate):
         db.close()
 
 @admin_router.patch("/products/{product_id}")
-async def admin_patch_product(product_id: str, updates: dict):
+def admin_patch_product(product_id: str, updates: dict):
     """Partial update product (for bulk operations)"""
     db = SessionLocal()
     try:
@@ -505,6 +571,7 @@ async def admin_patch_product(product_id: str, updates: dict):
         existing_product.updated_at = datetime.now(timezone.utc)
         
         db.commit()
+        bump_catalog_version()
         
         return {"message": "Product updated successfully", "id": product_id}
     except HTTPException:
@@ -516,7 +583,7 @@ async def admin_patch_product(product_id: str, updates: dict):
         db.close()
 
 @admin_router.delete("/products/{product_id}")
-async def admin_delete_product(product_id: str):
+def admin_delete_product(product_id: str):
     """Delete product"""
     db = SessionLocal()
     try:
@@ -526,7 +593,9 @@ async def admin_delete_product(product_id: str):
             raise HTTPException(status_code=404, detail="Product not found")
         
         db.delete(product)
+        sync_references(db, "product", product_id)
         db.commit()
+        bump_catalog_version()
         return {"success": True, "message": "Товар удален"}
     finally:
         db.close()
@@ -534,7 +603,7 @@ async def admin_delete_product(product_id: str):
 
 # App Settings Management
 @admin_router.get("/settings")
-async def admin_get_settings():
+def admin_get_settings():
     """Get app settings"""
     try:
         from services_sqlite import SettingsService
@@ -544,7 +613,7 @@ async def admin_get_settings():
         raise HTTPException(status_code=500, detail=str(e))
 
 @admin_router.put("/settings")
-async def admin_update_settings(
+def admin_update_settings(
     hero_image: Optional[str] = Form(None),
     hero_mobile_image: Optional[str] = Form(None),
     about_image: Optional[str] = Form(None)
@@ -568,7 +637,7 @@ async def admin_update_settings(
 
 # Web Vitals Management
 @admin_router.get("/web-vitals")
-async def get_web_vitals_metrics():
+def get_web_vitals_metrics():
     """Get Web Vitals metrics for monitoring"""
     try:
         from database_sqlite import WebVitals, SessionLocal
@@ -604,40 +673,23 @@ async def get_web_vitals_metrics():
 
 # Uploaded Files Management
 @admin_router.get("/uploaded-files")
-async def get_uploaded_files():
-    """Get list of all uploaded files"""
+def get_uploaded_files(
+    page: int = Query(1, ge=1),
+    per_page: int = Query(100, ge=1, le=500),
+    sort: str = Query("modified", pattern=f"^({'|'.join(SORT_KEYS)})$"),
+    order: str = Query("desc", pattern="^(asc|desc)$")
+):
+    """Get a page of uploaded files from the upload catalog, with usage counts"""
+    db = SessionLocal()
     try:
-        import os
-        from pathlib import Path
-        
-        upload_dir = Path("uploads")
-        if not upload_dir.exists():
-            return {"files": []}
-        
-        files = []
-        MIN_FILE_SIZE = 1024  # 1KB minimum to filter out test files
-        for file_path in upload_dir.iterdir():
-            if file_path.is_file() and file_path.suffix.lower() in ['.jpg', '.jpeg', '.png', '.webp', '.gif']:
-                stat = file_path.stat()
-                # Only include files larger than 1KB
-                if stat.st_size >= MIN_FILE_SIZE:
-                    files.append({
-                        "filename": file_path.name,
-                        "size": stat.st_size,
-                        "modified": stat.st_mtime,
-                        "url": f"/api/uploads/{file_path.name}"
-                    })
-        
-        # Sort by modified time (newest first)
-        files.sort(key=lambda x: x['modified'], reverse=True)
-        
-        return {"files": files}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        total, total_size, files = list_uploads(db, page, per_page, sort, descending=order == "desc")
+        return {"files": files, "total": total, "total_size": total_size, "page": page, "per_page": per_page}
+    finally:
+        db.close()
 
 @admin_router.delete("/uploaded-files/{filename}")
-async def delete_uploaded_file(filename: str):
-    """Delete uploaded file"""
+def delete_uploaded_file(filename: str, force: bool = False):
+    """Delete uploaded file (refused while products, categories or settings use it, unless force)"""
     try:
         from pathlib import Path
         
@@ -649,7 +701,27 @@ async def delete_uploaded_file(filename: str):
         if not str(file_path.resolve()).startswith(str(Path("uploads").resolve())):
             raise HTTPException(status_code=403, detail="Access denied")
         
+        if not force:
+            db = SessionLocal()
+            try:
+                references = references_for(db, filename)
+            finally:
+                db.close()
+            if references:
+                raise HTTPException(status_code=409, detail={
+                    "message": "Файл используется",
+                    "references": [{"owner_type": owner_type, "owner_id": owner_id} for owner_type, owner_id in references]
+                })
+        
         file_path.unlink()
+        stat_cache.invalidate(file_path)
+        delete_variants(filename)
+        db = SessionLocal()
+        try:
+            forget_upload(db, filename)
+            db.commit()
+        finally:
+            db.close()
         return {"success": True, "message": "Файл удален"}
     except HTTPException:
         raise
@@ -659,7 +731,7 @@ async def delete_uploaded_file(filename: str):
 
 # Legal Documents Management
 @admin_router.get("/legal-documents")
-async def get_all_legal_documents():
+def get_all_legal_documents():
     """Get all legal documents"""
     try:
         from database_sqlite import LegalDocument, SessionLocal
@@ -684,7 +756,7 @@ async def get_all_legal_documents():
         raise HTTPException(status_code=500, detail=str(e))
 
 @admin_router.get("/legal-documents/{doc_type}")
-async def get_legal_document(doc_type: str):
+def get_legal_document(doc_type: str):
     """Get specific legal document"""
     try:
         from database_sqlite import LegalDocument, SessionLocal
@@ -711,7 +783,7 @@ async def get_legal_document(doc_type: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 @admin_router.put("/legal-documents/{doc_type}")
-async def update_legal_document(
+def update_legal_document(
     doc_type: str,
     title: str = Form(...),
     content: str = Form(...)
@@ -743,7 +815,7 @@ async def update_legal_document(
 
 # Web Vitals Monitoring
 @admin_router.get("/web-vitals")
-async def get_web_vitals_metrics():
+def get_web_vitals_metrics():
     """Get Web Vitals metrics for monitoring"""
     try:
         from database_sqlite import WebVitals
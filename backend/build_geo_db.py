@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Build the offline IP range database for geo_service
+Compacts a CIDR-to-region CSV (columns: network, country_code, region, city)
+into the binary file memory-mapped by the server (GEO_DB_PATH, default
+backend/geo_ranges.bin). Rerun after updating the CSV; the file is replaced
+atomically, workers pick it up on restart.
+
+Usage:
+    python build_geo_db.py ranges.csv [output.bin]
+"""
+import sys
+import time
+
+from geo_ranges import build_geo_database
+from geo_service import GEO_DB_PATH
+
+def build_geo_db(csv_path: str, output_path: str = GEO_DB_PATH):
+    """Compile csv_path into output_path"""
+    try:
+        print(f"=== Building geo range database from {csv_path} ===\n")
+        
+        started = time.perf_counter()
+        database = build_geo_database(csv_path, output_path)
+        elapsed = time.perf_counter() - started
+        
+        print(f"✅ Ranges: {len(database)} ({len(database.locations)} distinct locations)")
+        print(f"✅ Written to {output_path} in {elapsed:.2f}s")
+        
+    except Exception as e:
+        print(f"\n❌ Build failed: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    build_geo_db(*sys.argv[1:3])
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Generate responsive variants for existing uploads
+New admin uploads get their variants automatically; this backfills files
+uploaded before the pipeline existed or whose jobs were dropped on shutdown.
+Run from the backend directory (next to uploads/).
+
+Usage:
+    python build_image_variants.py [--force]
+"""
+import sys
+import time
+
+from image_variants import UPLOAD_DIR, VARIANT_SOURCE_EXTENSIONS, ImagePipeline, manifest_path
+from upload_catalog import record_variants
+
+def build_image_variants(force: bool = False):
+    """Queue every upload without a manifest (all of them with force) and wait"""
+    try:
+        print(f"=== Building image variants in {UPLOAD_DIR} ===\n")
+
+        sources = [
+            path for path in sorted(UPLOAD_DIR.iterdir())
+            if path.is_file() and path.suffix.lower() in VARIANT_SOURCE_EXTENSIONS
+            and (force or not manifest_path(path.name).exists())
+        ]
+        if not sources:
+            print("✅ All uploads already have variants")
+            return
+
+        pipeline = ImagePipeline()
+        started = time.perf_counter()
+        futures = [(path, pipeline.submit(path)) for path in sources]
+        failed = 0
+        for path, future in futures:
+            try:
+                manifest = future.result()
+                record_variants(path.name, manifest)
+                print(f"  {path.name}: {len(manifest['widths'])} widths x {len(manifest['formats'])} formats")
+            except Exception as e:
+                failed += 1
+                print(f"  ❌ {path.name}: {e}")
+        pipeline.close()
+
+        print(f"\n✅ Processed {len(sources) - failed}/{len(sources)} files in {time.perf_counter() - started:.1f}s")
+        if failed:
+            sys.exit(1)
+
+    except Exception as e:
+        print(f"\n❌ Build failed: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    build_image_variants(force="--force" in sys.argv[1:])
@@ -0,0 +1,160 @@
+"""
+In-process snapshot cache for public catalog endpoints
+Catalog data changes a few times a day but is read constantly, so the
+serialized product/category lists are kept in memory and rebuilt lazily
+after any admin write bumps the catalog version.
+"""
+import hashlib
+import threading
+import uuid
+from datetime import datetime
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from compression import compress, encoded_etag
+from http_cache import dumps_json
+
+# Upper bound on distinct snapshot keys (e.g. per-category listings), so
+# requests for arbitrary category ids cannot grow the cache without limit
+MAX_SNAPSHOTS = 256
+
+# Rebuilds are serialized per key through a small fixed set of striped locks
+# (reentrant: a compressed variant builds its plain JSON snapshot under its stripe)
+BUILD_LOCK_STRIPES = 16
+
+
+class CatalogCache:
+    """Snapshots of serialized catalog data keyed by catalog version"""
+
+    def __init__(self, max_snapshots: int = MAX_SNAPSHOTS):
+        self._version = 1
+        # Distinguishes versions of different processes/restarts in ETags
+        self._epoch = uuid.uuid4().hex[:8]
+        # When snapshots last went stale (process start counts: nothing older is known)
+        self._changed_at = datetime.utcnow()
+        self._max_snapshots = max_snapshots
+        self._snapshots: Dict[Hashable, Tuple[int, Any]] = {}
+        self._lock = threading.Lock()
+        self._build_locks = [threading.RLock() for _ in range(BUILD_LOCK_STRIPES)]
+
+    @property
+    def version(self) -> int:
+        """Current catalog version"""
+        return self._version
+
+    @property
+    def changed_at(self) -> datetime:
+        """UTC time of the last version bump, a Last-Modified for derived documents"""
+        return self._changed_at
+
+    def bump_version(self) -> int:
+        """
+        Invalidate all snapshots after a catalog write
+
+        Returns:
+            New catalog version
+        """
+        with self._lock:
+            self._version += 1
+            self._changed_at = datetime.utcnow()
+            self._snapshots.clear()
+            return self._version
+
+    def get_or_build(self, key: Hashable, builder: Callable[[], Any]) -> Any:
+        """
+        Return snapshot for key, building it if missing or stale
+
+        Args:
+            key: Snapshot key, e.g. ("products",) or ("category", category_id)
+            builder: Callable producing the serialized data
+
+        Returns:
+            Cached or freshly built data (shared between requests, do not mutate)
+        """
+        entry = self._snapshots.get(key)
+        if entry is not None and entry[0] == self._version:
+            return entry[1]
+
+        # Only one thread rebuilds a given key, the rest wait for its result
+        with self._build_locks[hash(key) % BUILD_LOCK_STRIPES]:
+            version = self._version
+            entry = self._snapshots.get(key)
+            if entry is not None and entry[0] == version:
+                return entry[1]
+
+            value = builder()
+
+            with self._lock:
+                # Drop the result if an admin write happened while building
+                if self._version == version and (
+                    key in self._snapshots or len(self._snapshots) < self._max_snapshots
+                ):
+                    self._snapshots[key] = (version, value)
+            return value
+
+    def etag(self, key: Hashable, version: Optional[int] = None) -> str:
+        """Strong ETag for the snapshot of key at the given (default: current) version"""
+        if version is None:
+            version = self._version
+        key_hash = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()[:12]
+        return f'"{self._epoch}-{version}-{key_hash}"'
+
+    def _get_body(self, kind: str, key: Hashable, builder: Callable[[], bytes]) -> Tuple[bytes, str]:
+        def build() -> Tuple[bytes, str]:
+            version = self._version
+            return builder(), self.etag(key, version)
+
+        return self.get_or_build((kind,) + tuple(key), build)
+
+    def _get_encoded(self, kind: str, key: Hashable, builder: Callable[[], bytes],
+                     encoding: Optional[str]) -> Tuple[bytes, str]:
+        if not encoding:
+            return self._get_body(kind, key, builder)
+
+        def build() -> Tuple[bytes, str]:
+            body, etag = self._get_body(kind, key, builder)
+            return compress(body, encoding, cached=True), encoded_etag(etag, encoding)
+
+        return self.get_or_build((encoding, kind) + tuple(key), build)
+
+    def get_json(self, key: Hashable, builder: Callable[[], Any]) -> Tuple[bytes, str]:
+        """
+        Return pre-encoded JSON body and its ETag for key
+
+        The body is encoded once per catalog version and served as-is
+        until the next admin write.
+        """
+        return self._get_body("json", key, lambda: dumps_json(builder()))
+
+    def get_encoded_json(self, key: Hashable, builder: Callable[[], Any],
+                         encoding: Optional[str]) -> Tuple[bytes, str]:
+        """
+        Return JSON body for key compressed with encoding, and its ETag
+
+        Compressed variants are cached next to the plain snapshot, so a large
+        payload is compressed once per catalog version and content coding.
+
+        Args:
+            key: Snapshot key
+            builder: Callable producing the serialized data
+            encoding: "br", "gzip" or None for the plain body
+        """
+        return self._get_encoded("json", key, lambda: dumps_json(builder()), encoding)
+
+    def get_encoded_body(self, key: Hashable, builder: Callable[[], bytes],
+                         encoding: Optional[str]) -> Tuple[bytes, str]:
+        """
+        Same as get_encoded_json for a document the builder already renders to bytes (sitemap.xml)
+
+        Args:
+            key: Snapshot key
+            builder: Callable producing the response body
+            encoding: "br", "gzip" or None for the plain body
+        """
+        return self._get_encoded("body", key, builder, encoding)
+
+catalog_cache = CatalogCache()
+
+
+def bump_catalog_version() -> int:
+    """Invalidate cached catalog snapshots (call after admin catalog writes)"""
+    return catalog_cache.bump_version()
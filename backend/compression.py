@@ -0,0 +1,203 @@
+"""
+Response compression (brotli/gzip) as pure ASGI middleware
+Negotiates Accept-Encoding and compresses text-like responses: catalog JSON,
+sitemap.xml, admin listings. Uploaded images are already compressed and are
+passed through untouched, as are responses that already carry a
+Content-Encoding (catalog snapshots are compressed once per catalog version
+in catalog_cache and served as-is).
+"""
+import gzip
+import os
+from typing import Iterable, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from executor import run_blocking
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is listed in requirements.txt
+    brotli = None
+
+# Bodies below this size are sent as-is (headers and framing cost more than is saved)
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+# Bodies from this size on are compressed in the worker thread pool instead
+# of on the event loop (smaller ones take less time than the thread hop)
+COMPRESSION_OFFLOAD_SIZE = int(os.getenv("COMPRESSION_OFFLOAD_SIZE", str(64 * 1024)))
+
+# Levels for per-request compression: fast, most of the ratio
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+# Levels for payloads compressed once and cached (catalog snapshots)
+GZIP_LEVEL_CACHED = 9
+BROTLI_QUALITY_CACHED = 9
+
+# Paths served without compression: JPEG/PNG/WebP uploads, and child
+# sitemaps, which are gzipped once per build and negotiated by the endpoint
+COMPRESSION_EXEMPT_PREFIXES = ('/api/uploads/', '/api/sitemaps/')
+
+COMPRESSIBLE_TYPES = (
+    'application/json',
+    'application/xml',
+    'application/javascript',
+    'image/svg+xml',
+)
+
+
+def supported_encodings() -> Tuple[str, ...]:
+    """Content codings this server can produce, in order of preference"""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def negotiate_encoding(accept_encoding: Optional[str], available: Optional[Iterable[str]] = None) -> Optional[str]:
+    """
+    Pick a content coding from an Accept-Encoding header
+
+    Args:
+        accept_encoding: Raw header value, e.g. "gzip, deflate, br;q=0.9"
+        available: Codings to choose from, best first (default: supported_encodings())
+
+    Returns:
+        "br" or "gzip", or None if the client accepts neither
+    """
+    if not accept_encoding:
+        return None
+
+    weights = {}
+    for item in accept_encoding.split(','):
+        coding, _, params = item.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        weight = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[coding] = weight
+
+    best, best_weight = None, 0.0
+    for coding in available or supported_encodings():
+        weight = weights.get(coding, weights.get('*', 0.0))
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+
+def compress(body: bytes, encoding: str, cached: bool = False) -> bytes:
+    """
+    Compress body with the given content coding
+
+    Args:
+        body: Raw response body
+        encoding: "br" or "gzip"
+        cached: Use the slower, denser levels for payloads compressed once and reused
+    """
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY_CACHED if cached else BROTLI_QUALITY)
+    if encoding == 'gzip':
+        # mtime=0 keeps the output identical for identical bodies
+        return gzip.compress(body, compresslevel=GZIP_LEVEL_CACHED if cached else GZIP_LEVEL, mtime=0)
+    raise ValueError(f"Unsupported content coding: {encoding}")
+
+
+def encoded_etag(etag: str, encoding: Optional[str]) -> str:
+    """ETag of the compressed variant (each content coding is its own representation)"""
+    if not encoding:
+        return etag
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def is_compressible(content_type: str) -> bool:
+    """Whether a media type benefits from compression"""
+    media_type = content_type.split(';', 1)[0].strip().lower()
+    return media_type.startswith('text/') or media_type in COMPRESSIBLE_TYPES or media_type.endswith('+json')
+
+
+def add_vary(headers: MutableHeaders, value: str = 'Accept-Encoding'):
+    """Append a token to Vary unless it is already listed"""
+    current = headers.get('vary')
+    if not current:
+        headers['Vary'] = value
+    elif value.lower() not in (token.strip().lower() for token in current.split(',')):
+        headers['Vary'] = f'{current}, {value}'
+
+
+class CompressionMiddleware:
+    """
+    Compress complete text-like responses according to Accept-Encoding
+
+    Streaming responses (more than one body chunk) are passed through as-is;
+    the API only streams uploaded files, which are exempt anyway. Bodies of
+    offload_size bytes or more are compressed via run_blocking so large
+    listings do not stall the event loop.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MIN_SIZE,
+                 exempt_prefixes: Iterable[str] = COMPRESSION_EXEMPT_PREFIXES,
+                 offload_size: int = COMPRESSION_OFFLOAD_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.offload_size = offload_size
+        self.exempt_prefixes = tuple(exempt_prefixes)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] == "HEAD" or scope["path"].startswith(self.exempt_prefixes):
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get('accept-encoding'))
+        start_message: Optional[Message] = None
+        passthrough = False
+
+        async def send_compressed(message: Message):
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                if 'content-encoding' in headers or not is_compressible(headers.get('content-type', '')):
+                    passthrough = True
+                    await send(message)
+                else:
+                    # Hold the start until the body shows whether it is worth compressing
+                    start_message = message
+                return
+
+            if message["type"] != "http.response.body":
+                # e.g. http.response.pathsend: nothing to compress, release the held start first
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            passthrough = True
+            if more_body or len(body) < self.minimum_size:
+                await send(start_message)
+                await send(message)
+                return
+
+            headers = MutableHeaders(raw=start_message["headers"])
+            add_vary(headers)
+            if encoding is not None:
+                if len(body) >= self.offload_size:
+                    body = await run_blocking(compress, body, encoding)
+                else:
+                    body = compress(body, encoding)
+                headers['Content-Encoding'] = encoding
+                headers['Content-Length'] = str(len(body))
+                etag = headers.get('etag')
+                if etag and not etag.startswith('W/'):
+                    headers['ETag'] = encoded_etag(etag, encoding)
+            await send(start_message)
+            await send({"type": "http.response.body", "body": body, "more_body": False})
+
+        await self.app(scope, receive, send_compressed)
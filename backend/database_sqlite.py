@@ -1,15 +1,86 @@
-from sqlalchemy import create_engine, Column, String, Integer, DateTime, Text, ForeignKey, Boolean, Float
+from sqlalchemy import create_engine, event, text, Column, Index, String, Integer, DateTime, Text, ForeignKey, Boolean, Float, UniqueConstraint
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from datetime import datetime
 import os
+import logging
+import re
 import uuid
 
+logger = logging.getLogger(__name__)
+
 # SQLite database setup
-DATABASE_URL = "sqlite:///./avik_uniform.db"
+DATABASE_URL = os.getenv("SQLITE_DATABASE_URL", "sqlite:///./avik_uniform.db")
 engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# PRAGMA profile applied to every new SQLite connection. WAL lets readers run
+# alongside a writer; an empty value leaves that PRAGMA at the SQLite default.
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "mmap_size": os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)),  # bytes
+    "cache_size": os.getenv("SQLITE_CACHE_SIZE", "-65536"),  # negative = KiB (64 MB)
+    "temp_store": os.getenv("SQLITE_TEMP_STORE", "MEMORY"),
+    "busy_timeout": os.getenv("SQLITE_BUSY_TIMEOUT", "5000"),  # ms
+}
+
+def apply_sqlite_pragmas(dbapi_connection, pragmas: dict = SQLITE_PRAGMAS):
+    """Run the PRAGMA profile on a raw DBAPI connection"""
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            value = str(value).strip()
+            if not value:
+                continue
+            if not re.fullmatch(r"-?\w+", value):
+                raise ValueError(f"Invalid value for PRAGMA {name}: {value!r}")
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+@event.listens_for(engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    apply_sqlite_pragmas(dbapi_connection)
+
+# Opt-in async engine (SQLAlchemy asyncio + aiosqlite) for endpoints that await
+# the database. The sync engine above stays for scripts and migrations.
+USE_ASYNC_DB = os.getenv("USE_ASYNC_DB", "false").lower() in ("1", "true", "yes")
+ASYNC_DATABASE_URL = os.getenv(
+    "SQLITE_ASYNC_DATABASE_URL",
+    DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1)
+)
+_async_engine = None
+_async_session_factory = None
+
+def get_async_engine():
+    """Async engine, created on first use so aiosqlite is only needed when enabled"""
+    global _async_engine
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import create_async_engine
+        _async_engine = create_async_engine(ASYNC_DATABASE_URL)
+        event.listen(_async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+    return _async_engine
+
+def AsyncSessionLocal():
+    """New AsyncSession (use as `async with AsyncSessionLocal() as db:`)"""
+    global _async_session_factory
+    if _async_session_factory is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker
+        _async_session_factory = async_sessionmaker(
+            bind=get_async_engine(), autoflush=False, expire_on_commit=False
+        )
+    return _async_session_factory()
+
+async def dispose_async_engine():
+    """Close pooled async connections (shutdown hook)"""
+    global _async_engine, _async_session_factory
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+        _async_session_factory = None
+
 Base = declarative_base()
 
 # SQLite Models
@@ -74,8 +145,8 @@ class QuoteRequest(Base):
     fabric = Column(String, nullable=False)
     branding = Column(String, nullable=False)
     estimated_price = Column(Integer, nullable=False)
-    status = Column(String, default="new")
-    created_at = Column(DateTime, default=datetime.utcnow)
+    status = Column(String, default="new", index=True)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 class ContactRequest(Base):
@@ -89,6 +160,59 @@ class ContactRequest(Base):
     company = Column(String)
     message = Column(Text)
     status = Column(String, default="new")
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class NotificationOutbox(Base):
+    """Telegram/email notification written together with the request row, sent by notification_outbox"""
+    __tablename__ = "notification_outbox"
+    __table_args__ = (
+        # Due-entry scan of the dispatcher
+        Index("ix_notification_outbox_status_next_attempt", "status", "next_attempt_at"),
+    )
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    channel = Column(String, nullable=False)  # "telegram" or "email"
+    kind = Column(String, nullable=False)  # quote_request, callback_request, consultation_request, contact_message, cart_order
+    payload = Column(Text, nullable=False)  # JSON
+    status = Column(String, default="pending")  # pending, sent, dead
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow)
+    last_error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime)
+
+class UploadReference(Base):
+    """Use of an uploaded file by a product, category, portfolio item or the settings, maintained by upload_storage"""
+    __tablename__ = "upload_references"
+    __table_args__ = (
+        UniqueConstraint("filename", "owner_type", "owner_id", name="uq_upload_references_file_owner"),
+        # Replacing the references of one owner on save
+        Index("ix_upload_references_owner", "owner_type", "owner_id"),
+    )
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    filename = Column(String, nullable=False, index=True)  # name in uploads/
+    owner_type = Column(String, nullable=False)  # product, category, portfolio, settings
+    owner_id = Column(String, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class UploadedFile(Base):
+    """Metadata of a file in uploads/, maintained by upload_catalog on upload and delete"""
+    __tablename__ = "uploaded_files"
+    __table_args__ = (
+        # Admin media library sort orders
+        Index("ix_uploaded_files_modified", "modified"),
+        Index("ix_uploaded_files_size", "size"),
+    )
+
+    filename = Column(String, primary_key=True)  # name in uploads/
+    size = Column(Integer, nullable=False)  # bytes
+    modified = Column(Float, nullable=False)  # mtime, Unix timestamp
+    width = Column(Integer)  # pixels; NULL if Pillow cannot read the file
+    height = Column(Integer)
+    content_hash = Column(String)  # SHA-256 hex of the content
+    variants = Column(Text)  # JSON manifest of image_variants, NULL until encoded
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -106,14 +230,14 @@ class WebVitals(Base):
     __tablename__ = "web_vitals"
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    name = Column(String, nullable=False)  # CLS, FID, FCP, LCP, TTFB
+    name = Column(String, nullable=False, index=True)  # CLS, FID, FCP, LCP, TTFB
     value = Column(Float, nullable=False)
     rating = Column(String)  # good, needs-improvement, poor
     delta = Column(Float)
     metric_id = Column(String)
     navigation_type = Column(String)
     page = Column(String)
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    timestamp = Column(DateTime, default=datetime.utcnow, index=True)
 
 class LegalDocument(Base):
     __tablename__ = "legal_documents"
@@ -128,9 +252,13 @@ class LegalDocument(Base):
 # Product Tables
 class SQLProduct(Base):
     __tablename__ = "products"
+    __table_args__ = (
+        # Sort key of keyset pagination (ProductService._page)
+        Index("ix_products_created_at_id", "created_at", "id"),
+    )
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    category_id = Column(String, ForeignKey("categories.id"), nullable=False)
+    category_id = Column(String, ForeignKey("categories.id"), nullable=False, index=True)
     name = Column(String, nullable=False)
     article = Column(String, unique=True, index=True)  # Артикул товара
     description = Column(Text, nullable=False)
@@ -142,23 +270,25 @@ class SQLProduct(Base):
     colors = Column(String)  # JSON string - простые названия цветов (deprecated, use color_images)
     color_images = Column(String)  # JSON string - массив объектов {color, image, preview}
     branding_options = Column(String)  # JSON string - массив опций нанесения/брендирования
-    is_available = Column(Boolean, default=True)  # В наличии
+    is_available = Column(Boolean, default=True, index=True)  # В наличии
     on_order = Column(Boolean, default=False)  # Под заказ
-    featured = Column(Boolean, default=False)  # Популярное
-    views_count = Column(Integer, default=0)  # Для аналитики популярности
+    featured = Column(Boolean, default=False, index=True)  # Популярное
+    views_count = Column(Integer, default=0, index=True)  # Для аналитики популярности
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
-    images = relationship("SQLProductImage", back_populates="product", cascade="all, delete-orphan")
-    characteristics = relationship("SQLProductCharacteristic", back_populates="product", cascade="all, delete-orphan")
+    images = relationship("SQLProductImage", back_populates="product", cascade="all, delete-orphan",
+                          order_by="SQLProductImage.order")
+    characteristics = relationship("SQLProductCharacteristic", back_populates="product", cascade="all, delete-orphan",
+                                   order_by="SQLProductCharacteristic.order")
     category = relationship("ProductCategory", foreign_keys=[category_id])
 
 class SQLProductImage(Base):
     __tablename__ = "product_images"
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    product_id = Column(String, ForeignKey("products.id"), nullable=False)
+    product_id = Column(String, ForeignKey("products.id"), nullable=False, index=True)
     image_url = Column(String, nullable=False)
     alt_text = Column(String)
     order = Column(Integer, default=1)
@@ -171,7 +301,7 @@ class SQLProductCharacteristic(Base):
     __tablename__ = "product_characteristics"
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    product_id = Column(String, ForeignKey("products.id"), nullable=False)
+    product_id = Column(String, ForeignKey("products.id"), nullable=False, index=True)
     name = Column(String, nullable=False)
     value = Column(String, nullable=False)
     order = Column(Integer, default=1)
@@ -180,6 +310,174 @@ class SQLProductCharacteristic(Base):
     # Relationships
     product = relationship("SQLProduct", back_populates="characteristics")
 
+# Full-text product search (SQLite FTS5)
+# products_fts is keyed on products.search_rowid and kept in sync by triggers,
+# so every write path (admin, import and migration scripts) updates the index.
+# products.rowid cannot be the key: products has a string primary key, and
+# VACUUM may renumber the rowids of such tables. search_rowid is a stored
+# INTEGER column (assigned by the insert trigger, not mapped on SQLProduct)
+# that keeps its value.
+# unicode61 folds case for Cyrillic as well as Latin; "ё" is stored as "е".
+PRODUCT_SEARCH_TABLE = "products_fts"
+PRODUCT_SEARCH_KEY = "search_rowid"
+PRODUCT_SEARCH_COLUMNS = ("name", "article", "short_description", "material", "characteristics")
+# bm25 column weights, same order as PRODUCT_SEARCH_COLUMNS
+PRODUCT_SEARCH_WEIGHTS = (10.0, 8.0, 2.0, 1.0, 1.0)
+
+def _search_text(expression: str) -> str:
+    return f"replace(replace(coalesce({expression}, ''), 'ё', 'е'), 'Ё', 'Е')"
+
+def _search_row_values(row: str) -> str:
+    characteristics = f"(SELECT group_concat(value, ' ') FROM product_characteristics WHERE product_id = {row}.id)"
+    return ", ".join([
+        f"{row}.{PRODUCT_SEARCH_KEY}",
+        _search_text(f"{row}.name"),
+        _search_text(f"{row}.article"),
+        _search_text(f"{row}.short_description"),
+        _search_text(f"{row}.material"),
+        _search_text(characteristics),
+    ])
+
+def _search_characteristics_update(product_id: str) -> str:
+    return f"""UPDATE products_fts SET characteristics = {_search_text(
+        f"(SELECT group_concat(value, ' ') FROM product_characteristics WHERE product_id = {product_id})"
+    )} WHERE rowid = (SELECT {PRODUCT_SEARCH_KEY} FROM products WHERE id = {product_id});"""
+
+PRODUCT_SEARCH_INSERT = f"INSERT INTO products_fts(rowid, {', '.join(PRODUCT_SEARCH_COLUMNS)})"
+
+PRODUCT_SEARCH_TRIGGERS = [
+    f"""CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+        UPDATE products SET {PRODUCT_SEARCH_KEY} = (
+            SELECT coalesce(max({PRODUCT_SEARCH_KEY}), 0) + 1 FROM products
+        ) WHERE rowid = new.rowid;
+        {PRODUCT_SEARCH_INSERT} SELECT {_search_row_values("products")} FROM products WHERE rowid = new.rowid;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS products_fts_au
+    AFTER UPDATE OF name, article, short_description, material ON products BEGIN
+        DELETE FROM products_fts WHERE rowid = old.{PRODUCT_SEARCH_KEY};
+        {PRODUCT_SEARCH_INSERT} VALUES ({_search_row_values("new")});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+        DELETE FROM products_fts WHERE rowid = old.{PRODUCT_SEARCH_KEY};
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS product_characteristics_fts_ai AFTER INSERT ON product_characteristics BEGIN
+        {_search_characteristics_update("new.product_id")}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS product_characteristics_fts_au AFTER UPDATE ON product_characteristics BEGIN
+        {_search_characteristics_update("old.product_id")}
+        {_search_characteristics_update("new.product_id")}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS product_characteristics_fts_ad AFTER DELETE ON product_characteristics BEGIN
+        {_search_characteristics_update("old.product_id")}
+    END""",
+]
+
+def _add_product_search_key(connection) -> bool:
+    """
+    Add products.search_rowid to a database that lacks it
+    
+    Existing products are numbered by their current rowid. An index built
+    before the column existed (keyed on rowid) is dropped with its triggers
+    so it is recreated on the new key.
+    
+    Returns:
+        True if the column was added
+    """
+    columns = {row[1] for row in connection.execute(text("PRAGMA table_info(products)"))}
+    if PRODUCT_SEARCH_KEY in columns:
+        return False
+    connection.execute(text(f"ALTER TABLE products ADD COLUMN {PRODUCT_SEARCH_KEY} INTEGER"))
+    connection.execute(text(f"UPDATE products SET {PRODUCT_SEARCH_KEY} = rowid"))
+    for (trigger,) in connection.execute(text(
+        "SELECT name FROM sqlite_master WHERE type = 'trigger' AND sql LIKE '%products_fts%'"
+    )).all():
+        connection.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+    connection.execute(text(f"DROP TABLE IF EXISTS {PRODUCT_SEARCH_TABLE}"))
+    return True
+
+def init_product_search_index(connection) -> bool:
+    """
+    Create the FTS5 product search index and its triggers if missing
+    
+    Safe to run repeatedly. A freshly created index is filled from the
+    existing products; databases from before products.search_rowid get the
+    column and a rebuilt index.
+    
+    Args:
+        connection: SQLAlchemy connection (inside a transaction)
+        
+    Returns:
+        False if this SQLite build has no FTS5 support
+    """
+    _add_product_search_key(connection)
+    connection.execute(text(
+        f"CREATE UNIQUE INDEX IF NOT EXISTS ix_products_{PRODUCT_SEARCH_KEY} ON products ({PRODUCT_SEARCH_KEY})"
+    ))
+    exists = connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {"name": PRODUCT_SEARCH_TABLE}
+    ).first() is not None
+    
+    try:
+        connection.execute(text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {PRODUCT_SEARCH_TABLE} USING fts5("
+            f"{', '.join(PRODUCT_SEARCH_COLUMNS)}, "
+            "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3 4')"
+        ))
+    except OperationalError as e:
+        logger.warning(f"FTS5 is not available, product search falls back to LIKE: {e}")
+        return False
+    
+    for trigger in PRODUCT_SEARCH_TRIGGERS:
+        connection.execute(text(trigger))
+    
+    if not exists:
+        connection.execute(text(f"{PRODUCT_SEARCH_INSERT} SELECT {_search_row_values('products')} FROM products"))
+    return True
+
+@event.listens_for(Base.metadata, "after_create")
+def _create_product_search_index(target, connection, **kw):
+    init_product_search_index(connection)
+
+@event.listens_for(Base.metadata, "before_drop")
+def _drop_product_search_index(target, connection, **kw):
+    connection.execute(text(f"DROP TABLE IF EXISTS {PRODUCT_SEARCH_TABLE}"))
+
+def ensure_indexes(bind=engine) -> dict:
+    """
+    Create indexes declared on the models that an existing database lacks
+
+    create_all() only creates indexes together with new tables, so databases
+    created before an index was declared get it from here.
+
+    Returns:
+        {index name: "created" | "exists" | error message}
+    """
+    from sqlalchemy import inspect
+
+    inspector = inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+    results = {}
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            # Unique indexes would reject writes of existing duplicates; they
+            # need a data check first and are left to dedicated migrations
+            if index.unique:
+                continue
+            if index.name in existing:
+                results[index.name] = "exists"
+                continue
+            try:
+                index.create(bind=bind, checkfirst=True)
+                results[index.name] = "created"
+            except OperationalError as e:
+                logger.error(f"Failed to create index {index.name}: {e}")
+                results[index.name] = str(e)
+    return results
+
 # Database session dependency
 def get_db():
     db = SessionLocal()
@@ -194,6 +492,7 @@ def init_sqlite_database():
     
     # Create all tables
     Base.metadata.create_all(bind=engine)
+    ensure_indexes()
     
     db = SessionLocal()
     try:
@@ -1,15 +1,194 @@
 import smtplib
 import os
+import logging
+import threading
+import time
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from typing import Optional
+from email.message import Message
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+SMTP_SERVER = os.getenv('SMTP_SERVER', 'smtp.yandex.ru')
+SMTP_PORT = int(os.getenv('SMTP_PORT', '587'))
+SMTP_STARTTLS = os.getenv('SMTP_STARTTLS', 'true').lower() not in ('0', 'false', 'no')
+SMTP_TIMEOUT = float(os.getenv('SMTP_TIMEOUT', '10'))  # seconds
+SMTP_POOL_SIZE = int(os.getenv('SMTP_POOL_SIZE', '2'))  # open sessions
+# A session idle longer than this is checked with NOOP before reuse
+SMTP_NOOP_AFTER = float(os.getenv('SMTP_NOOP_AFTER', '15'))  # seconds
+# A session idle longer than this is closed (servers drop idle clients after a few minutes)
+SMTP_MAX_IDLE = float(os.getenv('SMTP_MAX_IDLE', '120'))  # seconds
 
 class EmailDeliveryError(Exception):
     pass
 
+class SMTPConnectionPool:
+    """
+    Long-lived authenticated SMTP sessions shared between senders
+
+    A burst of notifications reuses open sessions instead of paying the
+    TCP/TLS handshake and login per message. Sessions are health-checked with
+    NOOP after being idle and replaced when the server has dropped them.
+    """
+
+    def __init__(
+        self,
+        host: str = SMTP_SERVER,
+        port: int = SMTP_PORT,
+        starttls: bool = SMTP_STARTTLS,
+        size: int = SMTP_POOL_SIZE,
+        timeout: float = SMTP_TIMEOUT,
+        noop_after: float = SMTP_NOOP_AFTER,
+        max_idle: float = SMTP_MAX_IDLE
+    ):
+        self.host = host
+        self.port = port
+        self.starttls = starttls
+        self.timeout = timeout
+        self.noop_after = noop_after
+        self.max_idle = max_idle
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle: List[tuple] = []  # (smtp, credentials, last used)
+        self._lock = threading.Lock()
+
+    def _connect(self, credentials: tuple) -> smtplib.SMTP:
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                server.starttls()
+            server.login(*credentials)
+        except Exception:
+            self._quit(server)
+            raise
+        return server
+
+    @staticmethod
+    def _quit(server: smtplib.SMTP):
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+    @staticmethod
+    def _is_alive(server: smtplib.SMTP) -> bool:
+        try:
+            return server.noop()[0] == 250
+        except Exception:
+            return False
+
+    def _checkout(self, credentials: tuple) -> smtplib.SMTP:
+        now = time.monotonic()
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                server, server_credentials, last_used = self._idle.pop()
+            idle = now - last_used
+            if server_credentials != credentials or idle > self.max_idle:
+                self._quit(server)
+            elif idle <= self.noop_after or self._is_alive(server):
+                return server
+            else:
+                server.close()
+        return self._connect(credentials)
+
+    @staticmethod
+    def _drop(server: Optional[smtplib.SMTP]) -> None:
+        if server is not None:
+            server.close()
+        return None
+
+    def _checkin(self, server: smtplib.SMTP, credentials: tuple):
+        with self._lock:
+            self._idle.append((server, credentials, time.monotonic()))
+
+    def send(self, message: Message, credentials: tuple):
+        """Send one message, reconnecting once if the pooled session was dropped"""
+        self.send_many([message], credentials, raise_errors=True)
+
+    def send_many(self, messages: List[Message], credentials: tuple, raise_errors: bool = False) -> List[Optional[Exception]]:
+        """
+        Send a batch of messages over one session
+
+        A dropped connection (or network error) is retried once per message on
+        a new session; other errors (e.g. a rejected recipient) only fail that
+        message.
+
+        Returns:
+            Per message: None if sent, otherwise the error
+        """
+        results: List[Optional[Exception]] = []
+        with self._slots:
+            server = None
+            try:
+                for message in messages:
+                    error = None
+                    for _ in range(2):
+                        try:
+                            if server is None:
+                                server = self._checkout(credentials)
+                            server.send_message(message)
+                            error = None
+                            break
+                        except smtplib.SMTPServerDisconnected as e:
+                            server, error = self._drop(server), e
+                        except smtplib.SMTPException as e:
+                            # Rejected by the server; the session itself is still usable
+                            error = e
+                            break
+                        except OSError as e:
+                            server, error = self._drop(server), e
+                    results.append(error)
+            except BaseException:
+                if server is not None:
+                    server.close()
+                raise
+            if server is not None:
+                self._checkin(server, credentials)
+        if raise_errors:
+            for error in results:
+                if error is not None:
+                    raise error
+        return results
+
+    def close(self):
+        """Close idle sessions (on shutdown)"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for server, _, _ in idle:
+            self._quit(server)
+
+
+smtp_pool = SMTPConnectionPool()
+
+def _credentials() -> Optional[tuple]:
+    sender_email = os.getenv('SENDER_EMAIL')
+    sender_password = os.getenv('EMAIL_PASSWORD')
+    if not sender_email or not sender_password:
+        return None
+    return sender_email, sender_password
+
+def build_message(to: str, subject: str, html_content: str, plain_text_content: Optional[str] = None) -> MIMEMultipart:
+    """Multipart message from the configured sender"""
+    msg = MIMEMultipart("alternative")
+    msg["Subject"] = subject
+    msg["From"] = os.getenv('SENDER_EMAIL', '')
+    msg["To"] = to
+
+    # Add HTML content
+    html_part = MIMEText(html_content, "html")
+    msg.attach(html_part)
+    
+    # Add plain text content if provided
+    if plain_text_content:
+        text_part = MIMEText(plain_text_content, "plain")
+        msg.attach(text_part)
+    return msg
+
 def send_email(to: str, subject: str, html_content: str, plain_text_content: Optional[str] = None):
     """
-    Send email via Yandex SMTP
+    Send email via Yandex SMTP (pooled session, see SMTPConnectionPool)
 
     Args:
         to: Recipient email address
@@ -17,36 +196,13 @@ def send_email(to: str, subject: str, html_content: str, plain_text_content: Opt
         html_content: HTML email content
         plain_text_content: Plain text email content (optional)
     """
-    smtp_server = "smtp.yandex.ru"
-    smtp_port = 587
-    sender_email = os.getenv('SENDER_EMAIL')
-    sender_password = os.getenv('EMAIL_PASSWORD')
-    
-    if not sender_email or not sender_password:
+    credentials = _credentials()
+    if credentials is None:
         print("Warning: Email credentials not configured. Skipping email sending.")
         return False
 
     try:
-        # Create message
-        msg = MIMEMultipart("alternative")
-        msg["Subject"] = subject
-        msg["From"] = sender_email
-        msg["To"] = to
-
-        # Add HTML content
-        html_part = MIMEText(html_content, "html")
-        msg.attach(html_part)
-        
-        # Add plain text content if provided
-        if plain_text_content:
-            text_part = MIMEText(plain_text_content, "plain")
-            msg.attach(text_part)
-
-        # Send email
-        with smtplib.SMTP(smtp_server, smtp_port) as server:
-            server.starttls()
-            server.login(sender_email, sender_password)
-            server.send_message(msg)
+        smtp_pool.send(build_message(to, subject, html_content, plain_text_content), credentials)
         
         print(f"Email sent successfully to {to}")
         return True
@@ -55,6 +211,27 @@ def send_email(to: str, subject: str, html_content: str, plain_text_content: Opt
         print(f"Error sending email: {str(e)}")
         raise EmailDeliveryError(f"Failed to send email: {str(e)}")
 
+def send_many(messages: List[Message]) -> List[bool]:
+    """
+    Send several messages over one SMTP session
+
+    Args:
+        messages: Messages built with build_message
+
+    Returns:
+        Per message: True if sent
+    """
+    credentials = _credentials()
+    if credentials is None:
+        print("Warning: Email credentials not configured. Skipping email sending.")
+        return [False] * len(messages)
+
+    results = smtp_pool.send_many(messages, credentials)
+    for message, error in zip(messages, results):
+        if error is not None:
+            print(f"Error sending email to {message['To']}: {error}")
+    return [error is None for error in results]
+
 def send_quote_notification_email(request_data: dict):
     """
     Send quote request notification email to admin
@@ -0,0 +1,37 @@
+"""
+Execution layer for blocking work (SQLAlchemy sessions, HTTP clients, file I/O)
+
+Route handlers that touch the database are plain `def` functions, which
+FastAPI runs in the shared anyio worker thread pool. Async code that has to
+call something blocking goes through run_blocking(). Both use the same
+bounded pool, sized with THREAD_POOL_SIZE.
+"""
+import os
+from typing import Any, Callable, TypeVar
+
+import anyio.to_thread
+from starlette.concurrency import run_in_threadpool
+
+T = TypeVar("T")
+
+# Max blocking calls running at once (anyio's default is 40)
+THREAD_POOL_SIZE = int(os.getenv('THREAD_POOL_SIZE', '40'))
+
+
+def configure_thread_pool(size: int = THREAD_POOL_SIZE) -> None:
+    """Resize the worker thread pool (call from the running event loop, e.g. lifespan)"""
+    anyio.to_thread.current_default_thread_limiter().total_tokens = size
+
+
+async def run_blocking(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Run a blocking callable in the worker thread pool
+
+    Args:
+        func: Synchronous function to call
+        *args, **kwargs: Arguments for func
+
+    Returns:
+        Result of func
+    """
+    return await run_in_threadpool(func, *args, **kwargs)
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Delete uploaded files that nothing uses any more
+References are rebuilt from products, categories, portfolio items and
+settings first; files younger than the grace period are kept because an
+image is uploaded before the form that uses it is saved.
+Run from the backend directory (next to uploads/).
+
+Usage:
+    python gc_uploads.py [--dry-run] [--grace-hours N]
+"""
+import argparse
+import sys
+
+from upload_storage import UPLOAD_GC_GRACE, collect_garbage
+
+def gc_uploads(dry_run: bool = False, grace_hours: float = UPLOAD_GC_GRACE / 3600):
+    """Remove (or with dry_run list) unreferenced uploads"""
+    try:
+        print(f"=== Collecting unreferenced uploads (grace {grace_hours:g}h{', dry run' if dry_run else ''}) ===\n")
+        
+        removed = collect_garbage(grace=grace_hours * 3600, dry_run=dry_run)
+        for name in removed:
+            print(f"  {'would remove' if dry_run else 'removed'}: {name}")
+        
+        print(f"\n✅ {'Unreferenced' if dry_run else 'Removed'}: {len(removed)} files")
+        
+    except Exception as e:
+        print(f"\n❌ GC failed: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Delete unreferenced uploads")
+    parser.add_argument("--dry-run", action="store_true", help="only list the files")
+    parser.add_argument("--grace-hours", type=float, default=UPLOAD_GC_GRACE / 3600)
+    args = parser.parse_args()
+    gc_uploads(args.dry_run, args.grace_hours)
@@ -1,92 +1,346 @@
 """
 Generate sitemap.xml for Uniform Factory website
+The sitemap is a sitemap index pointing at child sitemaps (pages, categories,
+products, images). Entries are written to disk as they are read from the
+database, so memory use does not grow with the catalog, and a child sitemap
+is split once it reaches the protocol limits (50,000 URLs / 50 MB).
+
+The API builds the files in-process once per catalog version and serves them
+from /api/sitemap.xml and /api/sitemaps/; running this file writes them to
+the current directory.
 """
-from xml.etree.ElementTree import Element, SubElement, tostring
-from xml.dom import minidom
+import gzip
+import itertools
+import os
+import shutil
+import tempfile
+import time
 from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+from xml.sax.saxutils import escape
 
-def generate_sitemap(base_url="https://uniformfactory.ru"):
-    """Generate sitemap.xml"""
-    
-    # Create root element
-    urlset = Element('urlset')
-    urlset.set('xmlns', 'http://www.sitemaps.org/schemas/sitemap/0.9')
-    urlset.set('xmlns:xsi', 'http://www.w3.org/2001/XMLSchema-instance')
-    urlset.set('xsi:schemaLocation', 'http://www.sitemaps.org/schemas/sitemap/0.9 http://www.sitemaps.org/schemas/sitemap/0.9/sitemap.xsd')
-    
-    # Static pages
-    static_pages = [
-        {'loc': '/', 'priority': '1.0', 'changefreq': 'daily'},
-        {'loc': '/catalog', 'priority': '0.9', 'changefreq': 'daily'},
-        {'loc': '/about', 'priority': '0.8', 'changefreq': 'weekly'},
-        {'loc': '/portfolio', 'priority': '0.8', 'changefreq': 'weekly'},
-        {'loc': '/contacts', 'priority': '0.8', 'changefreq': 'monthly'},
-        {'loc': '/calculator', 'priority': '0.7', 'changefreq': 'monthly'},
-        {'loc': '/privacy-policy', 'priority': '0.3', 'changefreq': 'monthly'},
-        {'loc': '/user-agreement', 'priority': '0.3', 'changefreq': 'monthly'},
-        {'loc': '/company-details', 'priority': '0.3', 'changefreq': 'monthly'},
-    ]
-    
-    lastmod = datetime.now().strftime('%Y-%m-%d')
-    
-    for page in static_pages:
-        url = SubElement(urlset, 'url')
-        loc = SubElement(url, 'loc')
-        loc.text = f"{base_url}{page['loc']}"
-        lastmod_elem = SubElement(url, 'lastmod')
-        lastmod_elem.text = lastmod
-        changefreq = SubElement(url, 'changefreq')
-        changefreq.text = page['changefreq']
-        priority = SubElement(url, 'priority')
-        priority.text = page['priority']
-    
-    # Generate dynamic URLs from database
-    try:
-        from database_sqlite import SessionLocal, ProductCategory, SQLProduct
+SITE_URL = "https://uniformfactory.ru"
+
+# Limits of the sitemap protocol (uncompressed size)
+SITEMAP_MAX_URLS = 50000
+SITEMAP_MAX_BYTES = 50 * 1024 * 1024
+# Google reads at most 1,000 images per page
+SITEMAP_MAX_IMAGES_PER_URL = 1000
+# Rows fetched from the database cursor at a time
+SITEMAP_BATCH_SIZE = int(os.getenv('SITEMAP_BATCH_SIZE', '1000'))
+
+INDEX_NAME = "sitemap.xml"
+# Child sitemaps are also stored gzipped (<name>.gz) and served precompressed
+GZIP_SUFFIX = ".gz"
+# A replaced build stays on disk at least this long: a request that resolved
+# its paths just before a rebuild can still open them
+SITEMAP_BUILD_GRACE = float(os.getenv('SITEMAP_BUILD_GRACE', '60'))  # seconds
+
+SITEMAP_NS = 'xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"'
+IMAGE_NS = 'xmlns:image="http://www.google.com/schemas/sitemap-image/1.1"'
+
+# Static pages
+STATIC_PAGES = [
+    {'loc': '/', 'priority': '1.0', 'changefreq': 'daily', 'catalog': True},
+    {'loc': '/catalog', 'priority': '0.9', 'changefreq': 'daily', 'catalog': True},
+    {'loc': '/about', 'priority': '0.8', 'changefreq': 'weekly'},
+    {'loc': '/portfolio', 'priority': '0.8', 'changefreq': 'weekly'},
+    {'loc': '/contacts', 'priority': '0.8', 'changefreq': 'monthly'},
+    {'loc': '/calculator', 'priority': '0.7', 'changefreq': 'monthly'},
+    {'loc': '/privacy-policy', 'priority': '0.3', 'changefreq': 'monthly'},
+    {'loc': '/user-agreement', 'priority': '0.3', 'changefreq': 'monthly'},
+    {'loc': '/company-details', 'priority': '0.3', 'changefreq': 'monthly'},
+]
+
+
+def format_lastmod(value: Optional[datetime]) -> Optional[str]:
+    """W3C datetime for <lastmod> from a naive UTC timestamp"""
+    if value is None:
+        return None
+    return value.strftime('%Y-%m-%dT%H:%M:%S+00:00')
+
+
+def absolute_url(base_url: str, url: str) -> str:
+    """Absolute URL for a site-relative path such as /api/uploads/x.jpg"""
+    if url.startswith(("http://", "https://")):
+        return url
+    return f"{base_url}/{url.lstrip('/')}"
+
+
+class SitemapWriter:
+    """
+    Writes <url> entries of one section to sitemap-<section>-<n>.xml files
+
+    A new file is started whenever the next entry would push the current one
+    past max_urls or max_bytes.
+    """
+
+    def __init__(self, directory: Path, section: str, namespaces: str = SITEMAP_NS,
+                 max_urls: int = SITEMAP_MAX_URLS, max_bytes: int = SITEMAP_MAX_BYTES):
+        self.directory = Path(directory)
+        self.section = section
+        self.max_urls = max_urls
+        self.max_bytes = max_bytes
+        self._header = f'<?xml version="1.0" encoding="UTF-8"?>\n<urlset {namespaces}>\n'.encode("utf-8")
+        self._footer = b'</urlset>\n'
+        self._file = None
+        self._name = None
+        self._urls = 0
+        self._size = 0
+        self._lastmod: Optional[datetime] = None
+        # (file name, newest lastmod) of every finished file
+        self.files: List[Tuple[str, Optional[datetime]]] = []
+
+    def _open(self):
+        name = f"sitemap-{self.section}-{len(self.files) + 1}.xml"
+        self._file = open(self.directory / name, "wb")
+        self._file.write(self._header)
+        self._name = name
+        self._urls = 0
+        self._size = len(self._header) + len(self._footer)
+        self._lastmod = None
+
+    def _finish(self):
+        if self._file is not None:
+            self._file.write(self._footer)
+            self._file.close()
+            self.files.append((self._name, self._lastmod))
+            self._file = None
+
+    def add(self, loc: str, lastmod: Optional[datetime] = None, changefreq: Optional[str] = None,
+            priority: Optional[str] = None, images: Iterable[Tuple[str, Optional[str]]] = ()):
+        """
+        Append one <url> entry
+
+        Args:
+            loc: Absolute page URL
+            lastmod: Naive UTC modification time (omitted when unknown)
+            changefreq: Optional change frequency hint
+            priority: Optional priority hint
+            images: (absolute image URL, caption) pairs for the image extension
+        """
+        parts = [f"  <url>\n    <loc>{escape(loc)}</loc>\n"]
+        if lastmod is not None:
+            parts.append(f"    <lastmod>{format_lastmod(lastmod)}</lastmod>\n")
+        if changefreq:
+            parts.append(f"    <changefreq>{changefreq}</changefreq>\n")
+        if priority:
+            parts.append(f"    <priority>{priority}</priority>\n")
+        for image_loc, caption in images:
+            parts.append(f"    <image:image>\n      <image:loc>{escape(image_loc)}</image:loc>\n")
+            if caption:
+                parts.append(f"      <image:caption>{escape(caption)}</image:caption>\n")
+            parts.append("    </image:image>\n")
+        parts.append("  </url>\n")
+        entry = "".join(parts).encode("utf-8")
+
+        if self._file is not None and (
+            self._urls >= self.max_urls or self._size + len(entry) > self.max_bytes
+        ):
+            self._finish()
+        if self._file is None:
+            self._open()
+        self._file.write(entry)
+        self._urls += 1
+        self._size += len(entry)
+        if lastmod is not None and (self._lastmod is None or lastmod > self._lastmod):
+            self._lastmod = lastmod
+
+    def close(self) -> List[Tuple[str, Optional[datetime]]]:
+        """Finish the current file; returns all files written (empty if no entries)"""
+        self._finish()
+        return self.files
+
+
+def write_sitemap_index(path: Path, sitemap_url: str, files: List[Tuple[str, Optional[datetime]]]):
+    """Write the sitemap index listing child sitemaps under sitemap_url"""
+    with open(path, "wb") as f:
+        f.write(f'<?xml version="1.0" encoding="UTF-8"?>\n<sitemapindex {SITEMAP_NS}>\n'.encode("utf-8"))
+        for name, lastmod in files:
+            entry = f"  <sitemap>\n    <loc>{escape(sitemap_url)}/{name}</loc>\n"
+            if lastmod is not None:
+                entry += f"    <lastmod>{format_lastmod(lastmod)}</lastmod>\n"
+            f.write((entry + "  </sitemap>\n").encode("utf-8"))
+        f.write(b'</sitemapindex>\n')
+
+
+def write_sitemaps(directory, base_url=SITE_URL, sitemap_url=None, db=None,
+                   max_urls: int = SITEMAP_MAX_URLS, max_bytes: int = SITEMAP_MAX_BYTES) -> List[str]:
+    """
+    Write the sitemap index and child sitemaps into directory
+
+    Args:
+        directory: Existing output directory
+        base_url: Site origin used in <loc>
+        sitemap_url: URL the child sitemaps are served under (default: base_url)
+        db: Open session to read from (a new one is opened if omitted)
+        max_urls: URL limit per child sitemap
+        max_bytes: Size limit per child sitemap
+
+    Returns:
+        Names of the written files, index first
+    """
+    from sqlalchemy import func, select
+    from database_sqlite import SessionLocal, ProductCategory, SQLProduct, SQLProductImage
+
+    directory = Path(directory)
+    sitemap_url = (sitemap_url or base_url).rstrip('/')
+    limits = {"max_urls": max_urls, "max_bytes": max_bytes}
+
+    own_session = db is None
+    if own_session:
         db = SessionLocal()
-        
-        # Add category pages
-        categories = db.query(ProductCategory).all()
-        for category in categories:
-            url = SubElement(urlset, 'url')
-            loc = SubElement(url, 'loc')
-            loc.text = f"{base_url}/category/{category.id}"
-            lastmod_elem = SubElement(url, 'lastmod')
-            lastmod_elem.text = lastmod
-            changefreq = SubElement(url, 'changefreq')
-            changefreq.text = 'weekly'
-            priority = SubElement(url, 'priority')
-            priority.text = '0.8'
-        
-        # Add product pages
-        products = db.query(SQLProduct).filter(SQLProduct.is_available == True).all()
-        for product in products:
-            url = SubElement(urlset, 'url')
-            loc = SubElement(url, 'loc')
-            loc.text = f"{base_url}/product/{product.id}"
-            lastmod_elem = SubElement(url, 'lastmod')
-            lastmod_elem.text = lastmod
-            changefreq = SubElement(url, 'changefreq')
-            changefreq.text = 'weekly'
-            priority = SubElement(url, 'priority')
-            priority.text = '0.7'
-        
-        db.close()
+    try:
+        product_lastmod = func.coalesce(SQLProduct.updated_at, SQLProduct.created_at)
+        category_lastmod = func.coalesce(ProductCategory.updated_at, ProductCategory.created_at)
+        # Rows are fetched in batches from the cursor instead of all at once
+        stream = {"yield_per": SITEMAP_BATCH_SIZE}
+
+        # Home and catalog pages list the catalog, so they change with it
+        known = [
+            stamp for stamp in (
+                db.execute(select(func.max(category_lastmod))).scalar(),
+                db.execute(select(func.max(product_lastmod)).where(SQLProduct.is_available == True)).scalar(),
+            ) if stamp is not None
+        ]
+        catalog_lastmod = max(known) if known else None
+
+        files = []
+        pages = SitemapWriter(directory, "pages", **limits)
+        for page in STATIC_PAGES:
+            # Pages without a known modification time get no <lastmod> rather than a made-up one
+            lastmod = catalog_lastmod if page.get('catalog') else None
+            pages.add(f"{base_url}{page['loc']}", lastmod, page['changefreq'], page['priority'])
+        files += pages.close()
+
+        categories = SitemapWriter(directory, "categories", **limits)
+        rows = db.execute(
+            select(ProductCategory.id, category_lastmod).order_by(ProductCategory.id).execution_options(**stream)
+        )
+        for category_id, lastmod in rows:
+            categories.add(f"{base_url}/category/{category_id}", lastmod, 'weekly', '0.8')
+        files += categories.close()
+
+        products = SitemapWriter(directory, "products", **limits)
+        rows = db.execute(
+            select(SQLProduct.id, product_lastmod)
+            .where(SQLProduct.is_available == True)
+            .order_by(SQLProduct.id)
+            .execution_options(**stream)
+        )
+        for product_id, lastmod in rows:
+            products.add(f"{base_url}/product/{product_id}", lastmod, 'weekly', '0.7')
+        files += products.close()
+
+        images = SitemapWriter(directory, "images", f"{SITEMAP_NS} {IMAGE_NS}", **limits)
+        rows = db.execute(
+            select(SQLProduct.id, product_lastmod, SQLProductImage.image_url, SQLProductImage.alt_text)
+            .join(SQLProductImage, SQLProductImage.product_id == SQLProduct.id)
+            .where(SQLProduct.is_available == True)
+            .order_by(SQLProduct.id, SQLProductImage.order, SQLProductImage.id)
+            .execution_options(**stream)
+        )
+        # Rows arrive grouped by product: one <url> per product page with its images
+        for (product_id, lastmod), group in itertools.groupby(rows, key=lambda row: (row[0], row[1])):
+            product_images = [
+                (absolute_url(base_url, image_url), alt_text)
+                for _, _, image_url, alt_text in itertools.islice(group, SITEMAP_MAX_IMAGES_PER_URL)
+            ]
+            images.add(f"{base_url}/product/{product_id}", lastmod, images=product_images)
+        files += images.close()
     except Exception as e:
+        # Fail loudly: a sitemap without the catalog must not be cached or published
         print(f"Error generating dynamic URLs: {e}")
-    
-    # Pretty print XML
-    xml_string = tostring(urlset, encoding='unicode')
-    dom = minidom.parseString(xml_string)
-    pretty_xml = dom.toprettyxml(indent="  ")
-    
-    # Remove extra blank lines
-    pretty_xml = '\n'.join([line for line in pretty_xml.split('\n') if line.strip()])
-    
-    return pretty_xml
+        raise
+    finally:
+        if own_session:
+            db.close()
+
+    write_sitemap_index(directory / INDEX_NAME, sitemap_url, files)
+    return [INDEX_NAME] + [name for name, _ in files]
+
+
+def write_gzip_copy(path: Path) -> Path:
+    """Write <path>.gz next to a sitemap file (byte-identical for identical input)"""
+    target = path.with_name(path.name + GZIP_SUFFIX)
+    with open(path, "rb") as source, open(target, "wb") as raw:
+        with gzip.GzipFile(filename="", mode="wb", fileobj=raw, compresslevel=9, mtime=0) as compressed:
+            shutil.copyfileobj(source, compressed, 1024 * 1024)
+    return target
+
+
+def process_alive(pid: int) -> bool:
+    """Whether a process with this id exists"""
+    try:
+        os.kill(pid, 0)
+    except PermissionError:
+        return True  # exists, owned by another user
+    except (OSError, OverflowError):
+        return False
+    return True
+
+
+class SitemapStore:
+    """
+    Generated sitemap sets on disk, one directory per build
+
+    Several worker processes share the root directory, each serving the
+    build it cached. A store therefore only prunes builds it created itself
+    and builds left behind by processes that no longer exist. Beyond the
+    `keep` newest, a build is removed only once `grace` seconds have passed
+    since it was replaced, so quick successive rebuilds do not delete files
+    a request has just resolved.
+    """
+
+    def __init__(self, root, keep: int = 2, grace: float = SITEMAP_BUILD_GRACE):
+        self.root = Path(root)
+        self.keep = keep
+        self.grace = grace
+        self._builds: List[Path] = []
+        self._replaced_at: Dict[Path, float] = {}
+
+    def build(self, base_url=SITE_URL, sitemap_url=None) -> Dict[str, Path]:
+        """
+        Write a fresh sitemap set
+
+        Returns:
+            File name -> path, index first
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        directory = Path(tempfile.mkdtemp(prefix=f"build-{os.getpid()}-", dir=self.root))
+        try:
+            names = write_sitemaps(directory, base_url, sitemap_url)
+            for name in names[1:]:
+                write_gzip_copy(directory / name)
+        except Exception:
+            shutil.rmtree(directory, ignore_errors=True)
+            raise
+        now = time.monotonic()
+        if self._builds:
+            self._replaced_at[self._builds[-1]] = now
+        self._builds.append(directory)
+        self._prune(now)
+        return {name: directory / name for name in names}
+
+    def _prune(self, now: float):
+        old = self._builds[:max(len(self._builds) - self.keep, 0)]
+        for path in old:
+            if now - self._replaced_at[path] >= self.grace:
+                shutil.rmtree(path, ignore_errors=True)
+                self._builds.remove(path)
+                del self._replaced_at[path]
+        for path in self.root.glob("build-*"):
+            owner = path.name.split("-")[1]
+            if path.is_dir() and (not owner.isdigit() or not process_alive(int(owner))):
+                shutil.rmtree(path, ignore_errors=True)
+
 
 if __name__ == '__main__':
-    sitemap = generate_sitemap()
-    with open('sitemap.xml', 'w', encoding='utf-8') as f:
-        f.write(sitemap)
-    print("✅ Sitemap generated: sitemap.xml")
+    # Drop child sitemaps of a previous run: a smaller catalog writes fewer files
+    for stale in Path('.').glob('sitemap-*.xml'):
+        stale.unlink()
+    names = write_sitemaps(Path('.'))
+    print(f"✅ Sitemap generated: {names[0]} ({len(names) - 1} child sitemaps)")
+    for name in names[1:]:
+        print(f"   - {name}")
@@ -0,0 +1,208 @@
+"""
+Offline IP range database for region lookup
+A CIDR-to-region CSV is compacted into a binary file of sorted integer
+arrays that is memory-mapped at startup; a lookup is a bisect over the range
+starts, with no network access. IPv6 ranges are kept at /64 granularity.
+
+CSV columns (header required): network, country_code, region, city
+"""
+import bisect
+import csv
+import ipaddress
+import json
+import logging
+import mmap
+import os
+import struct
+from array import array
+from typing import Iterable, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"UFGEO001"
+# magic, byte order check, IPv4 range count, IPv6 range count, locations offset, locations length
+HEADER = struct.Struct("=8sIIIII")
+BYTE_ORDER_CHECK = 0x01020304
+
+Location = Tuple[str, str, str]  # city, region, country code
+IPAddress = Union[ipaddress.IPv4Address, ipaddress.IPv6Address]
+
+
+def _flatten(ranges: List[Tuple[int, int, int]]) -> List[Tuple[int, int, int]]:
+    """
+    Turn possibly nested ranges into sorted, non-overlapping ones
+
+    The most specific range wins where ranges nest (e.g. a city /24 inside a
+    country /16); adjacent ranges with the same location are merged.
+    """
+    ranges.sort(key=lambda item: (item[0], -item[1]))
+    segments: List[Tuple[int, int, int]] = []
+
+    def emit(start: int, end: int, location: int):
+        if start > end:
+            return
+        if segments and segments[-1][1] + 1 == start and segments[-1][2] == location:
+            segments[-1] = (segments[-1][0], end, location)
+        else:
+            segments.append((start, end, location))
+
+    stack: List[Tuple[int, int]] = []  # (end, location) of the enclosing ranges
+    cursor = 0
+    for start, end, location in ranges:
+        while stack and stack[-1][0] < start:
+            enclosing_end, enclosing_location = stack.pop()
+            emit(cursor, enclosing_end, enclosing_location)
+            cursor = enclosing_end + 1
+        if stack:
+            emit(cursor, start - 1, stack[-1][1])
+            # Partially overlapping ranges (not possible with CIDRs) are clipped
+            end = min(end, stack[-1][0])
+        cursor = start
+        stack.append((end, location))
+    while stack:
+        enclosing_end, enclosing_location = stack.pop()
+        emit(cursor, enclosing_end, enclosing_location)
+        cursor = enclosing_end + 1
+    return segments
+
+
+def read_csv_ranges(path: str) -> Iterable[Tuple[str, Location]]:
+    """Yield (network, (city, region, country)) rows from a range CSV"""
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            network = (row.get("network") or "").strip()
+            if not network or network.startswith("#"):
+                continue
+            yield network, (
+                (row.get("city") or "").strip(),
+                (row.get("region") or "").strip(),
+                (row.get("country_code") or row.get("country") or "").strip(),
+            )
+
+
+def compile_ranges(rows: Iterable[Tuple[str, Location]]) -> bytes:
+    """
+    Build the binary database from (network, location) rows
+
+    Raises:
+        ValueError: If a network is not a valid CIDR
+    """
+    locations: List[Location] = []
+    location_ids = {}
+    v4: List[Tuple[int, int, int]] = []
+    v6: List[Tuple[int, int, int]] = []
+
+    for network, location in rows:
+        try:
+            net = ipaddress.ip_network(network, strict=False)
+        except ValueError as e:
+            raise ValueError(f"Invalid network {network!r}: {e}") from e
+        location_id = location_ids.setdefault(location, len(locations))
+        if location_id == len(locations):
+            locations.append(location)
+        start, end = int(net.network_address), int(net.broadcast_address)
+        if net.version == 4:
+            v4.append((start, end, location_id))
+        else:
+            v6.append((start >> 64, end >> 64, location_id))
+
+    v4, v6 = _flatten(v4), _flatten(v6)
+    location_bytes = json.dumps(locations, ensure_ascii=False).encode("utf-8")
+
+    body = bytearray(HEADER.size)
+    for typecode, segments in (("I", v4), ("Q", v6)):
+        # 8-byte alignment for the uint64 arrays
+        body += b"\0" * (-len(body) % 8)
+        body += array(typecode, (segment[0] for segment in segments)).tobytes()
+        body += array(typecode, (segment[1] for segment in segments)).tobytes()
+        body += array("I", (segment[2] for segment in segments)).tobytes()
+    locations_offset = len(body)
+    body += location_bytes
+    HEADER.pack_into(body, 0, MAGIC, BYTE_ORDER_CHECK, len(v4), len(v6), locations_offset, len(location_bytes))
+    return bytes(body)
+
+
+class GeoRangeDatabase:
+    """Sorted IP ranges over a bytes-like buffer (usually a read-only mmap)"""
+
+    def __init__(self, buffer, source: str = "<memory>"):
+        self.source = source
+        self._buffer = buffer
+        view = memoryview(buffer)
+        magic, order_check, v4_count, v6_count, locations_offset, locations_length = HEADER.unpack_from(view, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{source}: not a geo range database")
+        if order_check != BYTE_ORDER_CHECK:
+            raise ValueError(f"{source}: built on a machine with a different byte order")
+
+        offset = HEADER.size
+        arrays = []
+        for typecode, size, count in (("I", 4, v4_count), ("Q", 8, v6_count)):
+            offset += -offset % 8
+            starts = view[offset:offset + size * count].cast(typecode)
+            offset += size * count
+            ends = view[offset:offset + size * count].cast(typecode)
+            offset += size * count
+            location_ids = view[offset:offset + 4 * count].cast("I")
+            offset += 4 * count
+            arrays.append((starts, ends, location_ids))
+        self._v4, self._v6 = arrays
+        self.locations: List[Location] = [
+            tuple(location) for location in
+            json.loads(bytes(view[locations_offset:locations_offset + locations_length]).decode("utf-8"))
+        ]
+
+    @classmethod
+    def open(cls, path: str) -> "GeoRangeDatabase":
+        """Memory-map a compiled database, or compile a .csv file in memory"""
+        if path.endswith(".csv"):
+            return cls(compile_ranges(read_csv_ranges(path)), path)
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(buffer, path)
+
+    def __len__(self) -> int:
+        return len(self._v4[0]) + len(self._v6[0])
+
+    def lookup(self, ip: IPAddress) -> Optional[Location]:
+        """
+        Find the location of an address
+
+        Returns:
+            (city, region, country code) or None if no range contains it
+        """
+        if ip.version == 6 and ip.ipv4_mapped is not None:
+            ip = ip.ipv4_mapped
+        if ip.version == 4:
+            starts, ends, location_ids = self._v4
+            value = int(ip)
+        else:
+            starts, ends, location_ids = self._v6
+            value = int(ip) >> 64
+        index = bisect.bisect_right(starts, value) - 1
+        if index >= 0 and value <= ends[index]:
+            return self.locations[location_ids[index]]
+        return None
+
+
+def build_geo_database(csv_path: str, output_path: str) -> GeoRangeDatabase:
+    """Compile a range CSV into a binary database file (written atomically)"""
+    data = compile_ranges(read_csv_ranges(csv_path))
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, output_path)
+    return GeoRangeDatabase(data, output_path)
+
+
+def load_geo_database(path: Optional[str]) -> Optional[GeoRangeDatabase]:
+    """Open the range database if configured and present, None otherwise"""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        database = GeoRangeDatabase.open(path)
+    except (OSError, ValueError) as e:
+        logger.error(f"Could not load geo range database {path}: {e}")
+        return None
+    logger.info(f"Loaded geo range database {path}: {len(database)} ranges")
+    return database
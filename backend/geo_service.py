@@ -1,12 +1,36 @@
 """
 Сервис для определения региона пользователя по IP адресу
+Запросы к ipapi.co асинхронные и кэшируются (LRU + TTL) по IP и по подсети
+/24, одновременные запросы одной подсети делят один вызов API, ошибки
+кэшируются на короткое время, чтобы не расходовать дневную квоту.
+Если задана локальная база диапазонов IP (GEO_DB_PATH, см. geo_ranges.py),
+регион определяется по ней без сети, а ipapi.co используется только для
+адресов, которых в базе нет.
 """
-import requests
+import asyncio
+import ipaddress
 import logging
-from typing import Dict, Optional
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple, Union
+
+import httpx
+
+from geo_ranges import GeoRangeDatabase, load_geo_database
 
 logger = logging.getLogger(__name__)
 
+# URL API геолокации, {ip} подставляется (переопределяется для тестов/другого провайдера)
+GEO_API_URL = os.getenv('GEO_API_URL', 'https://ipapi.co/{ip}/json/')
+GEO_API_TIMEOUT = float(os.getenv('GEO_API_TIMEOUT', '3'))  # seconds
+GEO_CACHE_TTL = float(os.getenv('GEO_CACHE_TTL', '86400'))  # seconds
+# Ошибки API (таймаут, квота) кэшируются коротко
+GEO_NEGATIVE_TTL = float(os.getenv('GEO_NEGATIVE_TTL', '300'))  # seconds
+GEO_CACHE_MAX_ENTRIES = int(os.getenv('GEO_CACHE_MAX_ENTRIES', '20000'))
+# Локальная база диапазонов (собирается build_geo_db.py), не используется если файла нет
+GEO_DB_PATH = os.getenv('GEO_DB_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'geo_ranges.bin'))
+
 # Маппинг регионов на телефоны
 REGIONAL_PHONES = {
     "Saint Petersburg": "+7 (812) 317-73-19",
@@ -32,65 +56,202 @@ MSK_REGIONS = [
 ]
 
 
-def get_region_by_ip(ip_address: str) -> Dict[str, str]:
+class TTLCache:
+    """LRU-кэш с временем жизни записей"""
+
+    def __init__(self, max_entries: int = GEO_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, str]]]" = OrderedDict()
+
+    def get(self, key: str, now: Optional[float] = None) -> Optional[Dict[str, str]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= (time.monotonic() if now is None else now):
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def set(self, key: str, value: Dict[str, str], ttl: float, now: Optional[float] = None):
+        expires = (time.monotonic() if now is None else now) + ttl
+        self._entries[key] = (expires, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def network_key(ip: Union[ipaddress.IPv4Address, ipaddress.IPv6Address]) -> str:
+    """Подсеть адреса для кэша: /24 для IPv4, /48 для IPv6"""
+    prefix = 24 if ip.version == 4 else 48
+    return str(ipaddress.ip_network(f"{ip}/{prefix}", strict=False))
+
+
+def is_local_ip(ip_address: str) -> bool:
+    """Локальные и служебные адреса, для которых API не вызывается"""
+    if ip_address == "localhost":
+        return True
+    try:
+        ip = ipaddress.ip_address(ip_address)
+    except ValueError:
+        return False
+    return ip.is_private or ip.is_loopback or ip.is_link_local or ip.is_reserved
+
+
+class GeoResolver:
+    """Асинхронное определение региона с кэшем и объединением одновременных запросов"""
+
+    def __init__(
+        self,
+        api_url: str = GEO_API_URL,
+        timeout: float = GEO_API_TIMEOUT,
+        ttl: float = GEO_CACHE_TTL,
+        negative_ttl: float = GEO_NEGATIVE_TTL,
+        max_entries: int = GEO_CACHE_MAX_ENTRIES,
+        ranges: Optional[GeoRangeDatabase] = None
+    ):
+        self.api_url = api_url
+        self.ranges = ranges
+        self.timeout = timeout
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.cache = TTLCache(max_entries)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # Клиент привязан к event loop, в котором создан
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop:
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+            self._client_loop = loop
+        return self._client
+
+    async def close(self):
+        """Закрывает HTTP-клиент (при остановке приложения)"""
+        if self._client is not None:
+            client, self._client = self._client, None
+            await client.aclose()
+
+    async def lookup(self, ip_address: str) -> Dict[str, str]:
+        """
+        Определяет регион по IP адресу
+
+        Args:
+            ip_address: IP адрес пользователя
+
+        Returns:
+            Dict с информацией о регионе и телефоне
+        """
+        if is_local_ip(ip_address):
+            logger.debug(f"Local IP detected: {ip_address}, using fallback")
+            return {**get_fallback_response(ip_address), "source": "local"}
+
+        try:
+            ip = ipaddress.ip_address(ip_address)
+        except ValueError:
+            logger.warning(f"Invalid IP address: {ip_address!r}, using fallback")
+            return get_fallback_response(ip_address)
+
+        if self.ranges is not None:
+            location = self.ranges.lookup(ip)
+            if location is not None:
+                return self._from_location(ip_address, location)
+
+        # Сначала точный IP, затем подсеть: соседние адреса почти всегда в том же регионе
+        network = network_key(ip)
+        cached = self.cache.get(ip_address) or self.cache.get(network)
+        if cached is not None:
+            return {**cached, "ip": ip_address}
+
+        future = self._inflight.get(network)
+        if future is None:
+            future = asyncio.ensure_future(self._fetch(ip_address, network))
+            self._inflight[network] = future
+            future.add_done_callback(lambda _: self._inflight.pop(network, None))
+        # shield: отмена одного запроса клиента не отменяет общий вызов API
+        result = await asyncio.shield(future)
+        return {**result, "ip": ip_address}
+
+    async def _fetch(self, ip_address: str, network: str) -> Dict[str, str]:
+        try:
+            response = await self._get_client().get(self.api_url.format(ip=ip_address))
+            if response.status_code != 200:
+                logger.warning(f"Geo API returned status {response.status_code} for IP {ip_address}")
+                return self._remember_failure(ip_address, network)
+
+            data = response.json()
+            if data.get("error"):
+                # ipapi.co отвечает 200 с error для зарезервированных адресов и превышения квоты
+                logger.warning(f"Geo API error for IP {ip_address}: {data.get('reason')}")
+                return self._remember_failure(ip_address, network)
+        except httpx.TimeoutException:
+            logger.error(f"Timeout getting region for IP {ip_address}")
+            return self._remember_failure(ip_address, network)
+        except Exception as e:
+            logger.error(f"Error getting region for IP {ip_address}: {str(e)}")
+            return self._remember_failure(ip_address, network)
+
+        city = data.get("city") or "Unknown"
+        region = data.get("region") or "Unknown"
+        country = data.get("country_code") or "Unknown"
+
+        # Определяем телефон по региону
+        phone = determine_phone_by_region(city, region)
+
+        logger.info(f"IP {ip_address}: {city}, {region}, {country} -> {phone}")
+
+        result = {
+            "ip": ip_address,
+            "city": city,
+            "region": region,
+            "country": country,
+            "phone": phone,
+            "source": "ipapi"
+        }
+        self.cache.set(ip_address, result, self.ttl)
+        self.cache.set(network, result, self.ttl)
+        return result
+
+    @staticmethod
+    def _from_location(ip_address: str, location: tuple) -> Dict[str, str]:
+        city, region, country = (value or "Unknown" for value in location)
+        return {
+            "ip": ip_address,
+            "city": city,
+            "region": region,
+            "country": country,
+            "phone": determine_phone_by_region(city, region),
+            "source": "geodb"
+        }
+
+    def _remember_failure(self, ip_address: str, network: str) -> Dict[str, str]:
+        result = get_fallback_response(ip_address)
+        self.cache.set(network, result, self.negative_ttl)
+        return result
+
+
+geo_resolver = GeoResolver(ranges=load_geo_database(GEO_DB_PATH))
+
+
+async def get_region_by_ip(ip_address: str) -> Dict[str, str]:
     """
     Определяет регион пользователя по IP адресу
-    
+
     Args:
         ip_address: IP адрес пользователя
-        
+
     Returns:
         Dict с информацией о регионе и телефоне
     """
-    try:
-        # Проверка на локальные IP
-        if ip_address in ["127.0.0.1", "localhost", "::1"] or ip_address.startswith("192.168.") or ip_address.startswith("10."):
-            logger.info(f"Local IP detected: {ip_address}, using fallback")
-            return {
-                "ip": ip_address,
-                "city": "Unknown",
-                "region": "Unknown",
-                "country": "RU",
-                "phone": REGIONAL_PHONES["fallback"],
-                "source": "local"
-            }
-        
-        # Используем бесплатный API ipapi.co (1000 запросов/день)
-        response = requests.get(
-            f"https://ipapi.co/{ip_address}/json/",
-            timeout=3
-        )
-        
-        if response.status_code == 200:
-            data = response.json()
-            
-            city = data.get("city", "Unknown")
-            region = data.get("region", "Unknown")
-            country = data.get("country_code", "Unknown")
-            
-            # Определяем телефон по региону
-            phone = determine_phone_by_region(city, region)
-            
-            logger.info(f"IP {ip_address}: {city}, {region}, {country} -> {phone}")
-            
-            return {
-                "ip": ip_address,
-                "city": city,
-                "region": region,
-                "country": country,
-                "phone": phone,
-                "source": "ipapi"
-            }
-        else:
-            logger.warning(f"ipapi.co returned status {response.status_code} for IP {ip_address}")
-            return get_fallback_response(ip_address)
-            
-    except requests.Timeout:
-        logger.error(f"Timeout getting region for IP {ip_address}")
-        return get_fallback_response(ip_address)
-    except Exception as e:
-        logger.error(f"Error getting region for IP {ip_address}: {str(e)}")
-        return get_fallback_response(ip_address)
+    return await geo_resolver.lookup(ip_address)
 
 
 def determine_phone_by_region(city: str, region: str) -> str:
@@ -0,0 +1,95 @@
+"""
+HTTP caching helpers: pre-encoded JSON bodies and conditional requests
+"""
+import json
+from datetime import date, datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Dict, Optional
+
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is listed in requirements.txt
+    orjson = None
+
+
+def _json_default(value: Any):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps_json(data: Any) -> bytes:
+    """
+    Encode data to JSON bytes (orjson when available)
+
+    Datetimes are written in ISO 8601, same as FastAPI's jsonable_encoder.
+    """
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=_json_default).encode("utf-8")
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Check If-None-Match header against an ETag (weak comparison, RFC 7232)
+
+    Args:
+        if_none_match: Raw If-None-Match header value
+        etag: Current quoted ETag
+
+    Returns:
+        True if the client already has the current representation
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+
+    current = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == current:
+            return True
+    return False
+
+
+def http_date(value: datetime) -> str:
+    """Format a naive UTC datetime (as stored in the database) as an HTTP-date"""
+    return format_datetime(value.replace(tzinfo=timezone.utc, microsecond=0), usegmt=True)
+
+
+def not_modified_since(if_modified_since: Optional[str], last_modified: datetime) -> bool:
+    """
+    Check If-Modified-Since header against a naive UTC modification time
+
+    Args:
+        if_modified_since: Raw If-Modified-Since header value
+        last_modified: Time the representation last changed
+
+    Returns:
+        True if the representation has not changed since the given date
+    """
+    if not if_modified_since:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    # HTTP-dates have whole-second precision
+    return last_modified.replace(tzinfo=timezone.utc, microsecond=0) <= since
+
+
+def not_modified_response(headers: Dict[str, str]) -> Response:
+    """304 response carrying the validator headers of the full response"""
+    return Response(status_code=304, headers=headers)
+
+
+def json_bytes_response(body: bytes, headers: Dict[str, str]) -> Response:
+    """Response for an already encoded JSON body"""
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,257 @@
+"""
+Responsive variants of uploaded images
+Every admin upload gets derived copies at fixed widths in AVIF, WebP and a
+JPEG fallback, all with EXIF stripped (orientation is applied first). They
+are encoded in a process pool so neither the upload request nor the event
+loop waits for Pillow. /api/uploads/{filename} picks a variant with ?w= and
+?format= (or the Accept header); the original is served until the variants
+exist.
+
+Layout: uploads/variants/<stem>-<width>w.<ext> plus a <stem>.json manifest
+written last, so a manifest always describes complete files.
+"""
+import json
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image, ImageOps, features
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_DIR = Path("uploads")
+VARIANTS_DIR = UPLOAD_DIR / "variants"
+
+IMAGE_VARIANT_WIDTHS = [
+    int(width) for width in os.getenv('IMAGE_VARIANT_WIDTHS', '320,640,960,1280,1920').split(',') if width.strip()
+]
+IMAGE_VARIANT_WORKERS = int(os.getenv('IMAGE_VARIANT_WORKERS', str(min(2, os.cpu_count() or 1))))
+
+# Source extensions that get variants (animated GIFs are served as uploaded)
+VARIANT_SOURCE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp'}
+
+# format -> (file extension, media type, Pillow save options); best compression first
+VARIANT_FORMATS = {
+    "avif": ("avif", "image/avif", {"quality": 55, "speed": 8}),
+    "webp": ("webp", "image/webp", {"quality": 80, "method": 4}),
+    "jpeg": ("jpg", "image/jpeg", {"quality": 82, "optimize": True, "progressive": True}),
+}
+FORMAT_ALIASES = {"jpg": "jpeg"}
+
+# Manifests never change once written (a re-upload gets a new file name)
+MANIFEST_CACHE_MAX_ENTRIES = 10000
+
+
+def supported_formats() -> List[str]:
+    """Variant formats this Pillow build can encode, best first"""
+    return [fmt for fmt in VARIANT_FORMATS if fmt == "jpeg" or features.check(fmt)]
+
+
+def variant_name(stem: str, width: int, fmt: str) -> str:
+    """File name of one variant"""
+    return f"{stem}-{width}w.{VARIANT_FORMATS[fmt][0]}"
+
+
+def manifest_path(filename: str, variants_dir: Path = VARIANTS_DIR) -> Path:
+    return variants_dir / f"{Path(filename).stem}.json"
+
+
+def _flatten(image: Image.Image) -> Image.Image:
+    """RGB copy for JPEG, with transparency composited onto white"""
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+
+def generate_variants(source: str, variants_dir: str, widths: Optional[List[int]] = None,
+                      formats: Optional[List[str]] = None) -> dict:
+    """
+    Encode all variants of one image (runs in a worker process)
+
+    Widths above the original are skipped; the original width is always
+    included, so every format has a full-size, EXIF-free copy.
+
+    Args:
+        source: Path of the uploaded original
+        variants_dir: Output directory
+        widths: Target widths (default IMAGE_VARIANT_WIDTHS)
+        formats: Output formats (default: all supported)
+
+    Returns:
+        Manifest: {"source", "width", "height", "widths", "formats"}
+    """
+    source = Path(source)
+    variants_dir = Path(variants_dir)
+    variants_dir.mkdir(parents=True, exist_ok=True)
+    widths = IMAGE_VARIANT_WIDTHS if widths is None else widths
+    formats = supported_formats() if formats is None else formats
+
+    with Image.open(source) as opened:
+        # Bake EXIF orientation into the pixels before the metadata is dropped
+        image = ImageOps.exif_transpose(opened)
+        image.load()
+    icc_profile = image.info.get("icc_profile")
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if image.mode in ("LA", "P", "PA") else "RGB")
+
+    width, height = image.size
+    sizes = sorted({w for w in widths if w < width} | {width})
+    for target in sizes:
+        resized = image if target == width else image.resize(
+            (target, max(1, round(height * target / width))), Image.LANCZOS
+        )
+        for fmt in formats:
+            ext, _, options = VARIANT_FORMATS[fmt]
+            out = resized if fmt != "jpeg" else _flatten(resized)
+            save_options = dict(options)
+            if icc_profile:
+                save_options["icc_profile"] = icc_profile
+            tmp_path = variants_dir / f".{variant_name(source.stem, target, fmt)}.tmp"
+            out.save(tmp_path, format=fmt.upper(), **save_options)
+            os.replace(tmp_path, variants_dir / variant_name(source.stem, target, fmt))
+
+    manifest = {"source": source.name, "width": width, "height": height, "widths": sizes, "formats": formats}
+    tmp_manifest = variants_dir / f".{source.stem}.json.tmp"
+    tmp_manifest.write_text(json.dumps(manifest), encoding="utf-8")
+    os.replace(tmp_manifest, manifest_path(source.name, variants_dir))
+    return manifest
+
+
+def delete_variants(filename: str, variants_dir: Path = VARIANTS_DIR) -> int:
+    """Remove the manifest and variant files of an upload; returns files removed"""
+    stem = Path(filename).stem
+    removed = 0
+    manifest_file = manifest_path(filename, variants_dir)
+    if manifest_file.exists():
+        manifest_file.unlink()
+        removed += 1
+    for path in variants_dir.glob(f"{stem}-*w.*"):
+        path.unlink()
+        removed += 1
+    image_pipeline.forget(filename)
+    return removed
+
+
+def parse_accept(accept: Optional[str]) -> List[str]:
+    """Variant formats acceptable per the Accept header, best first"""
+    accepted = {part.split(";")[0].strip().lower() for part in (accept or "").split(",")}
+    return [fmt for fmt, (_, media_type, _) in VARIANT_FORMATS.items() if media_type in accepted] + ["jpeg"]
+
+
+class ImagePipeline:
+    """Process pool encoding variants, plus a cache of finished manifests"""
+
+    def __init__(self, workers: int = IMAGE_VARIANT_WORKERS, variants_dir: Path = VARIANTS_DIR):
+        self.workers = workers
+        self.variants_dir = Path(variants_dir)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._manifests: Dict[str, dict] = {}
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: forking a process that runs threads and an event loop is unsafe
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def submit(self, source: Path) -> Optional[Future]:
+        """
+        Queue variant generation for an uploaded file (returns immediately)
+
+        Returns:
+            Future with the manifest, or None if the file type gets no variants
+        """
+        source = Path(source)
+        if source.suffix.lower() not in VARIANT_SOURCE_EXTENSIONS:
+            return None
+        with self._lock:
+            future = self._pool().submit(generate_variants, str(source), str(self.variants_dir))
+            self._pending[source.name] = future
+        future.add_done_callback(lambda done, name=source.name: self._finished(name, done))
+        return future
+
+    def _finished(self, filename: str, future: Future):
+        with self._lock:
+            if self._pending.get(filename) is future:
+                del self._pending[filename]
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            logger.error(f"Image variants for {filename} failed: {error}")
+
+    def wait(self, timeout: Optional[float] = None):
+        """Block until queued variant jobs are done (scripts and tests)"""
+        with self._lock:
+            pending = list(self._pending.values())
+        for future in pending:
+            try:
+                future.result(timeout=timeout)
+            except Exception:
+                pass  # logged by _finished
+
+    def manifest(self, filename: str) -> Optional[dict]:
+        """Manifest of a finished upload, or None while variants are missing"""
+        manifest = self._manifests.get(filename)
+        if manifest is not None:
+            return manifest
+        try:
+            manifest = json.loads(manifest_path(filename, self.variants_dir).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if len(self._manifests) >= MANIFEST_CACHE_MAX_ENTRIES:
+            self._manifests.clear()
+        self._manifests[filename] = manifest
+        return manifest
+
+    def forget(self, filename: str):
+        """Drop a cached manifest (the upload was deleted)"""
+        self._manifests.pop(filename, None)
+
+    def select(self, filename: str, width: Optional[int], fmt: Optional[str],
+               accept: Optional[str]) -> Optional[Tuple[Path, str]]:
+        """
+        Pick the variant to serve
+
+        Args:
+            filename: Original upload name
+            width: Requested display width; the smallest variant at least this
+                wide is used (the largest one if none is)
+            fmt: Requested format, or None/"auto" to negotiate with accept
+            accept: Accept request header
+
+        Returns:
+            (variant path, media type), or None to serve the original
+        """
+        manifest = self.manifest(filename)
+        if manifest is None:
+            return None
+        fmt = FORMAT_ALIASES.get(fmt, fmt)
+        candidates = parse_accept(accept) if fmt in (None, "auto") else [fmt]
+        chosen = next((candidate for candidate in candidates if candidate in manifest["formats"]), None)
+        if chosen is None:
+            return None
+        sizes = manifest["widths"]
+        target = next((w for w in sizes if width is not None and w >= width), sizes[-1])
+        path = self.variants_dir / variant_name(Path(filename).stem, target, chosen)
+        return path, VARIANT_FORMATS[chosen][1]
+
+    def close(self):
+        """Stop the workers; unfinished jobs are dropped (build_image_variants.py redoes them)"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+image_pipeline = ImagePipeline()
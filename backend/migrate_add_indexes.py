@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Migration: Add secondary indexes for hot filter and sort columns
+Creates the indexes declared on the models (category, availability, views,
+image/characteristic product ids, quote status/date, web vitals name/time,
+products keyset order) that are missing in an existing database.
+Safe to run repeatedly. The server also runs this on startup.
+"""
+
+from database_sqlite import engine, ensure_indexes
+
+def migrate_add_indexes():
+    """Create missing model indexes"""
+    try:
+        print("=== Adding secondary indexes ===\n")
+        
+        results = ensure_indexes(engine)
+        failed = 0
+        for name, status in results.items():
+            if status == "created":
+                print(f"✅ {name}: created")
+            elif status == "exists":
+                print(f"   {name}: already exists")
+            else:
+                failed += 1
+                print(f"❌ {name}: {status}")
+        
+        created = sum(1 for status in results.values() if status == "created")
+        print(f"\n✅ Migration completed! Created: {created}, failed: {failed}")
+        
+    except Exception as e:
+        print(f"\n❌ Migration failed: {e}")
+        import traceback
+        traceback.print_exc()
+
+
+if __name__ == "__main__":
+    migrate_add_indexes()
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Migration: Add FTS5 full-text search index for products
+Creates products_fts with sync triggers and fills it from existing products.
+An index from before products.search_rowid (keyed on products.rowid, which
+VACUUM may renumber) is rebuilt on the new key.
+The server also runs this on startup, so the script is only needed to
+prepare a database ahead of deploy.
+"""
+
+from database_sqlite import engine, init_product_search_index, SessionLocal, SQLProduct
+from sqlalchemy import text
+
+def migrate_add_product_search():
+    """Create products_fts index and triggers"""
+    try:
+        print("=== Adding full-text search index for products ===\n")
+        
+        with engine.begin() as connection:
+            if not init_product_search_index(connection):
+                print("❌ SQLite build has no FTS5 support. Search keeps using LIKE.")
+                return
+            indexed = connection.execute(text("SELECT count(*) FROM products_fts")).scalar()
+        
+        db = SessionLocal()
+        try:
+            total_products = db.query(SQLProduct).count()
+        finally:
+            db.close()
+        
+        print(f"✅ Migration completed!")
+        print(f"   Total products: {total_products}")
+        print(f"   Indexed products: {indexed}")
+        
+    except Exception as e:
+        print(f"\n❌ Migration failed: {e}")
+        import traceback
+        traceback.print_exc()
+
+
+if __name__ == "__main__":
+    migrate_add_product_search()
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Migration: Add upload_references table
+Creates the table recording which products, categories, portfolio items and
+settings use each uploaded file, and fills it from the existing rows.
+Safe to run repeatedly (the table is rebuilt from the data each time).
+"""
+
+from database_sqlite import SessionLocal, UploadReference, engine
+from upload_storage import rebuild_references
+
+def migrate_add_upload_references():
+    """Create upload_references and record current file usage"""
+    try:
+        print("=== Adding upload_references table ===\n")
+        
+        UploadReference.__table__.create(bind=engine, checkfirst=True)
+        print("✅ Table upload_references ready")
+        
+        db = SessionLocal()
+        try:
+            count = rebuild_references(db)
+            db.commit()
+            files = db.query(UploadReference.filename).distinct().count()
+        finally:
+            db.close()
+        
+        print(f"✅ Recorded {count} references to {files} uploaded files")
+        print("\n✅ Migration completed!")
+        
+    except Exception as e:
+        print(f"\n❌ Migration failed: {e}")
+        import traceback
+        traceback.print_exc()
+
+
+if __name__ == "__main__":
+    migrate_add_upload_references()
@@ -0,0 +1,289 @@
+"""
+Durable outbox for Telegram and email notifications
+Form endpoints add outbox rows in the same transaction as the request row;
+a background dispatcher delivers them with a concurrency limit, retries
+failures with exponential backoff and dead-letters entries that keep failing.
+Undelivered notifications survive restarts.
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+import telegram_service
+from database_sqlite import NotificationOutbox, SessionLocal
+from email_service import send_callback_notification_email, send_contact_message_email, send_quote_notification_email
+from executor import run_blocking
+from telegram_service import TelegramService
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_POLL_INTERVAL = float(os.getenv('OUTBOX_POLL_INTERVAL', '5'))  # seconds
+OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', '20'))
+OUTBOX_CONCURRENCY = int(os.getenv('OUTBOX_CONCURRENCY', '4'))  # blocking (SMTP) deliveries in flight
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', '8'))
+OUTBOX_RETRY_BASE = float(os.getenv('OUTBOX_RETRY_BASE', '30'))  # seconds, doubled per attempt
+OUTBOX_RETRY_MAX = float(os.getenv('OUTBOX_RETRY_MAX', '3600'))  # seconds
+# A claimed entry is not picked up again (by this or another worker) for this long
+OUTBOX_LEASE = float(os.getenv('OUTBOX_LEASE', '120'))  # seconds
+
+# (channel, kind) -> sender; a sender fails by raising or returning False.
+# Coroutine senders (Telegram) are awaited and pace themselves; blocking ones
+# (SMTP) run in the thread pool, at most OUTBOX_CONCURRENCY at a time.
+NOTIFICATION_HANDLERS: Dict[tuple, Callable[[dict], Any]] = {
+    ("telegram", "quote_request"): TelegramService.notify_quote_request,
+    ("telegram", "callback_request"): TelegramService.notify_callback_request,
+    ("telegram", "consultation_request"): TelegramService.notify_consultation_request,
+    ("telegram", "contact_message"): TelegramService.notify_contact_message,
+    ("telegram", "cart_order"): TelegramService.notify_cart_order,
+    ("email", "quote_request"): send_quote_notification_email,
+    ("email", "callback_request"): send_callback_notification_email,
+    ("email", "consultation_request"): send_callback_notification_email,
+    ("email", "contact_message"): send_contact_message_email,
+    ("email", "cart_order"): send_quote_notification_email,
+}
+
+
+def enabled_channels() -> List[str]:
+    """Channels with credentials configured"""
+    channels = []
+    if telegram_service.TELEGRAM_BOT_TOKEN and telegram_service.TELEGRAM_CHAT_ID:
+        channels.append("telegram")
+    if os.getenv('SENDER_EMAIL') and os.getenv('EMAIL_PASSWORD'):
+        channels.append("email")
+    return channels
+
+
+def enqueue_notifications(db: Session, kind: str, payload: dict, email_payload: Optional[dict] = None) -> int:
+    """
+    Add outbox rows for a new request to the caller's transaction
+
+    Args:
+        db: Session that also holds the request row (committed by the caller)
+        kind: Notification kind, see NOTIFICATION_HANDLERS
+        payload: Data for the notification templates
+        email_payload: Email data when it differs from payload
+
+    Returns:
+        Number of rows added
+    """
+    added = 0
+    for channel in enabled_channels():
+        data = email_payload if channel == "email" and email_payload is not None else payload
+        db.add(NotificationOutbox(
+            channel=channel,
+            kind=kind,
+            payload=json.dumps(data, ensure_ascii=False, default=str),
+        ))
+        added += 1
+    return added
+
+
+def retry_delay(attempts: int) -> float:
+    """Backoff before the next attempt after `attempts` failed ones (with +-20% jitter)"""
+    delay = min(OUTBOX_RETRY_MAX, OUTBOX_RETRY_BASE * (2 ** max(attempts - 1, 0)))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def claim_due(limit: int, lease: float = OUTBOX_LEASE) -> List[dict]:
+    """
+    Lease due pending entries for delivery
+
+    Each entry is claimed with a conditional UPDATE that pushes its
+    next_attempt_at past the lease, so concurrent dispatchers never send the
+    same entry twice; an entry whose sender crashed is retried after the lease.
+    """
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        due = db.query(NotificationOutbox).filter(
+            NotificationOutbox.status == "pending",
+            NotificationOutbox.next_attempt_at <= now
+        ).order_by(NotificationOutbox.next_attempt_at).limit(limit).all()
+
+        claimed = []
+        for entry in due:
+            result = db.execute(
+                update(NotificationOutbox)
+                .where(
+                    NotificationOutbox.id == entry.id,
+                    NotificationOutbox.status == "pending",
+                    NotificationOutbox.next_attempt_at <= now
+                )
+                .values(
+                    next_attempt_at=now + timedelta(seconds=lease),
+                    attempts=NotificationOutbox.attempts + 1
+                )
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount == 1:
+                claimed.append({
+                    "id": entry.id,
+                    "channel": entry.channel,
+                    "kind": entry.kind,
+                    "payload": json.loads(entry.payload),
+                    "attempts": (entry.attempts or 0) + 1,
+                })
+        db.commit()
+        return claimed
+    finally:
+        db.close()
+
+
+def mark_sent(entry_id: str):
+    """Record a successful delivery"""
+    db = SessionLocal()
+    try:
+        db.query(NotificationOutbox).filter(NotificationOutbox.id == entry_id).update(
+            {"status": "sent", "sent_at": datetime.utcnow(), "last_error": None},
+            synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def mark_failed(entry_id: str, attempts: int, error: str, max_attempts: int = OUTBOX_MAX_ATTEMPTS) -> str:
+    """
+    Schedule a retry, or dead-letter the entry after max_attempts
+
+    Returns:
+        New status ("pending" or "dead")
+    """
+    status = "dead" if attempts >= max_attempts else "pending"
+    values = {"status": status, "last_error": error[:2000]}
+    if status == "pending":
+        values["next_attempt_at"] = datetime.utcnow() + timedelta(seconds=retry_delay(attempts))
+    db = SessionLocal()
+    try:
+        db.query(NotificationOutbox).filter(NotificationOutbox.id == entry_id).update(
+            values, synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+    return status
+
+
+def requeue(entry_id: str) -> bool:
+    """Put a dead-lettered entry back in the queue (admin retry)"""
+    db = SessionLocal()
+    try:
+        updated = db.query(NotificationOutbox).filter(
+            NotificationOutbox.id == entry_id,
+            NotificationOutbox.status == "dead"
+        ).update(
+            {"status": "pending", "attempts": 0, "next_attempt_at": datetime.utcnow()},
+            synchronize_session=False
+        )
+        db.commit()
+        return updated == 1
+    finally:
+        db.close()
+
+
+class OutboxDispatcher:
+    """Background task delivering outbox entries"""
+
+    def __init__(
+        self,
+        poll_interval: float = OUTBOX_POLL_INTERVAL,
+        batch_size: int = OUTBOX_BATCH_SIZE,
+        concurrency: int = OUTBOX_CONCURRENCY,
+        max_attempts: int = OUTBOX_MAX_ATTEMPTS,
+        handlers: Optional[Dict[tuple, Callable[[dict], Any]]] = None
+    ):
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.handlers = NOTIFICATION_HANDLERS if handlers is None else handlers
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def wake(self):
+        """Deliver new entries now instead of at the next poll (safe from any thread)"""
+        if self._task is not None and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def _send(self, handler: Callable[[dict], Any], payload: dict, semaphore: asyncio.Semaphore):
+        if asyncio.iscoroutinefunction(handler):
+            return await handler(payload)
+        async with semaphore:
+            return await run_blocking(handler, payload)
+
+    async def _deliver(self, entry: dict, semaphore: asyncio.Semaphore):
+        handler = self.handlers.get((entry["channel"], entry["kind"]))
+        try:
+            if handler is None:
+                raise LookupError(f"No handler for {entry['channel']}/{entry['kind']}")
+            if await self._send(handler, entry["payload"], semaphore) is False:
+                raise RuntimeError("Sender reported failure")
+        except Exception as e:
+            status = await run_blocking(mark_failed, entry["id"], entry["attempts"], str(e), self.max_attempts)
+            if status == "dead":
+                logger.error(
+                    f"Notification {entry['id']} ({entry['channel']}/{entry['kind']}) dead-lettered "
+                    f"after {entry['attempts']} attempts: {e}"
+                )
+            else:
+                logger.warning(f"Notification {entry['id']} attempt {entry['attempts']} failed: {e}")
+            return False
+        await run_blocking(mark_sent, entry["id"])
+        return True
+
+    async def dispatch_due(self) -> int:
+        """
+        Deliver one batch of due entries
+
+        Returns:
+            Number of entries attempted
+        """
+        claimed = await run_blocking(claim_due, self.batch_size)
+        if claimed:
+            semaphore = asyncio.Semaphore(self.concurrency)
+            await asyncio.gather(*(self._deliver(entry, semaphore) for entry in claimed))
+        return len(claimed)
+
+    async def _run(self):
+        while True:
+            try:
+                attempted = await self.dispatch_due()
+            except Exception as e:
+                logger.error(f"Notification dispatch failed: {e}")
+                attempted = 0
+            # A full batch means more may be due right away
+            if attempted < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+
+    def start(self):
+        """Start delivering (call from the running event loop)"""
+        if self._task is None:
+            self._loop = asyncio.get_running_loop()
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop delivering; entries in flight are retried after their lease"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._loop = None
+
+
+outbox_dispatcher = OutboxDispatcher()
@@ -0,0 +1,445 @@
+"""
+Sliding-window rate limiter
+Every (rule, client) key keeps two fixed-window counters; the request rate is
+estimated as the current window count plus the previous one weighted by how
+much of it still overlaps the sliding window. That costs O(1) time and memory
+per key. Idle keys are expired in least-recently-used order, amortized O(1)
+per request, and the number of tracked keys is capped.
+
+Counter storage is pluggable (RATE_LIMIT_BACKEND):
+- memory: per process; with several uvicorn workers each one counts separately
+- mmap: fixed-size table in a shared memory file, shared by all workers on a host
+- redis: Redis (or any RESP server); requests are counted locally and the
+  deltas are pushed in one pipelined round trip every RATE_LIMIT_SYNC_INTERVAL
+"""
+import hashlib
+import logging
+import math
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on tracked (rule, client) keys; the least recently seen are dropped first
+RATE_LIMIT_MAX_KEYS = 100_000
+
+RATE_LIMIT_BACKEND = os.getenv('RATE_LIMIT_BACKEND', 'memory')
+RATE_LIMIT_MMAP_PATH = os.getenv(
+    'RATE_LIMIT_MMAP_PATH',
+    os.path.join('/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(), 'uniform-factory-ratelimit')
+)
+RATE_LIMIT_MMAP_SLOTS = int(os.getenv('RATE_LIMIT_MMAP_SLOTS', '131072'))  # 32 bytes each
+RATE_LIMIT_REDIS_URL = os.getenv('RATE_LIMIT_REDIS_URL', 'redis://127.0.0.1:6379/0')
+RATE_LIMIT_SYNC_INTERVAL = float(os.getenv('RATE_LIMIT_SYNC_INTERVAL', '0.5'))  # seconds
+
+
+class RateLimit(NamedTuple):
+    """Allow `limit` requests per `window` seconds"""
+    limit: int
+    window: float
+
+
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    limit: int
+    remaining: int
+    reset: float  # unix time when the current window ends
+    retry_after: float  # seconds to wait before retrying (0 if allowed)
+
+
+def sliding_window_check(
+    window_index: int,
+    previous: int,
+    current: int,
+    rule: RateLimit,
+    now: float
+):
+    """
+    Apply one request to a sliding-window counter
+
+    Args:
+        window_index, previous, current: Stored counter state for the key
+        rule: Limit to enforce
+        now: Current unix time
+
+    Returns:
+        (RateLimitResult, (window_index, previous, current)) - new counter state
+    """
+    index = int(now // rule.window)
+    if index != window_index:
+        previous = current if index == window_index + 1 else 0
+        current = 0
+        window_index = index
+
+    window_start = index * rule.window
+    overlap = 1.0 - (now - window_start) / rule.window
+    estimated = previous * overlap + current
+    reset = window_start + rule.window
+
+    if estimated + 1 > rule.limit:
+        if current + 1 > rule.limit or previous == 0:
+            retry_after = reset - now
+        else:
+            # Wait until the previous window's weight has decayed enough
+            needed_overlap = (rule.limit - current - 1) / previous
+            retry_after = max(0.0, (1.0 - needed_overlap) * rule.window - (now - window_start))
+        result = RateLimitResult(False, rule.limit, 0, reset, max(1.0, math.ceil(retry_after)))
+        return result, (window_index, previous, current)
+
+    current += 1
+    remaining = max(0, int(rule.limit - estimated - 1))
+    return RateLimitResult(True, rule.limit, remaining, reset, 0.0), (window_index, previous, current)
+
+
+def _expire_idle(entries: "OrderedDict[str, list]", now: float):
+    """Drop idle keys from the front of an LRU-ordered dict of [expires_at, ...] entries"""
+    # Keys are ordered by last activity, so expired ones collect at the front.
+    # Each key is removed at most once, which keeps this amortized O(1).
+    while entries:
+        expires_at = next(iter(entries.values()))[0]
+        if expires_at > now:
+            break
+        entries.popitem(last=False)
+
+
+class InMemoryRateLimiter:
+    """Per-process sliding-window limiter"""
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        # key -> [expires_at, window_index, previous, current], oldest activity first
+        self._entries: "OrderedDict[str, list]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self):
+        """Forget all counters"""
+        with self._lock:
+            self._entries.clear()
+
+    def close(self):
+        pass
+
+    def hit(self, key: str, rule: RateLimit, now: Optional[float] = None) -> RateLimitResult:
+        """
+        Count one request for key against rule
+
+        Args:
+            key: Client key, e.g. "contact:203.0.113.7"
+            rule: Limit to enforce
+            now: Current unix time (for tests)
+
+        Returns:
+            RateLimitResult; denied requests are not counted
+        """
+        if now is None:
+            now = time.time()
+
+        with self._lock:
+            _expire_idle(self._entries, now)
+
+            entry = self._entries.get(key)
+            if entry is None:
+                state = (0, 0, 0)
+            else:
+                state = (entry[1], entry[2], entry[3])
+                self._entries.move_to_end(key)
+
+            result, (window_index, previous, current) = sliding_window_check(*state, rule, now)
+            # A key is idle once both of its windows have passed
+            expires_at = (window_index + 2) * rule.window
+            if entry is None:
+                self._entries[key] = [expires_at, window_index, previous, current]
+                if len(self._entries) > self.max_keys:
+                    self._entries.popitem(last=False)
+            else:
+                entry[:] = [expires_at, window_index, previous, current]
+            return result
+
+
+class MmapRateLimiter:
+    """
+    Sliding-window counters in a memory-mapped file shared by all workers
+
+    The file is a fixed open-addressing hash table; slots are guarded by an
+    fcntl lock on the file (across processes) plus a thread lock. When all
+    probe slots of a key are taken, the one closest to expiry is reused, so
+    memory stays fixed under any number of clients.
+    """
+
+    MAGIC = b"UFRL0001"
+    HEADER = struct.Struct("<8sQ")
+    # key hash (0 = empty), window index, previous count, current count, expires at
+    SLOT = struct.Struct("<QqIId")
+    PROBES = 8
+
+    def __init__(self, path: str = RATE_LIMIT_MMAP_PATH, slots: int = RATE_LIMIT_MMAP_SLOTS):
+        import fcntl
+
+        self._fcntl = fcntl
+        self.path = path
+        self._lock = threading.Lock()
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        size = self.HEADER.size + slots * self.SLOT.size
+
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            header = os.pread(self._fd, self.HEADER.size, 0)
+            if len(header) == self.HEADER.size and header[:8] == self.MAGIC:
+                # Another worker created the table; use its size
+                slots = self.HEADER.unpack(header)[1]
+                size = self.HEADER.size + slots * self.SLOT.size
+            else:
+                os.ftruncate(self._fd, size)
+                os.pwrite(self._fd, self.HEADER.pack(self.MAGIC, slots), 0)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+        self.slots = slots
+        self._map = mmap.mmap(self._fd, size)
+
+    @staticmethod
+    def _key_hash(key: str) -> int:
+        # Stable across processes (hash() is salted per process); never 0
+        return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little") or 1
+
+    def _offset(self, slot: int) -> int:
+        return self.HEADER.size + slot * self.SLOT.size
+
+    def _find_slot(self, key_hash: int, now: float) -> Tuple[int, Optional[tuple]]:
+        """Slot holding key_hash (with its state) or the slot to (re)use for it"""
+        start = key_hash % self.slots
+        free_slot = None
+        oldest_slot, oldest_expiry = start, math.inf
+        for probe in range(self.PROBES):
+            slot = (start + probe) % self.slots
+            stored_hash, window_index, previous, current, expires_at = self.SLOT.unpack_from(
+                self._map, self._offset(slot)
+            )
+            if stored_hash == key_hash:
+                if expires_at <= now:
+                    return slot, None
+                return slot, (window_index, previous, current)
+            if free_slot is None and (stored_hash == 0 or expires_at <= now):
+                free_slot = slot
+            if expires_at < oldest_expiry:
+                oldest_slot, oldest_expiry = slot, expires_at
+        return (free_slot if free_slot is not None else oldest_slot), None
+
+    def hit(self, key: str, rule: RateLimit, now: Optional[float] = None) -> RateLimitResult:
+        """Count one request for key against rule, see InMemoryRateLimiter.hit"""
+        if now is None:
+            now = time.time()
+        key_hash = self._key_hash(key)
+
+        with self._lock:
+            self._fcntl.flock(self._fd, self._fcntl.LOCK_EX)
+            try:
+                slot, state = self._find_slot(key_hash, now)
+                result, (window_index, previous, current) = sliding_window_check(
+                    *(state or (0, 0, 0)), rule, now
+                )
+                self.SLOT.pack_into(
+                    self._map, self._offset(slot),
+                    key_hash, window_index, previous, current, (window_index + 2) * rule.window
+                )
+            finally:
+                self._fcntl.flock(self._fd, self._fcntl.LOCK_UN)
+        return result
+
+    def clear(self):
+        """Forget all counters (for every worker sharing the file)"""
+        with self._lock:
+            self._fcntl.flock(self._fd, self._fcntl.LOCK_EX)
+            try:
+                start = self.HEADER.size
+                self._map[start:] = bytes(len(self._map) - start)
+            finally:
+                self._fcntl.flock(self._fd, self._fcntl.LOCK_UN)
+
+    def close(self):
+        self._map.close()
+        os.close(self._fd)
+
+
+class RedisRateLimiter:
+    """
+    Sliding-window counters shared through Redis, counted locally in between
+
+    Requests are decided against the last known global counts plus this
+    worker's own unsynced hits, so the request path never waits on Redis.
+    A background thread pushes the deltas with INCRBY every sync_interval
+    and reads back the global totals. Other workers' traffic is therefore
+    seen with at most sync_interval delay; if Redis is unreachable the
+    limiter keeps enforcing the limits locally and retries the push later.
+    """
+
+    KEY_PREFIX = "ratelimit:"
+    # Keys per pipelined round trip
+    SYNC_BATCH = 500
+
+    def __init__(
+        self,
+        url: str = RATE_LIMIT_REDIS_URL,
+        sync_interval: float = RATE_LIMIT_SYNC_INTERVAL,
+        max_keys: int = RATE_LIMIT_MAX_KEYS,
+        background: bool = True
+    ):
+        from resp_client import RespClient
+
+        self.client = RespClient(url)
+        self.sync_interval = sync_interval
+        self.max_keys = max_keys
+        self.background = background
+        # key -> [expires_at, window_index, previous, known_current, unsynced, window]
+        self._entries: "OrderedDict[str, list]" = OrderedDict()
+        self._dirty = set()
+        # Deltas of windows that rolled over before they were pushed: redis key -> [delta, ttl]
+        self._pending: Dict[str, list] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def _redis_key(self, key: str, window_index: int) -> str:
+        return f"{self.KEY_PREFIX}{key}:{window_index}"
+
+    def _defer(self, key: str, window_index: int, unsynced: int, window: float):
+        """Queue unsynced hits of a window no longer tracked in _entries for the next sync (lock held)"""
+        if unsynced:
+            pending = self._pending.setdefault(self._redis_key(key, window_index), [0, int(window * 2)])
+            pending[0] += unsynced
+
+    def hit(self, key: str, rule: RateLimit, now: Optional[float] = None) -> RateLimitResult:
+        """Count one request for key against rule, see InMemoryRateLimiter.hit"""
+        if now is None:
+            now = time.time()
+        if self.background and self._thread is None:
+            self._start()
+
+        with self._lock:
+            _expire_idle(self._entries, now)
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = [0.0, 0, 0, 0, 0, rule.window]
+                self._entries[key] = entry
+                if len(self._entries) > self.max_keys:
+                    old_key, old_entry = self._entries.popitem(last=False)
+                    self._dirty.discard(old_key)
+                    # The evicted key's hits still count towards the global limit
+                    self._defer(old_key, old_entry[1], old_entry[4], old_entry[5])
+            else:
+                self._entries.move_to_end(key)
+
+            _, window_index, previous, known, unsynced, _ = entry
+            index = int(now // rule.window)
+            if index != window_index:
+                self._defer(key, window_index, unsynced, rule.window)
+                previous = known + unsynced if index == window_index + 1 else 0
+                known, unsynced, window_index = 0, 0, index
+
+            result, (window_index, previous, current) = sliding_window_check(
+                window_index, previous, known + unsynced, rule, now
+            )
+            unsynced = current - known
+            entry[:] = [(window_index + 2) * rule.window, window_index, previous, known, unsynced, rule.window]
+            self._dirty.add(key)
+            return result
+
+    def sync(self) -> bool:
+        """
+        Push local deltas and refresh global counts of recently used keys
+
+        Returns:
+            False if Redis could not be reached (deltas are kept for the next sync)
+        """
+        with self._lock:
+            batch = []
+            for key in self._dirty:
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                window_index, unsynced, window = entry[1], entry[4], entry[5]
+                entry[3] += unsynced
+                entry[4] = 0
+                batch.append((key, window_index, unsynced, int(window * 2)))
+            self._dirty = set()
+            pending, self._pending = self._pending, {}
+
+        # (redis key, delta, ttl, local key, window index); local key is None for rolled-over windows
+        updates = [
+            (self._redis_key(key, window_index), delta, ttl, key, window_index)
+            for key, window_index, delta, ttl in batch
+        ]
+        updates += [(redis_key, delta, ttl, None, None) for redis_key, (delta, ttl) in pending.items()]
+
+        for position in range(0, len(updates), self.SYNC_BATCH):
+            chunk = updates[position:position + self.SYNC_BATCH]
+            commands = []
+            for redis_key, delta, ttl, _, _ in chunk:
+                commands.append(("INCRBY", redis_key, delta))
+                commands.append(("EXPIRE", redis_key, ttl))
+            try:
+                replies = self.client.pipeline(commands)
+            except Exception as e:
+                logger.warning(f"Rate limit sync failed, counting locally: {e}")
+                with self._lock:
+                    for redis_key, delta, ttl, _, _ in updates[position:]:
+                        if delta:
+                            retry = self._pending.setdefault(redis_key, [0, ttl])
+                            retry[0] += delta
+                return False
+
+            with self._lock:
+                for (_, _, _, key, window_index), total in zip(chunk, replies[0::2]):
+                    entry = self._entries.get(key) if key is not None else None
+                    if entry is None or isinstance(total, Exception):
+                        continue
+                    if entry[1] == window_index:
+                        entry[3] = max(entry[3], total)
+                    elif entry[1] == window_index + 1:
+                        entry[2] = max(entry[2], total)
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.sync_interval):
+            self.sync()
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="rate-limit-sync", daemon=True)
+                self._thread.start()
+
+    def clear(self):
+        """Forget local counters (global counts expire in Redis on their own)"""
+        with self._lock:
+            self._entries.clear()
+            self._dirty = set()
+            self._pending = {}
+
+    def close(self):
+        """Stop background sync after a final push"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.sync()
+        self.client.close()
+
+
+def create_rate_limiter(backend: str = RATE_LIMIT_BACKEND):
+    """Rate limiter for the configured RATE_LIMIT_BACKEND (memory, mmap or redis)"""
+    if backend == 'mmap':
+        return MmapRateLimiter()
+    if backend == 'redis':
+        return RedisRateLimiter()
+    if backend != 'memory':
+        logger.warning(f"Unknown RATE_LIMIT_BACKEND {backend!r}, using memory")
+    return InMemoryRateLimiter()
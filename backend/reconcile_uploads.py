@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Rebuild the upload catalog from the uploads directory
+Creates the uploaded_files table if needed, adds files it does not know,
+re-reads files whose size or mtime changed and drops rows of files that
+are gone. deploy-to-sweb.sh runs it on every deploy; run it by hand after
+copying files into or removing them from uploads/.
+Run from the backend directory (next to uploads/).
+
+Usage:
+    python reconcile_uploads.py
+"""
+import sys
+import time
+
+from database_sqlite import SessionLocal, UploadedFile, engine
+from image_variants import UPLOAD_DIR
+from upload_catalog import reconcile
+
+def reconcile_uploads():
+    """Sync uploaded_files with the files on disk"""
+    try:
+        print(f"=== Reconciling upload catalog with {UPLOAD_DIR} ===\n")
+        
+        UploadedFile.__table__.create(bind=engine, checkfirst=True)
+        
+        started = time.perf_counter()
+        db = SessionLocal()
+        try:
+            result = reconcile(db)
+            db.commit()
+            total = db.query(UploadedFile).count()
+        finally:
+            db.close()
+        
+        print(f"  added: {result.added}")
+        print(f"  updated: {result.updated}")
+        print(f"  removed: {result.removed}")
+        print(f"  unchanged: {result.unchanged}")
+        print(f"\n✅ {total} files catalogued in {time.perf_counter() - started:.1f}s")
+        
+    except Exception as e:
+        print(f"\n❌ Reconcile failed: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    reconcile_uploads()
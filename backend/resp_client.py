@@ -0,0 +1,124 @@
+"""
+Minimal Redis protocol (RESP2) client
+Enough for pipelined counter updates (INCRBY/EXPIRE/GET) against Redis or a
+compatible server, without adding a client library dependency.
+"""
+import socket
+import threading
+from typing import Any, List, Optional, Sequence
+from urllib.parse import urlparse
+
+
+class RespError(Exception):
+    """Error reply from the server or broken connection"""
+
+
+class RespClient:
+    """Blocking RESP2 client with pipelining, reconnects on the next call after a failure"""
+
+    def __init__(self, url: str = "redis://127.0.0.1:6379/0", timeout: float = 1.0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        path = (parsed.path or "").lstrip("/")
+        self.db = int(path) if path else 0
+        self.timeout = timeout
+        self._sock: Optional[socket.socket] = None
+        self._reader = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._sock = sock
+        self._reader = sock.makefile("rb")
+        setup = []
+        if self.password:
+            setup.append(("AUTH", self.password))
+        if self.db:
+            setup.append(("SELECT", self.db))
+        if setup:
+            for reply in self._roundtrip(setup):
+                if isinstance(reply, RespError):
+                    raise reply
+
+    def close(self):
+        """Close the connection"""
+        with self._lock:
+            self._close()
+
+    def _close(self):
+        if self._sock is not None:
+            try:
+                self._reader.close()
+                self._sock.close()
+            except OSError:
+                pass
+        self._sock = None
+        self._reader = None
+
+    @staticmethod
+    def _encode(command: Sequence[Any]) -> bytes:
+        parts = [b"*%d\r\n" % len(command)]
+        for arg in command:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        return b"".join(parts)
+
+    def _read_reply(self):
+        line = self._reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise RespError("Connection closed by server")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload.decode("utf-8")
+        if kind == b"-":
+            return RespError(payload.decode("utf-8"))
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length == -1:
+                return None
+            data = self._reader.read(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            length = int(payload)
+            if length == -1:
+                return None
+            return [self._read_reply() for _ in range(length)]
+        raise RespError(f"Unexpected reply type: {line!r}")
+
+    def _roundtrip(self, commands: List[Sequence[Any]]) -> list:
+        self._sock.sendall(b"".join(self._encode(command) for command in commands))
+        return [self._read_reply() for _ in commands]
+
+    def pipeline(self, commands: List[Sequence[Any]]) -> list:
+        """
+        Send commands in one round trip
+
+        Returns:
+            One reply per command; error replies are returned as RespError instances
+
+        Raises:
+            RespError: If the server cannot be reached
+        """
+        if not commands:
+            return []
+        with self._lock:
+            try:
+                if self._sock is None:
+                    self._connect()
+                return self._roundtrip(commands)
+            except (OSError, RespError) as e:
+                self._close()
+                raise RespError(str(e)) from e
+
+    def execute(self, *command) -> Any:
+        """Send a single command and return its reply"""
+        reply = self.pipeline([command])[0]
+        if isinstance(reply, RespError):
+            raise reply
+        return reply
@@ -7,14 +7,15 @@ Includes:
 - Input sanitization
 """
 
-from fastapi import Request, HTTPException, UploadFile
-from fastapi.responses import Response
-from starlette.middleware.base import BaseHTTPMiddleware
-from typing import Dict, Tuple
-import time
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+from typing import List, Tuple
+import os
 import re
 from pathlib import Path
 
+from rate_limiter import RateLimit, create_rate_limiter
+
 # File upload constraints
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
 ALLOWED_IMAGE_TYPES = {
@@ -24,84 +25,125 @@ ALLOWED_IMAGE_TYPES = {
 ALLOWED_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp', '.gif'}
 
 # Rate limiting configuration
+RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'true').lower() not in ('0', 'false', 'no')
 RATE_LIMIT_WINDOW = 60  # seconds
-RATE_LIMIT_MAX_REQUESTS = 60  # requests per window
-rate_limit_store: Dict[str, Tuple[int, float]] = {}
+RATE_LIMIT_MAX_REQUESTS = 60  # requests per window (routes without a rule below)
+
+# Per-route limits: (path prefix, bucket name, limit). First match wins.
+# Form submissions are strict, catalog reads are loose (listing pages fan out).
+RATE_LIMIT_RULES: List[Tuple[str, str, RateLimit]] = [
+    ('/api/contact/', 'forms', RateLimit(10, RATE_LIMIT_WINDOW)),
+    ('/api/cart/submit-order', 'orders', RateLimit(5, RATE_LIMIT_WINDOW)),
+    ('/api/calculator/quote-request', 'orders', RateLimit(5, RATE_LIMIT_WINDOW)),
+    ('/api/admin/login', 'login', RateLimit(10, RATE_LIMIT_WINDOW)),
+    ('/api/products', 'catalog', RateLimit(300, RATE_LIMIT_WINDOW)),
+    ('/api/categories', 'catalog', RateLimit(300, RATE_LIMIT_WINDOW)),
+]
+DEFAULT_RATE_LIMIT = RateLimit(RATE_LIMIT_MAX_REQUESTS, RATE_LIMIT_WINDOW)
+RATE_LIMIT_EXEMPT_PREFIXES = ('/api/uploads/',)
+
+# Counter storage from RATE_LIMIT_BACKEND (memory, mmap or redis), see rate_limiter.py
+rate_limiter = create_rate_limiter()
+
+
+def get_rate_limit_rule(path: str) -> Tuple[str, RateLimit]:
+    """Bucket name and limit for a request path"""
+    for prefix, bucket, rule in RATE_LIMIT_RULES:
+        if path.startswith(prefix):
+            return bucket, rule
+    return 'default', DEFAULT_RATE_LIMIT
+
+
+# Content Security Policy (relaxed for embedded maps and external resources)
+CSP_DIRECTIVES = [
+    "default-src 'self'",
+    "script-src 'self' 'unsafe-inline' 'unsafe-eval' https://mc.yandex.ru",
+    "style-src 'self' 'unsafe-inline' https://fonts.googleapis.com",
+    "img-src 'self' data: https: http:",
+    "font-src 'self' https://fonts.gstatic.com",
+    "frame-src 'self' https://yandex.ru https://mc.yandex.ru",
+    "connect-src 'self' https://mc.yandex.ru",
+]
 
+# Encoded once at import, added as raw ASGI headers to every response
+SECURITY_HEADERS = [
+    (b'x-content-type-options', b'nosniff'),
+    (b'x-frame-options', b'DENY'),
+    (b'x-xss-protection', b'1; mode=block'),
+    (b'strict-transport-security', b'max-age=31536000; includeSubDomains'),
+    (b'content-security-policy', "; ".join(CSP_DIRECTIVES).encode('latin-1')),
+]
+SECURITY_HEADER_NAMES = frozenset(name for name, _ in SECURITY_HEADERS)
 
-class SecurityHeadersMiddleware(BaseHTTPMiddleware):
-    """Add security headers to all responses"""
+
+class SecurityHeadersMiddleware:
+    """Add security headers to all responses (pure ASGI, streaming bodies pass through untouched)"""
     
-    async def dispatch(self, request: Request, call_next):
-        response = await call_next(request)
-        
-        # Security headers
-        response.headers['X-Content-Type-Options'] = 'nosniff'
-        response.headers['X-Frame-Options'] = 'DENY'
-        response.headers['X-XSS-Protection'] = '1; mode=block'
-        response.headers['Strict-Transport-Security'] = 'max-age=31536000; includeSubDomains'
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
         
-        # Content Security Policy (relaxed for embedded maps and external resources)
-        csp_directives = [
-            "default-src 'self'",
-            "script-src 'self' 'unsafe-inline' 'unsafe-eval' https://mc.yandex.ru",
-            "style-src 'self' 'unsafe-inline' https://fonts.googleapis.com",
-            "img-src 'self' data: https: http:",
-            "font-src 'self' https://fonts.gstatic.com",
-            "frame-src 'self' https://yandex.ru https://mc.yandex.ru",
-            "connect-src 'self' https://mc.yandex.ru",
-        ]
-        response.headers['Content-Security-Policy'] = "; ".join(csp_directives)
+        async def send_with_headers(message):
+            if message['type'] == 'http.response.start':
+                headers = [
+                    (name, value) for name, value in message.get('headers', ())
+                    if name.lower() not in SECURITY_HEADER_NAMES
+                ]
+                headers.extend(SECURITY_HEADERS)
+                message['headers'] = headers
+            await send(message)
         
-        return response
+        await self.app(scope, receive, send_with_headers)
 
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    """Simple rate limiting middleware"""
+class RateLimitMiddleware:
+    """Sliding-window rate limiting per client IP and route group (pure ASGI)"""
     
-    async def dispatch(self, request: Request, call_next):
-        # Skip rate limiting for static files
-        if request.url.path.startswith('/api/uploads/'):
-            return await call_next(request)
-        
-        # Get client IP
-        client_ip = request.client.host
-        current_time = time.time()
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
         
-        # Clean up old entries
-        global rate_limit_store
-        rate_limit_store = {
-            ip: (count, timestamp) 
-            for ip, (count, timestamp) in rate_limit_store.items()
-            if current_time - timestamp < RATE_LIMIT_WINDOW
-        }
+        path = scope['path']
+        if not RATE_LIMIT_ENABLED or scope['method'] == 'OPTIONS' or path.startswith(RATE_LIMIT_EXEMPT_PREFIXES):
+            await self.app(scope, receive, send)
+            return
         
-        # Check rate limit
-        if client_ip in rate_limit_store:
-            count, first_request_time = rate_limit_store[client_ip]
-            
-            if current_time - first_request_time < RATE_LIMIT_WINDOW:
-                if count >= RATE_LIMIT_MAX_REQUESTS:
-                    raise HTTPException(
-                        status_code=429, 
-                        detail="Слишком много запросов. Пожалуйста, попробуйте позже."
-                    )
-                rate_limit_store[client_ip] = (count + 1, first_request_time)
-            else:
-                rate_limit_store[client_ip] = (1, current_time)
-        else:
-            rate_limit_store[client_ip] = (1, current_time)
+        client = scope.get('client')
+        client_ip = client[0] if client else 'unknown'
+        bucket, rule = get_rate_limit_rule(path)
+        result = rate_limiter.hit(f"{bucket}:{client_ip}", rule)
         
-        response = await call_next(request)
+        headers = [
+            (b'x-ratelimit-limit', str(result.limit).encode()),
+            (b'x-ratelimit-remaining', str(result.remaining).encode()),
+            (b'x-ratelimit-reset', str(int(result.reset)).encode()),
+        ]
+        if not result.allowed:
+            response = JSONResponse(
+                status_code=429,
+                content={"detail": "Слишком много запросов. Пожалуйста, попробуйте позже."},
+                headers={
+                    **{name.decode(): value.decode() for name, value in headers},
+                    'Retry-After': str(int(result.retry_after)),
+                }
+            )
+            await response(scope, receive, send)
+            return
         
-        # Add rate limit headers
-        if client_ip in rate_limit_store:
-            count, _ = rate_limit_store[client_ip]
-            response.headers['X-RateLimit-Limit'] = str(RATE_LIMIT_MAX_REQUESTS)
-            response.headers['X-RateLimit-Remaining'] = str(max(0, RATE_LIMIT_MAX_REQUESTS - count))
-            response.headers['X-RateLimit-Reset'] = str(int(current_time + RATE_LIMIT_WINDOW))
+        async def send_with_headers(message):
+            if message['type'] == 'http.response.start':
+                message['headers'] = list(message.get('headers', ())) + headers
+            await send(message)
         
-        return response
+        await self.app(scope, receive, send_with_headers)
 
 
 async def validate_upload_file(file: UploadFile) -> None:
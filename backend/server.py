@@ -1,4 +1,4 @@
-from fastapi import FastAPI, APIRouter, HTTPException, BackgroundTasks, Request
+from fastapi import FastAPI, APIRouter, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 from pathlib import Path
@@ -14,17 +14,41 @@ from database_sqlite import init_sqlite_database
 # Import admin routes
 from admin_routes import admin_router
 
-# Import email service
-from email_service import send_quote_notification_email, send_callback_notification_email, send_contact_message_email, EmailDeliveryError
-
-# Import Telegram service
-from telegram_service import TelegramService
-
 # Import security middleware
-from security_middleware import SecurityHeadersMiddleware, RateLimitMiddleware, sanitize_string, sanitize_email, sanitize_phone
+from security_middleware import SecurityHeadersMiddleware, RateLimitMiddleware, rate_limiter, sanitize_string, sanitize_email, sanitize_phone
 
 # Import geo service
-from geo_service import get_region_by_ip
+from geo_service import geo_resolver, get_region_by_ip
+
+# Import catalog snapshot cache
+from catalog_cache import catalog_cache
+from http_cache import dumps_json, etag_matches, http_date, not_modified_since, not_modified_response, json_bytes_response
+
+# Import in-process sitemap generation
+from generate_sitemap import GZIP_SUFFIX, INDEX_NAME as SITEMAP_INDEX_NAME, SITE_URL, SitemapStore
+from fastapi.responses import FileResponse
+
+# Import response compression
+from compression import CompressionMiddleware, encoded_etag, negotiate_encoding
+
+# Import buffered product view counter
+from view_counter import view_counter
+
+# Import notification outbox and the SMTP/Telegram clients it sends through
+from notification_outbox import enqueue_notifications, outbox_dispatcher
+from email_service import smtp_pool
+from telegram_service import telegram_client
+
+# Import responsive image variants of uploads and the static file handler
+from image_variants import image_pipeline
+from static_files import file_response, stat_cache
+
+# Import thread pool configuration for blocking handlers
+from executor import configure_thread_pool, run_blocking
+
+# Import async service layer (used when USE_ASYNC_DB is enabled)
+from services_async import AsyncCatalogService, AsyncProductService, AsyncQuoteService, call_service
+from database_sqlite import dispose_async_engine
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -33,9 +57,20 @@ load_dotenv(ROOT_DIR / '.env')
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
+    configure_thread_pool()
     init_sqlite_database()
+    view_counter.start()
+    outbox_dispatcher.start()
     yield
-    # Shutdown - SQLite doesn't need explicit closing
+    # Shutdown - write buffered product views
+    await view_counter.stop()
+    await outbox_dispatcher.stop()
+    await run_blocking(smtp_pool.close)
+    await telegram_client.close()
+    await dispose_async_engine()
+    await geo_resolver.close()
+    rate_limiter.close()
+    image_pipeline.close()
 
 # Create FastAPI app
 app = FastAPI(lifespan=lifespan)
@@ -43,6 +78,12 @@ app = FastAPI(lifespan=lifespan)
 # Create API router
 api_router = APIRouter(prefix="/api")
 
+# Compression is innermost so it only sees responses produced by the app
+app.add_middleware(CompressionMiddleware)
+
+# Rate limiting sits inside CORS so browsers can read 429 responses
+app.add_middleware(RateLimitMiddleware)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -50,11 +91,11 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor", "Retry-After"],
 )
 
 # Add security middlewares
 app.add_middleware(SecurityHeadersMiddleware)
-app.add_middleware(RateLimitMiddleware)
 
 # Configure logging
 logging.basicConfig(
@@ -83,7 +124,7 @@ async def get_user_region(request: Request):
     - region: Регион
     - country: Страна
     - phone: Телефон для региона
-    - source: Источник данных (ipapi/fallback/local)
+    - source: Источник данных (geodb/ipapi/fallback/local)
     """
     try:
         # Получаем IP из заголовков (если за прокси) или из клиента
@@ -97,7 +138,7 @@ async def get_user_region(request: Request):
         logger.info(f"Getting region for IP: {ip_address}")
         
         # Получаем регион и телефон
-        result = get_region_by_ip(ip_address)
+        result = await get_region_by_ip(ip_address)
         
         return result
     except Exception as e:
@@ -112,13 +153,39 @@ async def get_user_region(request: Request):
             "source": "error"
         }
 
+# Clients may keep catalog responses but must revalidate them with the ETag
+CATALOG_CACHE_CONTROL = "public, no-cache"
+
+def catalog_json_response(request: Request, key: tuple, builder):
+    """
+    Serve a catalog snapshot as pre-encoded JSON with ETag validation
+
+    A matching If-None-Match is answered with 304 without touching the database.
+    Compressed variants come precompressed from the cache, once per catalog version.
+    """
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+    headers = {"Cache-Control": CATALOG_CACHE_CONTROL, "Vary": "Accept-Encoding"}
+
+    etag = encoded_etag(catalog_cache.etag(key), encoding)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified_response({"ETag": etag, **headers})
+    
+    body, etag = catalog_cache.get_encoded_json(key, builder, encoding)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return json_bytes_response(body, {"ETag": etag, **headers})
+
+def paged_json_response(items: list, next_cursor: Optional[str]):
+    """List response with the keyset cursor of the next page in X-Next-Cursor"""
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    return json_bytes_response(dumps_json(items), headers)
+
 # Categories endpoints
 @api_router.get("/categories")
-async def get_categories():
+def get_categories(request: Request):
     """Get all product categories"""
     try:
-        categories = CatalogService.get_categories()
-        return categories
+        return catalog_json_response(request, ("categories",), CatalogService.get_categories)
     except Exception as e:
         logger.error(f"Error getting categories: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
@@ -127,7 +194,9 @@ async def get_categories():
 async def get_category_by_slug(slug: str):
     """Get category by slug"""
     try:
-        category = CatalogService.get_category_by_slug(slug)
+        category = await call_service(
+            AsyncCatalogService.get_category_by_slug, CatalogService.get_category_by_slug, slug
+        )
         if not category:
             raise HTTPException(status_code=404, detail="Category not found")
         return category
@@ -139,7 +208,7 @@ async def get_category_by_slug(slug: str):
 
 # Portfolio endpoints
 @api_router.get("/portfolio")
-async def get_portfolio(category: Optional[str] = None):
+def get_portfolio(category: Optional[str] = None):
     """Get portfolio items with optional category filter"""
     try:
         items = PortfolioService.get_portfolio_items(category)
@@ -149,7 +218,7 @@ async def get_portfolio(category: Optional[str] = None):
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @api_router.get("/portfolio/{item_id}")
-async def get_portfolio_item(item_id: str):
+def get_portfolio_item(item_id: str):
     """Get portfolio item by ID"""
     try:
         item = PortfolioService.get_portfolio_item_by_id(item_id)
@@ -164,7 +233,7 @@ async def get_portfolio_item(item_id: str):
 
 # Calculator endpoints
 @api_router.get("/calculator/options")
-async def get_calculator_options():
+def get_calculator_options():
     """Get calculator configuration options"""
     try:
         return CalculatorService.get_calculator_options()
@@ -173,7 +242,7 @@ async def get_calculator_options():
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @api_router.post("/calculator/estimate")
-async def calculate_estimate(request: CalculatorEstimateRequest):
+def calculate_estimate(request: CalculatorEstimateRequest):
     """Calculate price estimate"""
     try:
         estimate = CalculatorService.calculate_estimate(request)
@@ -185,33 +254,14 @@ async def calculate_estimate(request: CalculatorEstimateRequest):
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @api_router.post("/calculator/quote-request")
-async def create_quote_request(request: QuoteRequestCreate, background_tasks: BackgroundTasks):
+async def create_quote_request(request: QuoteRequestCreate):
     """Create a new quote request"""
     try:
-        response = QuoteService.create_quote_request(request)
-        
-        # Prepare notification data
-        from datetime import datetime
-        request_data = {
-            'request_id': response.request_id,
-            'name': request.name,
-            'email': request.email,
-            'phone': request.phone,
-            'company': request.company,
-            'category': request.category,
-            'quantity': request.quantity,
-            'fabric': request.fabric,
-            'branding': request.branding,
-            'estimated_price': request.estimated_price,
-            'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        }
-        
-        # Send email notification in background
-        if os.getenv('SENDER_EMAIL') and os.getenv('EMAIL_PASSWORD'):
-            background_tasks.add_task(send_quote_notification_email, request_data)
-        
-        # Send Telegram notification in background
-        background_tasks.add_task(TelegramService.send_quote_request_notification, request_data)
+        # Telegram/email notifications are queued in the same transaction
+        response = await call_service(
+            AsyncQuoteService.create_quote_request, QuoteService.create_quote_request, request
+        )
+        outbox_dispatcher.wake()
         
         return response
     except Exception as e:
@@ -220,28 +270,12 @@ async def create_quote_request(request: QuoteRequestCreate, background_tasks: Ba
 
 # Contact endpoints
 @api_router.post("/contact/callback-request")
-async def create_callback_request(request: CallbackRequestCreate, background_tasks: BackgroundTasks):
+def create_callback_request(request: CallbackRequestCreate):
     """Create callback request"""
     try:
+        # Telegram/email notifications are queued in the same transaction
         response = ContactService.create_callback_request(request)
-        
-        # Prepare notification data
-        from datetime import datetime
-        request_data = {
-            'name': request.name,
-            'phone': request.phone,
-            'email': request.email,
-            'company': request.company,
-            'message': getattr(request, 'message', None),
-            'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        }
-        
-        # Send email notification in background
-        if os.getenv('SENDER_EMAIL') and os.getenv('EMAIL_PASSWORD'):
-            background_tasks.add_task(send_callback_notification_email, request_data)
-        
-        # Send Telegram notification in background
-        background_tasks.add_task(TelegramService.send_callback_request_notification, request_data)
+        outbox_dispatcher.wake()
         
         return response
     except Exception as e:
@@ -249,28 +283,12 @@ async def create_callback_request(request: CallbackRequestCreate, background_tas
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @api_router.post("/contact/consultation")
-async def create_consultation_request(request: ConsultationRequestCreate, background_tasks: BackgroundTasks):
+def create_consultation_request(request: ConsultationRequestCreate):
     """Create consultation request"""
     try:
+        # Telegram/email notifications are queued in the same transaction
         response = ContactService.create_consultation_request(request)
-        
-        # Prepare notification data
-        from datetime import datetime
-        request_data = {
-            'name': request.name,
-            'phone': request.phone,
-            'email': request.email,
-            'company': request.company,
-            'message': getattr(request, 'message', None),
-            'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        }
-        
-        # Send email notification in background
-        if os.getenv('SENDER_EMAIL') and os.getenv('EMAIL_PASSWORD'):
-            background_tasks.add_task(send_callback_notification_email, request_data)
-        
-        # Send Telegram notification in background
-        background_tasks.add_task(TelegramService.send_consultation_request_notification, request_data)
+        outbox_dispatcher.wake()
         
         return response
     except Exception as e:
@@ -278,28 +296,12 @@ async def create_consultation_request(request: ConsultationRequestCreate, backgr
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @api_router.post("/contact/message")
-async def create_contact_message(request: ContactMessageCreate, background_tasks: BackgroundTasks):
+def create_contact_message(request: ContactMessageCreate):
     """Create general contact message"""
     try:
+        # Telegram/email notifications are queued in the same transaction
         response = ContactService.create_contact_message(request)
-        
-        # Prepare notification data
-        from datetime import datetime
-        request_data = {
-            'name': request.name,
-            'email': request.email,
-            'phone': request.phone,
-            'company': request.company,
-            'message': request.message,
-            'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        }
-        
-        # Send email notification in background
-        if os.getenv('SENDER_EMAIL') and os.getenv('EMAIL_PASSWORD'):
-            background_tasks.add_task(send_contact_message_email, request_data)
-        
-        # Send Telegram notification in background
-        background_tasks.add_task(TelegramService.send_contact_message_notification, request_data)
+        outbox_dispatcher.wake()
         
         return response
     except Exception as e:
@@ -308,7 +310,7 @@ async def create_contact_message(request: ContactMessageCreate, background_tasks
 
 # Cart Order endpoint
 @api_router.post("/cart/submit-order")
-async def submit_cart_order(order: CartOrderCreate, background_tasks: BackgroundTasks):
+def submit_cart_order(order: CartOrderCreate):
     """Submit order from cart"""
     try:
         from datetime import datetime
@@ -359,7 +361,6 @@ async def submit_cart_order(order: CartOrderCreate, background_tasks: Background
                 status="new"
             )
             db.add(db_order)
-            db.commit()
             
             # Prepare notification data
             order_data = {
@@ -386,24 +387,22 @@ async def submit_cart_order(order: CartOrderCreate, background_tasks: Background
                 'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             }
             
-            # Send Telegram notification in background
-            background_tasks.add_task(TelegramService.send_cart_order_notification, order_data)
-            
-            # Send email if configured
-            if os.getenv('SENDER_EMAIL') and os.getenv('EMAIL_PASSWORD'):
-                background_tasks.add_task(send_quote_notification_email, {
-                    'request_id': request_id,
-                    'name': order.customer_name,
-                    'email': order.customer_email,
-                    'phone': order.customer_phone,
-                    'company': '',
-                    'category': 'Заказ из корзины',
-                    'quantity': f"{sum([item.quantity for item in order.items])} товаров",
-                    'fabric': '',
-                    'branding': '',
-                    'estimated_price': order.total_amount,
-                    'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                })
+            # Queue Telegram/email notifications in the same transaction as the order
+            enqueue_notifications(db, "cart_order", order_data, email_payload={
+                'request_id': request_id,
+                'name': order.customer_name,
+                'email': order.customer_email,
+                'phone': order.customer_phone,
+                'company': '',
+                'category': 'Заказ из корзины',
+                'quantity': f"{sum([item.quantity for item in order.items])} товаров",
+                'fabric': '',
+                'branding': '',
+                'estimated_price': order.total_amount,
+                'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            })
+            db.commit()
+            outbox_dispatcher.wake()
             
             return {
                 'success': True,
@@ -418,7 +417,7 @@ async def submit_cart_order(order: CartOrderCreate, background_tasks: Background
 
 # Testimonials endpoint
 @api_router.get("/testimonials")
-async def get_testimonials():
+def get_testimonials():
     """Get all testimonials"""
     try:
         testimonials = TestimonialService.get_testimonials()
@@ -429,7 +428,7 @@ async def get_testimonials():
 
 # Statistics endpoint
 @api_router.get("/statistics")
-async def get_statistics():
+def get_statistics():
     """Get company statistics"""
     try:
         stats = StatisticsService.get_statistics()
@@ -443,7 +442,7 @@ async def get_statistics():
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @api_router.get("/settings")
-async def get_settings():
+def get_settings():
     """Get app settings (public endpoint for frontend)"""
     try:
         settings = SettingsService.get_settings()
@@ -454,7 +453,7 @@ async def get_settings():
 
 # Legal Documents endpoints (public)
 @api_router.get("/legal/{doc_type}")
-async def get_legal_document_public(doc_type: str):
+def get_legal_document_public(doc_type: str):
     """Get legal document (public access)"""
     try:
         from database_sqlite import LegalDocument, SessionLocal
@@ -482,7 +481,7 @@ async def get_legal_document_public(doc_type: str):
 
 # Analytics endpoints
 @api_router.post("/analytics/web-vitals")
-async def save_web_vitals(metric: WebVitalsMetric):
+def save_web_vitals(metric: WebVitalsMetric):
     """Save Web Vitals metric"""
     try:
         from database_sqlite import WebVitals, SessionLocal
@@ -511,7 +510,7 @@ async def save_web_vitals(metric: WebVitalsMetric):
 
 # Admin endpoints (for future use)
 @api_router.get("/admin/quote-requests")
-async def get_quote_requests(status: Optional[str] = None):
+def get_quote_requests(status: Optional[str] = None):
     """Get quote requests (admin only)"""
     try:
         requests = QuoteService.get_quote_requests(status)
@@ -522,12 +521,45 @@ async def get_quote_requests(status: Optional[str] = None):
 
 # Product endpoints
 @api_router.get("/products")
-async def get_all_products():
-    """Get all products"""
+def get_all_products(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=ProductService.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
+):
+    """
+    Get all products
+    
+    Query parameters (all optional, without them the full catalog is returned):
+    - limit: Page size (1-200, default 24 with a cursor); cursor for the next page is sent in X-Next-Cursor
+    - cursor: X-Next-Cursor value from the previous page
+    - fields: Comma separated field names or "card" (id, name, price, first image, availability)
+    """
     try:
         from services_sqlite import ProductService
-        products = ProductService.get_all_products()
-        return products
+        try:
+            projection = ProductService.parse_fields(fields)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        if limit is None and cursor is None:
+            return catalog_json_response(
+                request,
+                ("products", projection),
+                lambda: ProductService.get_all_products(projection)
+            )
+        
+        try:
+            products, next_cursor = ProductService.get_products_page(
+                limit=24 if limit is None else limit,
+                cursor=cursor,
+                fields=projection
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return paged_json_response(products, next_cursor)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting products: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
@@ -540,7 +572,9 @@ async def search_products(
     price_from: Optional[int] = None,
     price_to: Optional[int] = None,
     material: Optional[str] = None,
-    limit: int = 50
+    limit: int = Query(50, ge=1, le=ProductService.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
 ):
     """
     Search and filter products
@@ -551,46 +585,66 @@ async def search_products(
     - price_from: Minimum price
     - price_to: Maximum price  
     - material: Filter by material
-    - limit: Max results (default 50)
+    - limit: Page size (default 50, max 200); cursor for the next page is sent in X-Next-Cursor
+    - cursor: X-Next-Cursor value from the previous page
+    - fields: Comma separated field names or "card"
     """
     try:
         from services_sqlite import ProductService
-        products = ProductService.search_products(
-            query=q,
-            category_id=category_id,
-            price_from=price_from,
-            price_to=price_to,
-            material=material,
-            limit=limit
-        )
-        return products
+        try:
+            products, next_cursor = await call_service(
+                AsyncProductService.search_products_page,
+                ProductService.search_products_page,
+                query=q,
+                category_id=category_id,
+                price_from=price_from,
+                price_to=price_to,
+                material=material,
+                limit=limit,
+                cursor=cursor,
+                fields=ProductService.parse_fields(fields)
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return paged_json_response(products, next_cursor)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error searching products: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
 @api_router.get("/products/category/{category_id}")
-async def get_products_by_category(category_id: str):
+def get_products_by_category(category_id: str, request: Request):
     """Get products by category"""
     try:
         from services_sqlite import ProductService
-        products = ProductService.get_products_by_category(category_id)
-        return products
+        return catalog_json_response(
+            request,
+            ("products_by_category", category_id),
+            lambda: ProductService.get_products_by_category(category_id)
+        )
     except Exception as e:
         logger.error(f"Error getting products by category: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @api_router.get("/products/{product_id}")
-async def get_product_by_id(product_id: str):
+async def get_product_by_id(product_id: str, request: Request):
     """Get product by ID and increment views"""
     try:
         from services_sqlite import ProductService
-        product = ProductService.get_product_by_id(product_id)
+        product = await call_service(
+            AsyncProductService.get_product_by_id, ProductService.get_product_by_id, product_id
+        )
         if not product:
             raise HTTPException(status_code=404, detail="Product not found")
         
-        # Increment views count for analytics
-        ProductService.increment_views(product_id)
+        # Count the view for analytics (buffered, written in batches)
+        forwarded_for = request.headers.get("X-Forwarded-For")
+        client_ip = forwarded_for.split(",")[0].strip() if forwarded_for else (
+            request.client.host if request.client else None
+        )
+        view_counter.record(product_id, client_ip)
         
         return product
     except HTTPException:
@@ -600,13 +654,13 @@ async def get_product_by_id(product_id: str):
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @api_router.post("/products")
-async def create_product(product: ProductCreate):
+def create_product(product: ProductCreate):
     """Create new product"""
 
 
 # Analytics endpoints
 @api_router.get("/analytics/overview")
-async def get_analytics_overview():
+def get_analytics_overview():
     """Get analytics overview (popular products, categories, conversion, etc.)"""
     try:
         from services_sqlite import AnalyticsService
@@ -617,29 +671,86 @@ async def get_analytics_overview():
 
 
 # SEO endpoints
+# Generated sitemap files, rebuilt on disk once per catalog version
+SITEMAP_DIR = Path(os.getenv("SITEMAP_DIR", "sitemaps"))
+sitemap_store = SitemapStore(SITEMAP_DIR)
+
+def sitemap_files() -> dict:
+    """Current sitemap file set (name -> path), built on first use after a catalog change"""
+    return catalog_cache.get_or_build(
+        ("sitemaps",), lambda: sitemap_store.build(SITE_URL, f"{SITE_URL}/api/sitemaps")
+    )
+
+def sitemap_not_modified(request: Request, etag: str) -> bool:
+    """Conditional request check shared by the sitemap index and child sitemaps"""
+    if_none_match = request.headers.get("if-none-match")
+    # If-Modified-Since only counts when the client sent no ETag (RFC 7232, 3.3)
+    return etag_matches(if_none_match, etag) or (
+        if_none_match is None
+        and not_modified_since(request.headers.get("if-modified-since"), catalog_cache.changed_at)
+    )
+
 @api_router.get("/sitemap.xml")
-async def get_sitemap():
-    """Generate and return sitemap.xml"""
+def get_sitemap(request: Request):
+    """
+    Return the sitemap index
+
+    Sitemaps are generated in-process once per catalog version and served
+    with ETag and Last-Modified (the last catalog change), so crawlers
+    revalidating an unchanged sitemap get a 304.
+    """
     try:
-        from pathlib import Path
-        from fastapi.responses import Response
-        import subprocess
-        
-        # Generate fresh sitemap
-        subprocess.run(['python3', 'generate_sitemap.py'], cwd='/app/backend', check=True)
-        
-        # Read and return sitemap
-        sitemap_path = Path('/app/backend/sitemap.xml')
-        if sitemap_path.exists():
-            with open(sitemap_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            return Response(content=content, media_type='application/xml')
-        else:
-            raise HTTPException(status_code=404, detail="Sitemap not found")
+        key = ("sitemaps", SITEMAP_INDEX_NAME)
+        encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+        headers = {
+            "Cache-Control": CATALOG_CACHE_CONTROL,
+            "Vary": "Accept-Encoding",
+            "Last-Modified": http_date(catalog_cache.changed_at),
+        }
+
+        etag = encoded_etag(catalog_cache.etag(key), encoding)
+        if sitemap_not_modified(request, etag):
+            return not_modified_response({"ETag": etag, **headers})
+
+        body, etag = catalog_cache.get_encoded_body(
+            key, lambda: sitemap_files()[SITEMAP_INDEX_NAME].read_bytes(), encoding
+        )
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return Response(content=body, media_type="application/xml", headers={"ETag": etag, **headers})
     except Exception as e:
         logger.error(f"Error generating sitemap: {e}")
         raise HTTPException(status_code=500, detail="Failed to generate sitemap")
 
+@api_router.get("/sitemaps/{name}")
+def get_child_sitemap(name: str, request: Request):
+    """Return one child sitemap listed in the index, streamed from disk"""
+    try:
+        version = catalog_cache.version
+        files = sitemap_files()
+    except Exception as e:
+        logger.error(f"Error generating sitemap: {e}")
+        raise HTTPException(status_code=500, detail="Failed to generate sitemap")
+    # Only names of the current build are served, so no path can escape the directory
+    path = files.get(name)
+    if path is None or name == SITEMAP_INDEX_NAME:
+        raise HTTPException(status_code=404, detail="Sitemap not found")
+
+    # A gzipped copy is written with every build; each coding has its own ETag
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"), available=("gzip",))
+    headers = {
+        "Cache-Control": CATALOG_CACHE_CONTROL,
+        "Vary": "Accept-Encoding",
+        "Last-Modified": http_date(catalog_cache.changed_at),
+        "ETag": encoded_etag(catalog_cache.etag(("sitemaps", name), version), encoding),
+    }
+    if sitemap_not_modified(request, headers["ETag"]):
+        return not_modified_response(headers)
+    if encoding:
+        path = path.with_name(path.name + GZIP_SUFFIX)
+        headers["Content-Encoding"] = encoding
+    return FileResponse(path, media_type="application/xml", headers=headers)
+
 @api_router.get("/yandex_b5b79ad64d21de08.html")
 async def yandex_verification():
     """Return Yandex verification file"""
@@ -689,25 +800,50 @@ Disallow: /
 
 
 # Serve uploaded files (public access)
-from fastapi.responses import FileResponse
 from pathlib import Path as FilePath
 
 UPLOAD_DIR = FilePath("uploads")
 
-@api_router.get("/uploads/{filename}")
-async def serve_uploaded_file(filename: str):
-    """Serve uploaded files publicly"""
-    from fastapi.responses import FileResponse
-    file_path = UPLOAD_DIR / filename
-    if file_path.exists() and file_path.is_file():
-        response = FileResponse(file_path)
-        # Explicitly add CORS headers for images
-        response.headers["Access-Control-Allow-Origin"] = "*"
-        response.headers["Access-Control-Allow-Methods"] = "GET, OPTIONS"
-        response.headers["Access-Control-Allow-Headers"] = "*"
-        response.headers["Cache-Control"] = "public, max-age=31536000"
-        return response
-    raise HTTPException(status_code=404, detail="File not found")
+# Uploads never change under a given name, so browsers may keep them for a year
+UPLOAD_CACHE_HEADERS = {
+    "Cache-Control": "public, max-age=31536000",
+    # Explicitly add CORS headers for images
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Methods": "GET, OPTIONS",
+    "Access-Control-Allow-Headers": "*",
+}
+
+@api_router.api_route("/uploads/{filename}", methods=["GET", "HEAD"])
+async def serve_uploaded_file(
+    filename: str,
+    request: Request,
+    w: Optional[int] = Query(None, ge=1, le=10000),
+    fmt: Optional[str] = Query(None, alias="format", pattern="^(auto|avif|webp|jpeg|jpg)$")
+):
+    """
+    Serve uploaded files publicly
+
+    With ?w= and/or ?format= a resized variant is served instead of the
+    original (format=auto or only ?w= negotiates the format with Accept).
+    Conditional requests get 304, Range requests 206.
+    """
+    headers = dict(UPLOAD_CACHE_HEADERS)
+    info = None
+    media_type = None
+    if w is not None or fmt is not None:
+        if fmt in (None, "auto"):
+            headers["Vary"] = "Accept"
+        variant = image_pipeline.select(filename, w, fmt, request.headers.get("accept"))
+        if variant is not None:
+            info = stat_cache.cached(variant[0]) or await run_blocking(stat_cache.stat, variant[0])
+            media_type = variant[1]
+    if info is None:
+        file_path = UPLOAD_DIR / filename
+        # A fresh cache entry means the file was there a moment ago: no disk access
+        info = stat_cache.cached(file_path) or await run_blocking(stat_cache.stat, file_path)
+    if info is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    return file_response(request, info, headers, media_type)
 
 @api_router.options("/uploads/{filename}")
 async def options_uploaded_file(filename: str):
@@ -753,7 +889,7 @@ async def get_regional_phone(request: Request):
             }
         
         # Получаем информацию о регионе по IP
-        region_info = get_region_by_ip(client_ip)
+        region_info = await get_region_by_ip(client_ip)
         
         return region_info
         
@@ -0,0 +1,133 @@
+"""
+Async versions of the catalog, product and quote service paths
+Used when USE_ASYNC_DB is enabled: queries go through the aiosqlite engine and
+are awaited instead of occupying a worker thread. Query building and
+serialization are shared with services_sqlite; ORM-heavy product reads run
+through AsyncSession.run_sync so they stay identical to the sync path.
+"""
+from typing import Dict, List, Optional
+
+from sqlalchemy import select
+
+import database_sqlite
+from database_sqlite import AsyncSessionLocal, ProductCategory as DBProductCategory, QuoteRequest as DBQuoteRequest
+from executor import run_blocking
+from models import QuoteRequestCreate, QuoteRequestResponse
+from notification_outbox import enqueue_notifications
+from services_sqlite import CatalogService, ProductService, QuoteService
+
+
+async def call_service(async_method, sync_method, *args, **kwargs):
+    """
+    Call a service method on the configured database path
+
+    Awaits the async method when USE_ASYNC_DB is enabled, otherwise runs the
+    sync one in the worker thread pool.
+    """
+    if database_sqlite.USE_ASYNC_DB:
+        return await async_method(*args, **kwargs)
+    return await run_blocking(sync_method, *args, **kwargs)
+
+
+class AsyncCatalogService:
+
+    @staticmethod
+    async def get_categories() -> List[dict]:
+        """Get all product categories"""
+        async with AsyncSessionLocal() as db:
+            categories = (await db.execute(select(DBProductCategory))).scalars().all()
+            return [CatalogService._serialize_category(cat) for cat in categories]
+
+    @staticmethod
+    async def get_category_by_slug(slug: str) -> Optional[dict]:
+        """Get category by slug"""
+        async with AsyncSessionLocal() as db:
+            category = (await db.execute(
+                select(DBProductCategory).where(DBProductCategory.slug == slug).limit(1)
+            )).scalars().first()
+            return CatalogService._serialize_category(category) if category else None
+
+
+class AsyncQuoteService:
+
+    @staticmethod
+    async def create_quote_request(request: QuoteRequestCreate) -> QuoteRequestResponse:
+        """Create a new quote request"""
+        async with AsyncSessionLocal() as db:
+            quote_request = QuoteService._build_quote_request(request)
+            db.add(quote_request)
+            enqueue_notifications(db, "quote_request", QuoteService._notification_data(quote_request))
+            await db.commit()
+            return QuoteService._quote_response(quote_request)
+
+    @staticmethod
+    async def get_quote_requests(status: Optional[str] = None) -> List[dict]:
+        """Get quote requests with optional status filter"""
+        async with AsyncSessionLocal() as db:
+            query = select(DBQuoteRequest)
+            if status:
+                query = query.where(DBQuoteRequest.status == status)
+            requests = (await db.execute(query)).scalars().all()
+            return [QuoteService._serialize_quote_request(req) for req in requests]
+
+
+class AsyncProductService:
+
+    @staticmethod
+    async def get_products_page(limit: int = 24, cursor: Optional[str] = None, fields: Optional[tuple] = None):
+        """Get one page of products, see ProductService.get_products_page"""
+        async with AsyncSessionLocal() as db:
+            return await db.run_sync(ProductService._get_products_page, limit, cursor, fields)
+
+    @staticmethod
+    async def get_all_products(fields: Optional[tuple] = None):
+        """Get all products (or only the given fields)"""
+        async with AsyncSessionLocal() as db:
+            return await db.run_sync(ProductService._get_all_products, fields)
+
+    @staticmethod
+    async def get_products_by_category(category_id: str):
+        """Get products by category ID"""
+        async with AsyncSessionLocal() as db:
+            return await db.run_sync(ProductService._get_products_by_category, category_id)
+
+    @staticmethod
+    async def get_product_by_id(product_id: str):
+        """Get product by ID with all details"""
+        async with AsyncSessionLocal() as db:
+            return await db.run_sync(ProductService._get_product_by_id, product_id)
+
+    @staticmethod
+    async def search_products_page(
+        query: Optional[str] = None,
+        category_id: Optional[str] = None,
+        price_from: Optional[int] = None,
+        price_to: Optional[int] = None,
+        material: Optional[str] = None,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        fields: Optional[tuple] = None
+    ):
+        """Search and filter products, see ProductService.search_products_page"""
+        async with AsyncSessionLocal() as db:
+            return await db.run_sync(
+                ProductService._search_products_page,
+                query, category_id, price_from, price_to, material, limit, cursor, fields
+            )
+
+    @staticmethod
+    async def create_product(product_data):
+        """Create new product with images and characteristics"""
+        async with AsyncSessionLocal() as db:
+            result = await db.run_sync(ProductService._add_product, product_data)
+            await db.commit()
+            return result
+
+    @staticmethod
+    async def add_views(counts: Dict[str, int]):
+        """Add buffered view counts in a single UPDATE ... CASE statement"""
+        if not counts:
+            return
+        async with AsyncSessionLocal() as db:
+            await db.execute(ProductService._add_views_statement(counts))
+            await db.commit()
@@ -1,6 +1,6 @@
-from typing import List, Optional
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from typing import Dict, List, Optional
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy import func, text, literal_column, case, update, Integer, Float
 from database_sqlite import (
     SessionLocal,
     ProductCategory as DBProductCategory,
@@ -11,6 +11,11 @@ from database_sqlite import (
     ContactRequest as DBContactRequest
 )
 from models import *
+from notification_outbox import enqueue_notifications
+from upload_storage import sync_references
+import base64
+import json
+import re
 import uuid
 from datetime import datetime
 
@@ -85,35 +90,79 @@ class CalculatorService:
 
 class QuoteService:
     
+    @staticmethod
+    def _build_quote_request(request: QuoteRequestCreate) -> DBQuoteRequest:
+        """New quote request row with a public REQ-YYYY-XXXXXX id"""
+        request_id = f"REQ-{datetime.now().strftime('%Y')}-{str(uuid.uuid4())[:6].upper()}"
+        return DBQuoteRequest(
+            request_id=request_id,
+            name=request.name,
+            email=request.email,
+            phone=request.phone,
+            company=request.company,
+            category=request.category,
+            quantity=request.quantity,
+            fabric=request.fabric,
+            branding=request.branding,
+            estimated_price=request.estimated_price,
+            status="new"
+        )
+
+    @staticmethod
+    def _quote_response(quote_request: DBQuoteRequest) -> QuoteRequestResponse:
+        return QuoteRequestResponse(
+            success=True,
+            request_id=quote_request.request_id,
+            message="Заявка принята. Мы свяжемся с вами в течение 2 часов."
+        )
+
+    @staticmethod
+    def _notification_data(quote_request: DBQuoteRequest) -> dict:
+        """Data for the quote request Telegram/email templates"""
+        return {
+            'request_id': quote_request.request_id,
+            'name': quote_request.name,
+            'email': quote_request.email,
+            'phone': quote_request.phone,
+            'company': quote_request.company,
+            'category': quote_request.category,
+            'quantity': quote_request.quantity,
+            'fabric': quote_request.fabric,
+            'branding': quote_request.branding,
+            'estimated_price': quote_request.estimated_price,
+            'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+
+    @staticmethod
+    def _serialize_quote_request(req: DBQuoteRequest) -> dict:
+        return {
+            "id": req.id,
+            "request_id": req.request_id,
+            "name": req.name,
+            "email": req.email,
+            "phone": req.phone,
+            "company": req.company,
+            "category": req.category,
+            "quantity": req.quantity,
+            "fabric": req.fabric,
+            "branding": req.branding,
+            "estimated_price": req.estimated_price,
+            "status": req.status,
+            "created_at": req.created_at,
+            "updated_at": req.updated_at
+        }
+
     @staticmethod
     def create_quote_request(request: QuoteRequestCreate) -> QuoteRequestResponse:
         """Create a new quote request"""
         db = SessionLocal()
         try:
-            request_id = f"REQ-{datetime.now().strftime('%Y')}-{str(uuid.uuid4())[:6].upper()}"
-            
-            quote_request = DBQuoteRequest(
-                request_id=request_id,
-                name=request.name,
-                email=request.email,
-                phone=request.phone,
-                company=request.company,
-                category=request.category,
-                quantity=request.quantity,
-                fabric=request.fabric,
-                branding=request.branding,
-                estimated_price=request.estimated_price,
-                status="new"
-            )
-            
+            quote_request = QuoteService._build_quote_request(request)
             db.add(quote_request)
+            enqueue_notifications(db, "quote_request", QuoteService._notification_data(quote_request))
             db.commit()
             
-            return QuoteRequestResponse(
-                success=True,
-                request_id=request_id,
-                message="Заявка принята. Мы свяжемся с вами в течение 2 часов."
-            )
+            return QuoteService._quote_response(quote_request)
         finally:
             db.close()
     
@@ -127,30 +176,24 @@ class QuoteService:
                 query = query.filter(DBQuoteRequest.status == status)
             
             requests = query.all()
-            return [
-                {
-                    "id": req.id,
-                    "request_id": req.request_id,
-                    "name": req.name,
-                    "email": req.email,
-                    "phone": req.phone,
-                    "company": req.company,
-                    "category": req.category,
-                    "quantity": req.quantity,
-                    "fabric": req.fabric,
-                    "branding": req.branding,
-                    "estimated_price": req.estimated_price,
-                    "status": req.status,
-                    "created_at": req.created_at,
-                    "updated_at": req.updated_at
-                }
-                for req in requests
-            ]
+            return [QuoteService._serialize_quote_request(req) for req in requests]
         finally:
             db.close()
 
 class ContactService:
     
+    @staticmethod
+    def _notification_data(request) -> dict:
+        """Data for the contact request Telegram/email templates"""
+        return {
+            'name': request.name,
+            'phone': request.phone,
+            'email': getattr(request, 'email', None),
+            'company': getattr(request, 'company', None),
+            'message': getattr(request, 'message', None),
+            'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+    
     @staticmethod
     def create_callback_request(request: CallbackRequestCreate) -> ContactRequestResponse:
         """Create callback request"""
@@ -164,6 +207,7 @@ class ContactService:
             )
             
             db.add(contact_request)
+            enqueue_notifications(db, "callback_request", ContactService._notification_data(request))
             db.commit()
             
             return ContactRequestResponse(
@@ -189,6 +233,7 @@ class ContactService:
             )
             
             db.add(contact_request)
+            enqueue_notifications(db, "consultation_request", ContactService._notification_data(request))
             db.commit()
             
             return ContactRequestResponse(
@@ -214,6 +259,7 @@ class ContactService:
             )
             
             db.add(contact_request)
+            enqueue_notifications(db, "contact_message", ContactService._notification_data(request))
             db.commit()
             
             return ContactRequestResponse(
@@ -225,25 +271,26 @@ class ContactService:
 
 class CatalogService:
     
+    @staticmethod
+    def _serialize_category(cat: DBProductCategory) -> dict:
+        return {
+            "id": cat.id,
+            "title": cat.title,
+            "description": cat.description,
+            "image": cat.image,
+            "products_count": cat.products_count,
+            "slug": cat.slug,
+            "created_at": cat.created_at,
+            "updated_at": cat.updated_at
+        }
+
     @staticmethod
     def get_categories() -> List[dict]:
         """Get all product categories"""
         db = SessionLocal()
         try:
             categories = db.query(DBProductCategory).all()
-            return [
-                {
-                    "id": cat.id,
-                    "title": cat.title,
-                    "description": cat.description,
-                    "image": cat.image,
-                    "products_count": cat.products_count,
-                    "slug": cat.slug,
-                    "created_at": cat.created_at,
-                    "updated_at": cat.updated_at
-                }
-                for cat in categories
-            ]
+            return [CatalogService._serialize_category(cat) for cat in categories]
         finally:
             db.close()
     
@@ -254,16 +301,7 @@ class CatalogService:
         try:
             category = db.query(DBProductCategory).filter(DBProductCategory.slug == slug).first()
             if category:
-                return {
-                    "id": category.id,
-                    "title": category.title,
-                    "description": category.description,
-                    "image": category.image,
-                    "products_count": category.products_count,
-                    "slug": category.slug,
-                    "created_at": category.created_at,
-                    "updated_at": category.updated_at
-                }
+                return CatalogService._serialize_category(category)
             return None
         finally:
             db.close()
@@ -364,277 +402,350 @@ class StatisticsService:
         finally:
             db.close()
 class ProductService:
+    # Lightweight representation for listing grids
+    CARD_FIELDS = (
+        "id", "category_id", "name", "article", "price_from", "price_to",
+        "image", "is_available", "on_order", "featured"
+    )
+    MAX_PAGE_SIZE = 200
+
+    @staticmethod
+    def _catalog_query(db: Session, images: bool = True, characteristics: bool = True):
+        """
+        Base product query shared by all catalog read paths.
+
+        Category is joined in the same SELECT, images and characteristics are
+        fetched with one extra IN-query each, so a listing costs a fixed
+        number of round trips regardless of catalog size.
+        """
+        from database_sqlite import SQLProduct
+
+        options = [joinedload(SQLProduct.category)]
+        if images:
+            options.append(selectinload(SQLProduct.images))
+        if characteristics:
+            options.append(selectinload(SQLProduct.characteristics))
+        return db.query(SQLProduct).options(*options)
+
+    @staticmethod
+    def _serialize_images(product) -> List[dict]:
+        return [
+            {
+                "id": img.id,
+                "image_url": img.image_url,
+                "alt_text": img.alt_text,
+                "order": img.order
+            }
+            for img in product.images
+        ]
+
+    @staticmethod
+    def _serialize_characteristics(product) -> List[dict]:
+        return [
+            {
+                "id": char.id,
+                "name": char.name,
+                "value": char.value,
+                "order": char.order
+            }
+            for char in product.characteristics
+        ]
+
+    # Field name -> getter; defines both the full product shape and what `fields=` may select
+    PRODUCT_FIELDS = {
+        "id": lambda p: p.id,
+        "category_id": lambda p: p.category_id,
+        "category_name": lambda p: p.category.title if p.category else "Unknown",
+        "name": lambda p: p.name,
+        "article": lambda p: p.article,
+        "description": lambda p: p.description,
+        "short_description": lambda p: p.short_description,
+        "price_from": lambda p: p.price_from,
+        "price_to": lambda p: p.price_to,
+        "material": lambda p: p.material,
+        "sizes": lambda p: json.loads(p.sizes) if p.sizes else [],
+        "colors": lambda p: json.loads(p.colors) if p.colors else [],
+        "color_images": lambda p: json.loads(p.color_images) if p.color_images else [],
+        "branding_options": lambda p: json.loads(p.branding_options) if p.branding_options else [],
+        "is_available": lambda p: p.is_available,
+        "on_order": lambda p: p.on_order or False,
+        "featured": lambda p: p.featured,
+        "views_count": lambda p: p.views_count or 0,
+        "images": lambda p: ProductService._serialize_images(p),
+        "characteristics": lambda p: ProductService._serialize_characteristics(p),
+        "created_at": lambda p: p.created_at,
+        "updated_at": lambda p: p.updated_at
+    }
+    # Projection-only fields (not part of the full product dict)
+    EXTRA_FIELDS = {
+        "image": lambda p: p.images[0].image_url if p.images else None
+    }
+
+    @staticmethod
+    def _serialize_product(product, fields: Optional[tuple] = None) -> dict:
+        """Convert eager-loaded SQLProduct into API dict (optionally only the given fields)"""
+        if fields is None:
+            return {name: getter(product) for name, getter in ProductService.PRODUCT_FIELDS.items()}
+        return {
+            name: (ProductService.PRODUCT_FIELDS.get(name) or ProductService.EXTRA_FIELDS[name])(product)
+            for name in fields
+        }
+
+    @staticmethod
+    def parse_fields(fields: Optional[str]) -> Optional[tuple]:
+        """
+        Parse `fields=` query parameter
+
+        Args:
+            fields: Comma separated field names or "card"
+
+        Returns:
+            Tuple of field names, None for the full product
+
+        Raises:
+            ValueError: If an unknown field is requested
+        """
+        if not fields:
+            return None
+        if fields == "card":
+            return ProductService.CARD_FIELDS
+        names = tuple(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+        unknown = [
+            name for name in names
+            if name not in ProductService.PRODUCT_FIELDS and name not in ProductService.EXTRA_FIELDS
+        ]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        return names or None
+
+    @staticmethod
+    def encode_cursor(key: list) -> str:
+        """Opaque keyset cursor from the sort key of the last item on a page"""
+        return base64.urlsafe_b64encode(json.dumps(key).encode("utf-8")).decode("ascii").rstrip("=")
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> list:
+        """
+        Decode keyset cursor
+
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            key = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        except Exception:
+            raise ValueError("Invalid cursor")
+        if not isinstance(key, list) or len(key) != 2:
+            raise ValueError("Invalid cursor")
+        return key
+
     @staticmethod
-    def get_all_products():
-        """Get all products with images and characteristics"""
+    def _page(products_query, limit: int, cursor: Optional[str], fields: Optional[tuple], rank=None):
+        """
+        Apply keyset pagination
+
+        Results are ordered by (created_at, id), or by (rank, id) when a
+        full-text rank column is given.
+
+        Returns:
+            (items, next_cursor) - next_cursor is None on the last page
+        """
+        from database_sqlite import SQLProduct
+
+        if rank is not None:
+            products_query = products_query.add_columns(rank)
+            if cursor:
+                last_rank, product_id = ProductService.decode_cursor(cursor)
+                if not isinstance(last_rank, (int, float)):
+                    raise ValueError("Invalid cursor")
+                products_query = products_query.filter(
+                    (rank > last_rank) | ((rank == last_rank) & (SQLProduct.id > str(product_id)))
+                )
+            rows = products_query.order_by(rank, SQLProduct.id).limit(limit + 1).all()
+            products = [row[0] for row in rows]
+            keys = [[row[1], row[0].id] for row in rows]
+        else:
+            if cursor:
+                created_at, product_id = ProductService.decode_cursor(cursor)
+                product_id = str(product_id)
+                if not created_at:
+                    products_query = products_query.filter(
+                        (SQLProduct.created_at.isnot(None)) |
+                        (SQLProduct.created_at.is_(None) & (SQLProduct.id > product_id))
+                    )
+                else:
+                    try:
+                        created_at = datetime.fromisoformat(created_at)
+                    except (TypeError, ValueError):
+                        raise ValueError("Invalid cursor")
+                    products_query = products_query.filter(
+                        (SQLProduct.created_at > created_at) |
+                        ((SQLProduct.created_at == created_at) & (SQLProduct.id > product_id))
+                    )
+            products = products_query.order_by(SQLProduct.created_at, SQLProduct.id).limit(limit + 1).all()
+            keys = [
+                [product.created_at.isoformat() if product.created_at else "", product.id]
+                for product in products
+            ]
+
+        next_cursor = None
+        if len(products) > limit:
+            products = products[:limit]
+            next_cursor = ProductService.encode_cursor(keys[limit - 1])
+
+        return [ProductService._serialize_product(product, fields) for product in products], next_cursor
+
+    @staticmethod
+    def _query_for_fields(db: Session, fields: Optional[tuple]):
+        """Catalog query that only eager-loads relations the projection needs"""
+        return ProductService._catalog_query(
+            db,
+            images=fields is None or "images" in fields or "image" in fields,
+            characteristics=fields is None or "characteristics" in fields
+        )
+
+    @staticmethod
+    def get_products_page(limit: int = 24, cursor: Optional[str] = None, fields: Optional[tuple] = None):
+        """
+        Get one page of products using keyset pagination
+
+        Args:
+            limit: Page size (capped at MAX_PAGE_SIZE)
+            cursor: Cursor from the previous page
+            fields: Projection from parse_fields(), None for full products
+
+        Returns:
+            (items, next_cursor)
+        """
         db = SessionLocal()
         try:
-            from database_sqlite import SQLProduct, SQLProductImage, SQLProductCharacteristic, ProductCategory
-            import json
-            
-            products = db.query(SQLProduct).all()
-            result = []
-            
-            for product in products:
-                # Get category name
-                category = db.query(ProductCategory).filter(ProductCategory.id == product.category_id).first()
-                category_name = category.title if category else "Unknown"
-                
-                # Parse JSON fields
-                sizes = json.loads(product.sizes) if product.sizes else []
-                colors = json.loads(product.colors) if product.colors else []
-                branding_options = json.loads(product.branding_options) if product.branding_options else []
-                
-                # Get images
-                images = []
-                for img in product.images:
-                    images.append({
-                        "id": img.id,
-                        "image_url": img.image_url,
-                        "alt_text": img.alt_text,
-                        "order": img.order
-                    })
-                
-                # Get characteristics
-                characteristics = []
-                for char in product.characteristics:
-                    characteristics.append({
-                        "id": char.id,
-                        "name": char.name,
-                        "value": char.value,
-                        "order": char.order
-                    })
-                
-                result.append({
-                    "id": product.id,
-                    "category_id": product.category_id,
-                    "category_name": category_name,
-                    "name": product.name,
-                    "article": product.article if hasattr(product, 'article') else None,
-                    "description": product.description,
-                    "short_description": product.short_description,
-                    "price_from": product.price_from,
-                    "price_to": product.price_to,
-                    "material": product.material,
-                    "sizes": sizes,
-                    "colors": colors,
-                    "color_images": json.loads(product.color_images) if product.color_images else [],
-                    "branding_options": branding_options,
-                    "is_available": product.is_available,
-                    "on_order": product.on_order if hasattr(product, 'on_order') else False,
-                    "featured": product.featured,
-                    "views_count": product.views_count if hasattr(product, 'views_count') else 0,
-                    "images": images,
-                    "characteristics": characteristics,
-                    "created_at": product.created_at,
-                    "updated_at": product.updated_at
-                })
-            
-            return result
+            return ProductService._get_products_page(db, limit, cursor, fields)
+        finally:
+            db.close()
+
+    @staticmethod
+    def _get_products_page(db: Session, limit: int, cursor: Optional[str], fields: Optional[tuple]):
+        limit = max(1, min(limit, ProductService.MAX_PAGE_SIZE))
+        return ProductService._page(ProductService._query_for_fields(db, fields), limit, cursor, fields)
+
+    @staticmethod
+    def get_all_products(fields: Optional[tuple] = None):
+        """Get all products with images and characteristics (or only the given fields)"""
+        db = SessionLocal()
+        try:
+            return ProductService._get_all_products(db, fields)
         finally:
             db.close()
+
+    @staticmethod
+    def _get_all_products(db: Session, fields: Optional[tuple] = None):
+        products = ProductService._query_for_fields(db, fields).all()
+        return [ProductService._serialize_product(product, fields) for product in products]
     
     @staticmethod
     def get_products_by_category(category_id: str):
         """Get products by category ID"""
         db = SessionLocal()
         try:
-            from database_sqlite import SQLProduct, SQLProductImage, SQLProductCharacteristic, ProductCategory
-            import json
-            
-            products = db.query(SQLProduct).filter(SQLProduct.category_id == category_id).all()
-            result = []
-            
-            for product in products:
-                # Get category name
-                category = db.query(ProductCategory).filter(ProductCategory.id == product.category_id).first()
-                category_name = category.title if category else "Unknown"
-                
-                # Parse JSON fields
-                sizes = json.loads(product.sizes) if product.sizes else []
-                colors = json.loads(product.colors) if product.colors else []
-                branding_options = json.loads(product.branding_options) if product.branding_options else []
-                
-                # Get images
-                images = []
-                for img in product.images:
-                    images.append({
-                        "id": img.id,
-                        "image_url": img.image_url,
-                        "alt_text": img.alt_text,
-                        "order": img.order
-                    })
-                
-                # Get characteristics
-                characteristics = []
-                for char in product.characteristics:
-                    characteristics.append({
-                        "id": char.id,
-                        "name": char.name,
-                        "value": char.value,
-                        "order": char.order
-                    })
-                
-                result.append({
-                    "id": product.id,
-                    "category_id": product.category_id,
-                    "category_name": category_name,
-                    "name": product.name,
-                    "article": product.article if hasattr(product, 'article') else None,
-                    "description": product.description,
-                    "short_description": product.short_description,
-                    "price_from": product.price_from,
-                    "price_to": product.price_to,
-                    "material": product.material,
-                    "sizes": sizes,
-                    "colors": colors,
-                    "color_images": json.loads(product.color_images) if product.color_images else [],
-                    "branding_options": branding_options,
-                    "is_available": product.is_available,
-                    "on_order": product.on_order if hasattr(product, 'on_order') else False,
-                    "featured": product.featured,
-                    "views_count": product.views_count if hasattr(product, 'views_count') else 0,
-                    "images": images,
-                    "characteristics": characteristics,
-                    "created_at": product.created_at,
-                    "updated_at": product.updated_at
-                })
-            
-            return result
+            return ProductService._get_products_by_category(db, category_id)
         finally:
             db.close()
+
+    @staticmethod
+    def _get_products_by_category(db: Session, category_id: str):
+        from database_sqlite import SQLProduct
+
+        products = ProductService._catalog_query(db).filter(SQLProduct.category_id == category_id).all()
+        return [ProductService._serialize_product(product) for product in products]
     
     @staticmethod
     def create_product(product_data):
         """Create new product with images and characteristics"""
         db = SessionLocal()
         try:
-            from database_sqlite import SQLProduct, SQLProductImage, SQLProductCharacteristic
-            import json
-            from datetime import datetime, timezone
-            
-            # Create product
-            new_product = SQLProduct(
-                category_id=product_data.category_id,
-                name=product_data.name,
-                description=product_data.description,
-                short_description=product_data.short_description,
-                price_from=product_data.price_from,
-                price_to=product_data.price_to,
-                material=product_data.material,
-                sizes=json.dumps(product_data.sizes) if product_data.sizes else None,
-                colors=json.dumps(product_data.colors) if product_data.colors else None,
-                is_available=product_data.is_available,
-                featured=product_data.featured,
-                created_at=datetime.now(timezone.utc)
-            )
-            
-            db.add(new_product)
-            db.flush()  # Get the ID
-            
-            # Add images
-            if product_data.images:
-                for i, image_url in enumerate(product_data.images):
-                    image = SQLProductImage(
-                        product_id=new_product.id,
-                        image_url=image_url,
-                        alt_text=f"{product_data.name} - изображение {i+1}",
-                        order=i+1
-                    )
-                    db.add(image)
-            
-            # Add characteristics
-            if product_data.characteristics:
-                for i, char in enumerate(product_data.characteristics):
-                    characteristic = SQLProductCharacteristic(
-                        product_id=new_product.id,
-                        name=char["name"],
-                        value=char["value"],
-                        order=i+1
-                    )
-                    db.add(characteristic)
-            
+            result = ProductService._add_product(db, product_data)
             db.commit()
-            
-            return {
-                "success": True,
-                "product_id": new_product.id,
-                "message": "Товар успешно создан"
-            }
+            return result
         except Exception as e:
             db.rollback()
             raise e
         finally:
             db.close()
-    
+
+    @staticmethod
+    def _add_product(db: Session, product_data) -> dict:
+        """Add product with its images and characteristics to the session (not committed)"""
+        from database_sqlite import SQLProduct, SQLProductImage, SQLProductCharacteristic
+        from datetime import timezone
+
+        # Create product
+        new_product = SQLProduct(
+            category_id=product_data.category_id,
+            name=product_data.name,
+            description=product_data.description,
+            short_description=product_data.short_description,
+            price_from=product_data.price_from,
+            price_to=product_data.price_to,
+            material=product_data.material,
+            sizes=json.dumps(product_data.sizes) if product_data.sizes else None,
+            colors=json.dumps(product_data.colors) if product_data.colors else None,
+            is_available=product_data.is_available,
+            featured=product_data.featured,
+            created_at=datetime.now(timezone.utc)
+        )
+        
+        db.add(new_product)
+        db.flush()  # Get the ID
+        
+        # Add images
+        if product_data.images:
+            for i, image_url in enumerate(product_data.images):
+                image = SQLProductImage(
+                    product_id=new_product.id,
+                    image_url=image_url,
+                    alt_text=f"{product_data.name} - изображение {i+1}",
+                    order=i+1
+                )
+                db.add(image)
+        
+        # Add characteristics
+        if product_data.characteristics:
+            for i, char in enumerate(product_data.characteristics):
+                characteristic = SQLProductCharacteristic(
+                    product_id=new_product.id,
+                    name=char["name"],
+                    value=char["value"],
+                    order=i+1
+                )
+                db.add(characteristic)
+        
+        sync_references(db, "product", new_product.id)
+        
+        return {
+            "success": True,
+            "product_id": new_product.id,
+            "message": "Товар успешно создан"
+        }
+
     @staticmethod
     def get_product_by_id(product_id: str):
         """Get product by ID with all details"""
         db = SessionLocal()
         try:
-            from database_sqlite import SQLProduct, SQLProductImage, SQLProductCharacteristic, ProductCategory
-            import json
-            
-            product = db.query(SQLProduct).filter(SQLProduct.id == product_id).first()
-            if not product:
-                return None
-            
-            # Get category name
-            category = db.query(ProductCategory).filter(ProductCategory.id == product.category_id).first()
-            category_name = category.title if category else "Unknown"
-            
-            # Parse JSON fields
-            sizes = json.loads(product.sizes) if product.sizes else []
-            colors = json.loads(product.colors) if product.colors else []
-            color_images = json.loads(product.color_images) if product.color_images else []
-            branding_options = json.loads(product.branding_options) if product.branding_options else []
-            
-            # Get images
-            images = []
-            for img in product.images:
-                images.append({
-                    "id": img.id,
-                    "image_url": img.image_url,
-                    "alt_text": img.alt_text,
-                    "order": img.order
-                })
-            
-            # Get characteristics
-            characteristics = []
-            for char in product.characteristics:
-                characteristics.append({
-                    "id": char.id,
-                    "name": char.name,
-                    "value": char.value,
-                    "order": char.order
-                })
-            
-            return {
-                "id": product.id,
-                "category_id": product.category_id,
-                "category_name": category_name,
-                "name": product.name,
-                "article": product.article,
-                "description": product.description,
-                "short_description": product.short_description,
-                "price_from": product.price_from,
-                "price_to": product.price_to,
-                "material": product.material,
-                "sizes": sizes,
-                "colors": colors,
-                "color_images": color_images,
-                "branding_options": branding_options,
-                "is_available": product.is_available,
-                "on_order": product.on_order if hasattr(product, 'on_order') else False,
-                "featured": product.featured,
-                "images": images,
-                "characteristics": characteristics,
-                "created_at": product.created_at,
-                "updated_at": product.updated_at
-            }
+            return ProductService._get_product_by_id(db, product_id)
         finally:
             db.close()
 
+    @staticmethod
+    def _get_product_by_id(db: Session, product_id: str):
+        from database_sqlite import SQLProduct
+
+        product = ProductService._catalog_query(db).filter(SQLProduct.id == product_id).first()
+        if not product:
+            return None
+        return ProductService._serialize_product(product)
+
 
     @staticmethod
     def search_products(
@@ -656,116 +767,170 @@ class ProductService:
             material: Filter by material
             limit: Maximum results
         """
+        products, _ = ProductService.search_products_page(
+            query=query,
+            category_id=category_id,
+            price_from=price_from,
+            price_to=price_to,
+            material=material,
+            limit=limit
+        )
+        return products
+
+    @staticmethod
+    def search_products_page(
+        query: Optional[str] = None,
+        category_id: Optional[str] = None,
+        price_from: Optional[int] = None,
+        price_to: Optional[int] = None,
+        material: Optional[str] = None,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        fields: Optional[tuple] = None
+    ):
+        """
+        Search and filter products with keyset pagination and projection
+        
+        Args:
+            query: Search query (название или артикул)
+            category_id: Filter by category
+            price_from: Minimum price
+            price_to: Maximum price
+            material: Filter by material
+            limit: Page size (capped at MAX_PAGE_SIZE)
+            cursor: Cursor from the previous page
+            fields: Projection from parse_fields(), None for full products
+        
+        Returns:
+            (items, next_cursor)
+        """
         db = SessionLocal()
         try:
-            from database_sqlite import SQLProduct, SQLProductImage, SQLProductCharacteristic, ProductCategory
-            import json
-            
-            # Start with base query
-            products_query = db.query(SQLProduct)
-            
-            # Apply filters
-            if query:
-                # Search by name or article
+            return ProductService._search_products_page(
+                db, query, category_id, price_from, price_to, material, limit, cursor, fields
+            )
+        finally:
+            db.close()
+
+    @staticmethod
+    def _search_products_page(
+        db: Session,
+        query: Optional[str],
+        category_id: Optional[str],
+        price_from: Optional[int],
+        price_to: Optional[int],
+        material: Optional[str],
+        limit: int,
+        cursor: Optional[str],
+        fields: Optional[tuple]
+    ):
+        from database_sqlite import SQLProduct
+
+        limit = max(1, min(limit, ProductService.MAX_PAGE_SIZE))
+
+        # Start with base query
+        products_query = ProductService._query_for_fields(db, fields)
+        
+        # Apply filters
+        rank = None
+        if query:
+            match = ProductService.build_search_match(query)
+            if match and ProductService._search_index_available(db):
+                # Index-backed search over name, article, description, material
+                # and characteristics, ranked by bm25
+                from database_sqlite import PRODUCT_SEARCH_KEY, PRODUCT_SEARCH_WEIGHTS
+                weights = ", ".join(str(weight) for weight in PRODUCT_SEARCH_WEIGHTS)
+                matches = text(
+                    f"SELECT rowid AS product_rowid, bm25(products_fts, {weights}) AS rank "
+                    "FROM products_fts WHERE products_fts MATCH :match"
+                ).bindparams(match=match).columns(product_rowid=Integer, rank=Float).subquery("matches")
+                products_query = products_query.join(
+                    matches, matches.c.product_rowid == literal_column(f"products.{PRODUCT_SEARCH_KEY}")
+                )
+                rank = matches.c.rank
+            else:
+                # Fallback without FTS5: search by name or article
                 # Use upper() for case-insensitive search with Cyrillic text in SQLite
-                from sqlalchemy import func
                 query_upper = query.upper()
                 search_filter = (
                     (func.upper(SQLProduct.name).like(f"%{query_upper}%")) |
                     (func.upper(SQLProduct.article).like(f"%{query_upper}%"))
                 )
                 products_query = products_query.filter(search_filter)
-            
-            if category_id:
-                products_query = products_query.filter(SQLProduct.category_id == category_id)
-            
-            if price_from is not None:
-                products_query = products_query.filter(SQLProduct.price_from >= price_from)
-            
-            if price_to is not None:
-                products_query = products_query.filter(SQLProduct.price_from <= price_to)
-            
-            if material:
-                products_query = products_query.filter(SQLProduct.material.ilike(f"%{material}%"))
-            
-            # Limit results
-            products = products_query.limit(limit).all()
-            
-            result = []
-            for product in products:
-                # Get category name
-                category = db.query(ProductCategory).filter(ProductCategory.id == product.category_id).first()
-                category_name = category.title if category else "Unknown"
-                
-                # Parse JSON fields
-                sizes = json.loads(product.sizes) if product.sizes else []
-                colors = json.loads(product.colors) if product.colors else []
-                branding_options = json.loads(product.branding_options) if product.branding_options else []
-                
-                # Get images
-                images = []
-                for img in product.images:
-                    images.append({
-                        "id": img.id,
-                        "image_url": img.image_url,
-                        "alt_text": img.alt_text,
-                        "order": img.order
-                    })
-                
-                # Get characteristics
-                characteristics = []
-                for char in product.characteristics:
-                    characteristics.append({
-                        "id": char.id,
-                        "name": char.name,
-                        "value": char.value,
-                        "order": char.order
-                    })
-                
-                result.append({
-                    "id": product.id,
-                    "category_id": product.category_id,
-                    "category_name": category_name,
-                    "name": product.name,
-                    "article": product.article,
-                    "description": product.description,
-                    "short_description": product.short_description,
-                    "price_from": product.price_from,
-                    "price_to": product.price_to,
-                    "material": product.material,
-                    "sizes": sizes,
-                    "colors": colors,
-                    "color_images": json.loads(product.color_images) if product.color_images else [],
-                    "branding_options": branding_options,
-                    "is_available": product.is_available,
-                    "on_order": product.on_order if hasattr(product, 'on_order') else False,
-                    "featured": product.featured,
-                    "views_count": product.views_count if hasattr(product, 'views_count') else 0,
-                    "images": images,
-                    "characteristics": characteristics,
-                    "created_at": product.created_at,
-                    "updated_at": product.updated_at
-                })
-            
-            return result
-        finally:
-            db.close()
+        
+        if category_id:
+            products_query = products_query.filter(SQLProduct.category_id == category_id)
+        
+        if price_from is not None:
+            products_query = products_query.filter(SQLProduct.price_from >= price_from)
+        
+        if price_to is not None:
+            products_query = products_query.filter(SQLProduct.price_from <= price_to)
+        
+        if material:
+            products_query = products_query.filter(SQLProduct.material.ilike(f"%{material}%"))
+        
+        return ProductService._page(products_query, limit, cursor, fields, rank=rank)
+
+    # Cached result of the products_fts lookup (the index is created at startup)
+    _search_index_enabled: Optional[bool] = None
+
+    @staticmethod
+    def _search_index_available(db: Session) -> bool:
+        """Check once per process whether the FTS5 search index exists"""
+        if ProductService._search_index_enabled is None:
+            ProductService._search_index_enabled = db.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products_fts'")
+            ).first() is not None
+        return ProductService._search_index_enabled
+
+    @staticmethod
+    def build_search_match(query: str) -> Optional[str]:
+        """
+        Convert user input into an FTS5 MATCH expression
+        
+        Every word becomes a quoted prefix term ("рубаш"*), all terms must
+        match. Returns None if the input has no searchable words.
+        """
+        words = re.findall(r"\w+", query.replace("ё", "е").replace("Ё", "Е"))
+        if not words:
+            return None
+        return " ".join(f'"{word}"*' for word in words)
 
     @staticmethod
     def increment_views(product_id: str):
         """Increment product views count for analytics"""
+        ProductService.add_views({product_id: 1})
+
+    @staticmethod
+    def add_views(counts: Dict[str, int]):
+        """
+        Add buffered view counts in a single UPDATE ... CASE statement
+
+        Args:
+            counts: Views to add per product id
+        """
+        if not counts:
+            return
         db = SessionLocal()
         try:
-            from database_sqlite import SQLProduct
-            product = db.query(SQLProduct).filter(SQLProduct.id == product_id).first()
-            if product:
-                if not hasattr(product, 'views_count') or product.views_count is None:
-                    product.views_count = 0
-                product.views_count += 1
-                db.commit()
+            db.execute(ProductService._add_views_statement(counts))
+            db.commit()
         finally:
             db.close()
 
+    @staticmethod
+    def _add_views_statement(counts: Dict[str, int]):
+        from database_sqlite import SQLProduct
+
+        return (
+            update(SQLProduct)
+            .where(SQLProduct.id.in_(list(counts)))
+            .values(views_count=func.coalesce(SQLProduct.views_count, 0)
+                    + case(counts, value=SQLProduct.id, else_=0))
+            .execution_options(synchronize_session=False)
+        )
+
 
 
 
@@ -914,6 +1079,7 @@ class SettingsService:
                 settings.about_image = settings_update["about_image"]
             
             settings.updated_at = datetime.utcnow()
+            sync_references(db, "settings", settings.id)
             db.commit()
             db.refresh(settings)
             
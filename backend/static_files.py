@@ -0,0 +1,245 @@
+"""
+Static file responses for uploads
+Uploaded images are served with a content-hash ETag and Last-Modified,
+answer conditional requests with 304, support single byte ranges and hand
+whole files to the server for zero-copy sending (ASGI pathsend) when it
+offers that. Stat results are cached in memory and revalidated against the
+file's mtime/size/inode, so a hot image costs no syscalls per request.
+"""
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional, Tuple
+
+import anyio
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+from http_cache import etag_matches, http_date, not_modified_response, not_modified_since
+
+# Cached stat results are trusted for this long before the file is re-checked
+STATIC_STAT_TTL = float(os.getenv('STATIC_STAT_TTL', '2'))  # seconds
+STATIC_STAT_CACHE_MAX_ENTRIES = 10000
+STATIC_CHUNK_SIZE = 64 * 1024
+
+# Content-addressed uploads (upload_storage) carry their SHA-256 in the name
+CONTENT_HASH_NAME_RE = re.compile(r"[0-9a-f]{64}")
+
+# Types missing from older mimetypes tables
+EXTRA_MEDIA_TYPES = {".avif": "image/avif", ".webp": "image/webp"}
+
+
+class FileInfo(NamedTuple):
+    path: Path
+    size: int
+    mtime: float
+    identity: Tuple[int, int, int]  # (mtime_ns, size, inode) the ETag was computed for
+    etag: str
+    last_modified: str
+    media_type: str
+
+
+def media_type_for(path: Path) -> str:
+    suffix = path.suffix.lower()
+    if suffix in EXTRA_MEDIA_TYPES:
+        return EXTRA_MEDIA_TYPES[suffix]
+    return mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+
+
+def content_hash(path: Path) -> str:
+    """SHA-256 hex of the file content (taken from the name for content-addressed uploads)"""
+    path = Path(path)
+    if CONTENT_HASH_NAME_RE.fullmatch(path.stem):
+        return path.stem
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(STATIC_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def content_etag(path: Path) -> str:
+    """Strong ETag from the file content"""
+    return f'"{content_hash(path)}"'
+
+
+class StatCache:
+    """In-memory stat/ETag cache for served files"""
+
+    def __init__(self, ttl: float = STATIC_STAT_TTL, max_entries: int = STATIC_STAT_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: Dict[Path, Tuple[float, FileInfo]] = {}
+        self._lock = threading.Lock()
+
+    def cached(self, path: Path) -> Optional[FileInfo]:
+        """FileInfo still within its TTL, without touching the disk"""
+        entry = self._entries.get(path)
+        if entry is not None and time.monotonic() - entry[0] < self.ttl:
+            return entry[1]
+        return None
+
+    def stat(self, path: Path) -> Optional[FileInfo]:
+        """
+        Stat a file (blocking), reusing the cached ETag while the file is unchanged
+
+        Returns:
+            FileInfo, or None if the path is not a regular file
+        """
+        try:
+            st = os.stat(path)
+        except OSError:
+            self.invalidate(path)
+            return None
+        if not os.path.isfile(path):
+            self.invalidate(path)
+            return None
+
+        identity = (st.st_mtime_ns, st.st_size, st.st_ino)
+        entry = self._entries.get(path)
+        if entry is not None and entry[1].identity == identity:
+            info = entry[1]
+        else:
+            modified = datetime.fromtimestamp(st.st_mtime, timezone.utc).replace(tzinfo=None)
+            info = FileInfo(
+                path=path,
+                size=st.st_size,
+                mtime=st.st_mtime,
+                identity=identity,
+                etag=content_etag(path),
+                last_modified=http_date(modified),
+                media_type=media_type_for(path),
+            )
+        with self._lock:
+            if path not in self._entries and len(self._entries) >= self.max_entries:
+                self._entries.clear()
+            self._entries[path] = (time.monotonic(), info)
+        return info
+
+    def invalidate(self, path: Optional[Path] = None):
+        """Forget one path (deleted/replaced file) or everything"""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(Path(path), None)
+
+
+stat_cache = StatCache()
+
+
+def parse_range(header: Optional[str], size: int):
+    """
+    Parse a Range header for a file of the given size
+
+    Only a single byte range is supported; anything else is ignored and the
+    whole file is sent, as RFC 7233 allows.
+
+    Returns:
+        (start, end) inclusive, None to send the whole file, or False if the
+        range cannot be satisfied (416)
+    """
+    if not header:
+        return None
+    match = re.fullmatch(r"\s*bytes\s*=\s*(\d*)\s*-\s*(\d*)\s*", header)
+    if match is None or not (match.group(1) or match.group(2)):
+        return None
+    first, last = match.group(1), match.group(2)
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if last and int(last) < start:
+            return None
+    else:
+        suffix = int(last)
+        if suffix == 0:
+            return False
+        start, end = max(size - suffix, 0), size - 1
+    if start >= size:
+        return False
+    return start, end
+
+
+class StaticFileResponse(Response):
+    """Whole file or one byte range of it; whole files use pathsend when the server supports it"""
+
+    def __init__(self, info: FileInfo, headers: Dict[str, str], byte_range: Optional[Tuple[int, int]] = None,
+                 media_type: Optional[str] = None):
+        self.info = info
+        self.byte_range = byte_range
+        self.status_code = 206 if byte_range else 200
+        self.media_type = media_type or info.media_type
+        self.background = None
+        self.init_headers(headers)
+        if byte_range:
+            start, end = byte_range
+            self.headers["content-range"] = f"bytes {start}-{end}/{info.size}"
+            self.headers["content-length"] = str(end - start + 1)
+        else:
+            self.headers["content-length"] = str(info.size)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope["method"].upper() == "HEAD":
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        if self.byte_range is None and "http.response.pathsend" in scope.get("extensions", {}):
+            await send({"type": "http.response.pathsend", "path": str(self.info.path)})
+            return
+
+        start, end = self.byte_range or (0, self.info.size - 1)
+        remaining = end - start + 1
+        async with await anyio.open_file(self.info.path, mode="rb") as f:
+            if start:
+                await f.seek(start)
+            while remaining > 0:
+                chunk = await f.read(min(STATIC_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+        if remaining > 0 or self.info.size == 0:
+            # File shrank underneath us (or is empty): end the body
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+def file_response(request: Request, info: FileInfo, headers: Optional[Dict[str, str]] = None,
+                  media_type: Optional[str] = None) -> Response:
+    """
+    Response for a static file honouring conditional and range headers
+
+    Args:
+        request: Incoming request
+        info: File from stat_cache
+        headers: Extra headers (Cache-Control, CORS, Vary), also sent with 304/416
+        media_type: Content type (default: guessed from the extension)
+    """
+    headers = {
+        "ETag": info.etag,
+        "Last-Modified": info.last_modified,
+        "Accept-Ranges": "bytes",
+        **(headers or {}),
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if etag_matches(if_none_match, info.etag) or (
+        if_none_match is None
+        and not_modified_since(
+            request.headers.get("if-modified-since"),
+            datetime.fromtimestamp(info.mtime, timezone.utc).replace(tzinfo=None)
+        )
+    ):
+        return not_modified_response(headers)
+
+    byte_range = parse_range(request.headers.get("range"), info.size)
+    if_range = request.headers.get("if-range")
+    if byte_range is not None and if_range is not None and if_range.strip() not in (info.etag, info.last_modified):
+        byte_range = None  # the client's partial copy is stale: send everything
+    if byte_range is False:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{info.size}"})
+    return StaticFileResponse(info, headers, byte_range, media_type)
@@ -1,11 +1,17 @@
 """
 Telegram Bot Service for Uniform Factory
 Sends notifications about new requests to admin
+The server sends through the async TelegramClient: one keep-alive HTTP
+connection, per-chat pacing that honours 429 retry_after, and bursts of
+notifications coalesced into digest messages.
 """
+import asyncio
 import os
+import time
 from dotenv import load_dotenv
+import httpx
 import requests
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 import logging
 
 # Load environment variables
@@ -17,6 +23,17 @@ logger = logging.getLogger(__name__)
 TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
 TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
 
+# Bot API base URL (overridable for tests or a local Bot API server)
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL', 'https://api.telegram.org')
+# Minimum gap between messages to one chat (Telegram allows ~1/s per chat, 20/min in groups)
+TELEGRAM_CHAT_INTERVAL = float(os.getenv('TELEGRAM_CHAT_INTERVAL', '1'))  # seconds
+# Notifications arriving within this window are sent as one digest (0 disables)
+TELEGRAM_COALESCE_WINDOW = float(os.getenv('TELEGRAM_COALESCE_WINDOW', '5'))  # seconds
+# A longer 429 retry_after fails the send (the outbox retries it later) instead of waiting
+TELEGRAM_MAX_RETRY_AFTER = float(os.getenv('TELEGRAM_MAX_RETRY_AFTER', '30'))  # seconds
+TELEGRAM_MESSAGE_LIMIT = 4096  # characters per message
+DIGEST_SEPARATOR = "\n\n➖➖➖➖➖\n\n"
+
 class TelegramService:
     """Service for sending Telegram notifications"""
     
@@ -54,8 +71,8 @@ class TelegramService:
             return False
     
     @staticmethod
-    def send_quote_request_notification(request_data: dict) -> bool:
-        """Send notification about new quote request"""
+    def format_quote_request(request_data: dict) -> str:
+        """Message text for a quote request"""
         company_line = f"🏢 <b>Компания:</b> {request_data.get('company')}" if request_data.get('company') else ""
         
         text = f"""
@@ -77,11 +94,21 @@ class TelegramService:
 🆔 <b>ID заявки:</b> {request_data.get('request_id', 'N/A')}
         """.strip()
         
-        return TelegramService.send_message(text)
+        return text
     
     @staticmethod
-    def send_callback_request_notification(request_data: dict) -> bool:
-        """Send notification about callback request"""
+    def send_quote_request_notification(request_data: dict) -> bool:
+        """Send notification about new quote request"""
+        return TelegramService.send_message(TelegramService.format_quote_request(request_data))
+    
+    @staticmethod
+    async def notify_quote_request(request_data: dict) -> bool:
+        """Send notification about new quote request (async, coalesced with other notifications)"""
+        return await telegram_client.notify(TelegramService.format_quote_request(request_data))
+    
+    @staticmethod
+    def format_callback_request(request_data: dict) -> str:
+        """Message text for a callback request"""
         email_line = f"📧 <b>Email:</b> {request_data.get('email')}" if request_data.get('email') else ""
         company_line = f"🏢 <b>Компания:</b> {request_data.get('company')}" if request_data.get('company') else ""
         
@@ -96,11 +123,21 @@ class TelegramService:
 ⏰ <b>Время:</b> {request_data.get('created_at', 'Только что')}
         """.strip()
         
-        return TelegramService.send_message(text)
+        return text
     
     @staticmethod
-    def send_consultation_request_notification(request_data: dict) -> bool:
-        """Send notification about consultation request"""
+    def send_callback_request_notification(request_data: dict) -> bool:
+        """Send notification about callback request"""
+        return TelegramService.send_message(TelegramService.format_callback_request(request_data))
+    
+    @staticmethod
+    async def notify_callback_request(request_data: dict) -> bool:
+        """Send notification about callback request (async, coalesced with other notifications)"""
+        return await telegram_client.notify(TelegramService.format_callback_request(request_data))
+    
+    @staticmethod
+    def format_consultation_request(request_data: dict) -> str:
+        """Message text for a consultation request"""
         company_line = f"🏢 <b>Компания:</b> {request_data.get('company')}" if request_data.get('company') else ""
         message_line = f"📝 <b>Сообщение:</b>\n{request_data.get('message')}" if request_data.get('message') else ""
         
@@ -117,11 +154,21 @@ class TelegramService:
 ⏰ <b>Время:</b> {request_data.get('created_at', 'Только что')}
         """.strip()
         
-        return TelegramService.send_message(text)
+        return text
     
     @staticmethod
-    def send_contact_message_notification(request_data: dict) -> bool:
-        """Send notification about contact form message"""
+    def send_consultation_request_notification(request_data: dict) -> bool:
+        """Send notification about consultation request"""
+        return TelegramService.send_message(TelegramService.format_consultation_request(request_data))
+    
+    @staticmethod
+    async def notify_consultation_request(request_data: dict) -> bool:
+        """Send notification about consultation request (async, coalesced with other notifications)"""
+        return await telegram_client.notify(TelegramService.format_consultation_request(request_data))
+    
+    @staticmethod
+    def format_contact_message(request_data: dict) -> str:
+        """Message text for a contact form message"""
         company_line = f"🏢 <b>Компания:</b> {request_data.get('company')}" if request_data.get('company') else ""
         
         text = f"""
@@ -138,11 +185,21 @@ class TelegramService:
 ⏰ <b>Время:</b> {request_data.get('created_at', 'Только что')}
         """.strip()
         
-        return TelegramService.send_message(text)
+        return text
     
     @staticmethod
-    def send_cart_order_notification(order_data: dict) -> bool:
-        """Send notification about cart order"""
+    def send_contact_message_notification(request_data: dict) -> bool:
+        """Send notification about contact form message"""
+        return TelegramService.send_message(TelegramService.format_contact_message(request_data))
+    
+    @staticmethod
+    async def notify_contact_message(request_data: dict) -> bool:
+        """Send notification about contact form message (async, coalesced with other notifications)"""
+        return await telegram_client.notify(TelegramService.format_contact_message(request_data))
+    
+    @staticmethod
+    def format_cart_order(order_data: dict) -> str:
+        """Message text for a cart order"""
         items_list = []
         for item in order_data.get('items', []):
             item_text = f"  • {item['name']} (Арт. {item['article']})\n"
@@ -180,7 +237,202 @@ class TelegramService:
 ⏰ <b>Время:</b> {order_data.get('created_at', 'Только что')}
         """.strip()
         
-        return TelegramService.send_message(text)
+        return text
+    
+    @staticmethod
+    def send_cart_order_notification(order_data: dict) -> bool:
+        """Send notification about cart order"""
+        return TelegramService.send_message(TelegramService.format_cart_order(order_data))
+    
+    @staticmethod
+    async def notify_cart_order(order_data: dict) -> bool:
+        """Send notification about cart order (async, coalesced with other notifications)"""
+        return await telegram_client.notify(TelegramService.format_cart_order(order_data))
+
+
+class TelegramClient:
+    """Async Bot API client with per-chat pacing and burst coalescing"""
+
+    def __init__(
+        self,
+        token: Optional[str] = None,
+        chat_id: Optional[str] = None,
+        api_url: str = TELEGRAM_API_URL,
+        chat_interval: float = TELEGRAM_CHAT_INTERVAL,
+        coalesce_window: float = TELEGRAM_COALESCE_WINDOW,
+        max_retry_after: float = TELEGRAM_MAX_RETRY_AFTER,
+        max_attempts: int = 3,
+        timeout: float = 10
+    ):
+        self._token = token
+        self._chat_id = chat_id
+        self.api_url = api_url.rstrip('/')
+        self.chat_interval = chat_interval
+        self.coalesce_window = coalesce_window
+        self.max_retry_after = max_retry_after
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._chat_locks: Dict[str, asyncio.Lock] = {}
+        self._next_send: Dict[str, float] = {}
+        self._pending: Dict[str, List[Tuple[str, asyncio.Future]]] = {}
+        self._flushers: Dict[str, asyncio.Task] = {}
+
+    @property
+    def token(self) -> Optional[str]:
+        return self._token or TELEGRAM_BOT_TOKEN
+
+    @property
+    def chat_id(self) -> Optional[str]:
+        return self._chat_id or TELEGRAM_CHAT_ID
+
+    def _bind_loop(self):
+        # HTTP client, locks and futures belong to the event loop they were created in
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+            self._chat_locks = {}
+            self._pending = {}
+            self._flushers = {}
+
+    async def send_message(self, text: str, chat_id: Optional[str] = None, parse_mode: str = 'HTML') -> bool:
+        """
+        Send one message now (paced per chat)
+
+        Waits out 429 responses up to max_retry_after seconds.
+
+        Returns:
+            True if Telegram accepted the message
+        """
+        chat_id = chat_id or self.chat_id
+        if not self.token or not chat_id:
+            logger.warning("Telegram credentials not configured")
+            return False
+        self._bind_loop()
+
+        url = f"{self.api_url}/bot{self.token}/sendMessage"
+        payload = {'chat_id': chat_id, 'text': text, 'parse_mode': parse_mode}
+        lock = self._chat_locks.setdefault(chat_id, asyncio.Lock())
+        async with lock:
+            for _ in range(self.max_attempts):
+                delay = self._next_send.get(chat_id, 0) - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                try:
+                    response = await self._client.post(url, json=payload)
+                except httpx.HTTPError as e:
+                    logger.error(f"Failed to send Telegram notification: {e}")
+                    return False
+                self._next_send[chat_id] = time.monotonic() + self.chat_interval
+
+                if response.status_code == 429:
+                    try:
+                        retry_after = float(response.json().get('parameters', {}).get('retry_after', 1))
+                    except ValueError:
+                        retry_after = 1.0
+                    if retry_after > self.max_retry_after:
+                        logger.error(f"Telegram rate limit: retry after {retry_after}s, giving up for now")
+                        return False
+                    logger.warning(f"Telegram rate limit: retrying in {retry_after}s")
+                    self._next_send[chat_id] = time.monotonic() + retry_after
+                    continue
+
+                if response.is_success:
+                    logger.info("Telegram notification sent successfully")
+                    return True
+                logger.error(f"Failed to send Telegram notification: {response.status_code} {response.text[:200]}")
+                return False
+        return False
+
+    async def notify(self, text: str, chat_id: Optional[str] = None) -> bool:
+        """
+        Queue a notification; everything queued for the chat within
+        coalesce_window seconds goes out as one digest
+
+        Returns:
+            True if the message (or the digest containing it) was sent
+        """
+        chat_id = chat_id or self.chat_id
+        if self.coalesce_window <= 0:
+            return await self.send_message(text, chat_id)
+        if not self.token or not chat_id:
+            logger.warning("Telegram credentials not configured")
+            return False
+        self._bind_loop()
+
+        future = self._loop.create_future()
+        self._pending.setdefault(chat_id, []).append((text, future))
+        if chat_id not in self._flushers:
+            self._flushers[chat_id] = asyncio.ensure_future(self._flush_later(chat_id))
+        # shield: one cancelled caller does not cancel the digest for the others
+        return await asyncio.shield(future)
+
+    @staticmethod
+    def build_digests(texts: List[str], limit: int = TELEGRAM_MESSAGE_LIMIT) -> List[Tuple[str, int]]:
+        """
+        Pack notifications into as few messages as the length limit allows
+
+        Returns:
+            (message text, number of notifications in it) in order
+        """
+        if len(texts) == 1:
+            return [(texts[0], 1)]
+        groups: List[List[str]] = []
+        size = 0
+        for text in texts:
+            added = len(text) + len(DIGEST_SEPARATOR)
+            if groups and size + added <= limit - 64:  # room for the header
+                groups[-1].append(text)
+                size += added
+            else:
+                groups.append([text])
+                size = added
+        digests = []
+        for group in groups:
+            if len(group) == 1:
+                digests.append((group[0], 1))
+            else:
+                header = f"📬 <b>Новые заявки: {len(group)}</b>"
+                digests.append((DIGEST_SEPARATOR.join([header] + group), len(group)))
+        return digests
+
+    async def _flush_later(self, chat_id: str):
+        try:
+            await asyncio.sleep(self.coalesce_window)
+        finally:
+            batch = self._pending.pop(chat_id, [])
+            self._flushers.pop(chat_id, None)
+        position = 0
+        for text, count in self.build_digests([text for text, _ in batch]):
+            try:
+                sent = await self.send_message(text, chat_id)
+            except Exception as e:
+                logger.error(f"Failed to send Telegram digest: {e}")
+                sent = False
+            for _, future in batch[position:position + count]:
+                if not future.done():
+                    future.set_result(sent)
+            position += count
+
+    async def close(self):
+        """Drop queued notifications (their outbox entries are retried) and close the HTTP client"""
+        for task in list(self._flushers.values()):
+            task.cancel()
+        for chat_id, batch in list(self._pending.items()):
+            for _, future in batch:
+                if not future.done():
+                    future.set_result(False)
+        self._pending = {}
+        self._flushers = {}
+        if self._client is not None:
+            client, self._client = self._client, None
+            self._loop = None
+            await client.aclose()
+
+
+telegram_client = TelegramClient()
 
 
 # Test function
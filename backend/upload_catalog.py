@@ -0,0 +1,222 @@
+"""
+Metadata catalog of the uploads directory
+uploaded_files holds size, mtime, dimensions, content hash and the variant
+manifest of every uploaded image, written when a file is uploaded, its
+variants finish or it is deleted. The admin media library is a paginated,
+indexed query over that table joined with the usage counts from
+upload_references instead of a stat() of the whole folder per request.
+reconcile_uploads.py rebuilds the table from disk; deploy-to-sweb.sh runs it
+on every deploy.
+"""
+import json
+import logging
+import os
+from concurrent.futures import Future
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Tuple
+
+from PIL import Image
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from database_sqlite import SessionLocal, UploadedFile, UploadReference
+from image_variants import UPLOAD_DIR, image_pipeline
+from static_files import content_hash
+
+logger = logging.getLogger(__name__)
+
+# Files the media library lists (the upload endpoint only accepts these)
+CATALOG_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp', '.gif'}
+# Smaller files are left out of the listing (test uploads)
+MIN_LISTED_SIZE = 1024  # bytes
+
+# sort parameter -> column
+SORT_COLUMNS = {
+    "modified": UploadedFile.modified,
+    "size": UploadedFile.size,
+    "filename": UploadedFile.filename,
+}
+SORT_KEYS = [*SORT_COLUMNS, "usage"]
+
+
+class ReconcileResult(NamedTuple):
+    added: int
+    updated: int
+    removed: int
+    unchanged: int
+
+
+def is_catalogued(path: Path) -> bool:
+    """Whether a directory entry belongs in the catalog (temporary files and variants do not)"""
+    return not path.name.startswith(".") and path.suffix.lower() in CATALOG_EXTENSIONS
+
+
+def image_size(path: Path) -> Tuple[Optional[int], Optional[int]]:
+    """(width, height) read from the image header, or (None, None)"""
+    try:
+        with Image.open(path) as image:
+            return image.size
+    except Exception:
+        return None, None
+
+
+def _variants_json(filename: str) -> Optional[str]:
+    manifest = image_pipeline.manifest(filename)
+    return json.dumps(manifest) if manifest is not None else None
+
+
+def record_upload(db: Session, path: Path, stat: Optional[os.stat_result] = None) -> UploadedFile:
+    """
+    Insert or refresh the catalog row of a file in the uploads directory
+
+    Args:
+        db: Session (the caller commits)
+        path: Uploaded file
+        stat: os.stat() result if already known
+
+    Returns:
+        The row
+    """
+    path = Path(path)
+    stat = stat or path.stat()
+    width, height = image_size(path)
+    row = db.get(UploadedFile, path.name) or UploadedFile(filename=path.name)
+    row.size = stat.st_size
+    row.modified = stat.st_mtime
+    row.width, row.height = width, height
+    row.content_hash = content_hash(path)  # free for content-addressed names
+    row.variants = _variants_json(path.name)
+    db.add(row)
+    return row
+
+
+def forget_upload(db: Session, filename: str):
+    """Drop the catalog row of a deleted file (the caller commits)"""
+    db.query(UploadedFile).filter(UploadedFile.filename == filename).delete(synchronize_session=False)
+
+
+def register_upload(path: Path):
+    """Record a new or re-uploaded file in its own session (upload endpoint, via run_blocking)"""
+    db = SessionLocal()
+    try:
+        record_upload(db, path)
+        db.commit()
+    finally:
+        db.close()
+
+
+def record_variants(filename: str, manifest: Optional[dict]):
+    """Store the variant manifest of a catalogued file once its variants exist"""
+    db = SessionLocal()
+    try:
+        db.query(UploadedFile).filter(UploadedFile.filename == filename).update(
+            {UploadedFile.variants: json.dumps(manifest) if manifest is not None else None},
+            synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def variants_done(filename: str, future: Future):
+    """ImagePipeline future callback: copy the finished manifest into the catalog"""
+    if future.cancelled() or future.exception() is not None:
+        return  # logged by the pipeline
+    try:
+        record_variants(filename, future.result())
+    except Exception as e:
+        logger.error(f"Failed to record variants of {filename}: {e}")
+
+
+def reconcile(db: Session, upload_dir: Path = UPLOAD_DIR) -> ReconcileResult:
+    """
+    Bring the catalog in line with the files on disk
+
+    Files whose size and mtime match their row are not re-read (their
+    variant manifest is still picked up if it appeared since); new or
+    changed files are hashed and measured, rows of missing files removed.
+
+    Returns:
+        ReconcileResult with the number of rows in each state
+    """
+    rows = {row.filename: row for row in db.query(UploadedFile)}
+    added = updated = unchanged = 0
+    seen = set()
+    upload_dir = Path(upload_dir)
+    entries = list(os.scandir(upload_dir)) if upload_dir.is_dir() else []
+    for entry in entries:
+        path = Path(entry.path)
+        if not entry.is_file() or not is_catalogued(path):
+            continue
+        seen.add(entry.name)
+        stat = entry.stat()
+        row = rows.get(entry.name)
+        if row is None:
+            record_upload(db, path, stat=stat)
+            added += 1
+        elif row.size != stat.st_size or row.modified != stat.st_mtime:
+            record_upload(db, path, stat=stat)
+            updated += 1
+        else:
+            if row.variants is None:
+                row.variants = _variants_json(entry.name)
+            unchanged += 1
+
+    removed = [filename for filename in rows if filename not in seen]
+    for filename in removed:
+        forget_upload(db, filename)
+    db.flush()
+    return ReconcileResult(added, updated, len(removed), unchanged)
+
+
+def list_uploads(db: Session, page: int = 1, per_page: int = 100, sort: str = "modified",
+                 descending: bool = True) -> Tuple[int, int, List[dict]]:
+    """
+    One page of the media library
+
+    Args:
+        db: Session
+        page: 1-based page number
+        per_page: Files per page
+        sort: One of SORT_KEYS ("usage" = number of references)
+        descending: Largest/newest first
+
+    Returns:
+        (total files, total bytes, files of the page with their usage counts)
+    """
+    usage = db.query(
+        UploadReference.filename.label("filename"),
+        func.count().label("usage_count")
+    ).group_by(UploadReference.filename).subquery()
+    usage_count = func.coalesce(usage.c.usage_count, 0)
+
+    listed = db.query(UploadedFile).filter(UploadedFile.size >= MIN_LISTED_SIZE)
+    total, total_size = listed.with_entities(
+        func.count(), func.coalesce(func.sum(UploadedFile.size), 0)
+    ).one()
+
+    order = usage_count if sort == "usage" else SORT_COLUMNS[sort]
+    order = order.desc() if descending else order.asc()
+    rows = (
+        listed.outerjoin(usage, usage.c.filename == UploadedFile.filename)
+        .with_entities(UploadedFile, usage_count)
+        .order_by(order, UploadedFile.filename)
+        .offset((page - 1) * per_page)
+        .limit(per_page)
+        .all()
+    )
+    files = [
+        {
+            "filename": row.filename,
+            "size": row.size,
+            "modified": row.modified,
+            "width": row.width,
+            "height": row.height,
+            "hash": row.content_hash,
+            "variants": json.loads(row.variants) if row.variants else None,
+            "usage_count": count,
+            "url": f"/api/uploads/{row.filename}",
+        }
+        for row, count in rows
+    ]
+    return total, total_size, files
@@ -0,0 +1,231 @@
+"""
+Content-addressed storage for admin uploads
+Uploads are named after the SHA-256 of their bytes, hashed while the
+request body is streamed to disk, so the same photo uploaded twice is stored
+once and its URL never changes meaning. upload_references records which
+products, categories, portfolio items and settings use each file; files
+nothing refers to are garbage-collected after a grace period.
+"""
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import BinaryIO, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from database_sqlite import (
+    AppSettings, PortfolioItem, ProductCategory, SessionLocal, SQLProduct, SQLProductImage, UploadedFile, UploadReference
+)
+from image_variants import UPLOAD_DIR, delete_variants
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # bytes read from the request body at a time
+# Unreferenced files younger than this are kept: an image is uploaded before
+# the product/category form that uses it is saved
+UPLOAD_GC_GRACE = float(os.getenv('UPLOAD_GC_GRACE', str(24 * 3600)))  # seconds
+
+TEMP_PREFIX = ".upload-"
+EXTENSION_ALIASES = {"jpeg": "jpg"}
+
+# Upload URLs as stored in the database: /api/uploads/<name>, /uploads/<name>,
+# absolute or with a query string, also inside JSON (color_images)
+UPLOAD_URL_RE = re.compile(r"/uploads/([A-Za-z0-9][A-Za-z0-9._-]*)")
+
+# owner type -> (owner id column, column that may hold upload URLs)
+OWNER_COLUMNS = {
+    "product": [
+        (SQLProduct.id, SQLProduct.color_images),
+        (SQLProductImage.product_id, SQLProductImage.image_url),
+    ],
+    "category": [(ProductCategory.id, ProductCategory.image)],
+    "portfolio": [(PortfolioItem.id, PortfolioItem.image)],
+    "settings": [
+        (AppSettings.id, AppSettings.hero_image),
+        (AppSettings.id, AppSettings.hero_mobile_image),
+        (AppSettings.id, AppSettings.about_image),
+    ],
+}
+
+
+class StoredUpload(NamedTuple):
+    filename: str
+    path: Path
+    size: int
+    created: bool  # False when identical bytes were already stored
+
+    @property
+    def url(self) -> str:
+        return f"/api/uploads/{self.filename}"
+
+
+def content_filename(digest: str, extension: str) -> str:
+    """Storage name for content with the given SHA-256 hex digest"""
+    extension = extension.lower().lstrip(".")
+    return f"{digest}.{EXTENSION_ALIASES.get(extension, extension)}"
+
+
+def store_upload(source: BinaryIO, extension: str, upload_dir: Path = UPLOAD_DIR) -> StoredUpload:
+    """
+    Stream an upload to disk under the hash of its content
+
+    The body is hashed chunk by chunk while it is written to a temporary
+    file, which is then renamed into place (or dropped if the content is
+    already stored).
+
+    Args:
+        source: Readable binary file (UploadFile.file)
+        extension: Original file extension, e.g. "jpg"
+        upload_dir: Storage directory
+
+    Returns:
+        StoredUpload with the content-addressed name
+    """
+    upload_dir = Path(upload_dir)
+    upload_dir.mkdir(parents=True, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_name = tempfile.mkstemp(prefix=TEMP_PREFIX, dir=upload_dir)
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            while True:
+                chunk = source.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                tmp.write(chunk)
+                size += len(chunk)
+
+        filename = content_filename(digest.hexdigest(), extension)
+        path = upload_dir / filename
+        if path.exists():
+            os.unlink(tmp_name)
+            # Restart the GC grace period: the duplicate is about to be referenced again
+            os.utime(path)
+            return StoredUpload(filename, path, size, created=False)
+        os.chmod(tmp_name, 0o644)
+        os.replace(tmp_name, path)
+        return StoredUpload(filename, path, size, created=True)
+    except BaseException:
+        if os.path.exists(tmp_name):
+            os.unlink(tmp_name)
+        raise
+
+
+def upload_filenames(value: Optional[str]) -> Set[str]:
+    """Names of uploaded files referenced in a column value"""
+    if not value:
+        return set()
+    return set(UPLOAD_URL_RE.findall(value))
+
+
+def _scan(db: Session, owner_type: str, owner_id: Optional[str] = None) -> Dict[str, Set[str]]:
+    found: Dict[str, Set[str]] = defaultdict(set)
+    for id_column, value_column in OWNER_COLUMNS[owner_type]:
+        query = db.query(id_column, value_column)
+        if owner_id is not None:
+            query = query.filter(id_column == owner_id)
+        for row_owner_id, value in query.yield_per(1000):
+            found[row_owner_id] |= upload_filenames(value)
+    return found
+
+
+def sync_references(db: Session, owner_type: str, owner_id: str) -> Set[str]:
+    """
+    Replace the recorded references of one owner with what its rows use now
+
+    Call after changing (or deleting) the owner, before the caller commits.
+
+    Returns:
+        Names of the files the owner uses
+    """
+    db.flush()
+    filenames = _scan(db, owner_type, owner_id).get(owner_id, set())
+    db.query(UploadReference).filter(
+        UploadReference.owner_type == owner_type,
+        UploadReference.owner_id == owner_id
+    ).delete(synchronize_session=False)
+    for filename in sorted(filenames):
+        db.add(UploadReference(filename=filename, owner_type=owner_type, owner_id=owner_id))
+    return filenames
+
+
+def rebuild_references(db: Session) -> int:
+    """
+    Recreate the whole reference table from the owner rows
+
+    Returns:
+        Number of references recorded
+    """
+    db.query(UploadReference).delete(synchronize_session=False)
+    count = 0
+    for owner_type in OWNER_COLUMNS:
+        for owner_id, filenames in _scan(db, owner_type).items():
+            for filename in sorted(filenames):
+                db.add(UploadReference(filename=filename, owner_type=owner_type, owner_id=owner_id))
+                count += 1
+    db.flush()
+    return count
+
+
+def references_for(db: Session, filename: str) -> List[Tuple[str, str]]:
+    """(owner type, owner id) pairs using a file"""
+    rows = db.query(UploadReference.owner_type, UploadReference.owner_id).filter(
+        UploadReference.filename == filename
+    ).order_by(UploadReference.owner_type, UploadReference.owner_id).all()
+    return [(row.owner_type, row.owner_id) for row in rows]
+
+
+def collect_garbage(upload_dir: Path = UPLOAD_DIR, grace: float = UPLOAD_GC_GRACE,
+                    dry_run: bool = False) -> List[str]:
+    """
+    Delete uploads that nothing references
+
+    References are rebuilt from the database first, so rows written by
+    scripts or imports that bypass sync_references are still honoured.
+
+    Args:
+        upload_dir: Storage directory
+        grace: Minimum age in seconds of a deleted file (by mtime)
+        dry_run: Only report what would be deleted
+
+    Returns:
+        Names of deleted (or deletable) files
+    """
+    db = SessionLocal()
+    try:
+        rebuild_references(db)
+        db.commit()
+        referenced = {name for (name,) in db.query(UploadReference.filename).distinct()}
+    finally:
+        db.close()
+
+    cutoff = time.time() - grace
+    removed = []
+    for path in sorted(Path(upload_dir).iterdir()):
+        if not path.is_file() or path.name in referenced:
+            continue
+        try:
+            if path.stat().st_mtime > cutoff:
+                continue
+            if not dry_run:
+                path.unlink()
+                if not path.name.startswith(TEMP_PREFIX):
+                    delete_variants(path.name)
+        except FileNotFoundError:
+            continue
+        removed.append(path.name)
+    if removed and not dry_run:
+        db = SessionLocal()
+        try:
+            db.query(UploadedFile).filter(UploadedFile.filename.in_(removed)).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+        logger.info(f"Upload GC removed {len(removed)} unreferenced files")
+    return removed
@@ -0,0 +1,151 @@
+"""
+Write-behind buffer for product view counts
+Product page views are counted in memory and written to SQLite as one
+batched UPDATE every VIEW_FLUSH_INTERVAL seconds or VIEW_FLUSH_THRESHOLD
+views, instead of a commit per page view.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+from executor import run_blocking
+
+logger = logging.getLogger(__name__)
+
+VIEW_FLUSH_INTERVAL = float(os.getenv('VIEW_FLUSH_INTERVAL', '10'))  # seconds
+VIEW_FLUSH_THRESHOLD = int(os.getenv('VIEW_FLUSH_THRESHOLD', '200'))  # buffered views
+# Same IP viewing the same product within this window counts once (0 disables)
+VIEW_DEDUP_WINDOW = float(os.getenv('VIEW_DEDUP_WINDOW', '1800'))  # seconds
+VIEW_DEDUP_MAX_ENTRIES = 100_000
+
+
+def _write_views(counts: Dict[str, int]) -> None:
+    from services_sqlite import ProductService
+    ProductService.add_views(counts)
+
+
+class ViewCounter:
+    """In-memory view counter flushed to the database in batches"""
+
+    def __init__(
+        self,
+        flush_interval: float = VIEW_FLUSH_INTERVAL,
+        flush_threshold: int = VIEW_FLUSH_THRESHOLD,
+        dedup_window: float = VIEW_DEDUP_WINDOW,
+        dedup_max_entries: int = VIEW_DEDUP_MAX_ENTRIES,
+        writer: Callable[[Dict[str, int]], None] = _write_views
+    ):
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self.dedup_window = dedup_window
+        self.dedup_max_entries = dedup_max_entries
+        self._writer = writer
+        self._pending: Dict[str, int] = {}
+        self._pending_total = 0
+        self._seen: "OrderedDict[tuple, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def _is_duplicate(self, key: tuple, now: float) -> bool:
+        # Entries are kept in first-seen order, so expired ones are at the front
+        while self._seen:
+            seen_at = next(iter(self._seen.values()))
+            if now - seen_at < self.dedup_window and len(self._seen) < self.dedup_max_entries:
+                break
+            self._seen.popitem(last=False)
+
+        if key in self._seen:
+            return True
+        self._seen[key] = now
+        return False
+
+    def record(self, product_id: str, client_ip: Optional[str] = None) -> bool:
+        """
+        Count one product view
+
+        Args:
+            product_id: Viewed product
+            client_ip: Viewer IP for deduplication (optional)
+
+        Returns:
+            False if the view was dropped as a repeat from the same IP
+        """
+        with self._lock:
+            if client_ip and self.dedup_window > 0:
+                if self._is_duplicate((client_ip, product_id), time.monotonic()):
+                    return False
+            self._pending[product_id] = self._pending.get(product_id, 0) + 1
+            self._pending_total += 1
+            threshold_reached = self._pending_total >= self.flush_threshold
+
+        if threshold_reached:
+            if self._task is not None and self._loop is not None:
+                # Let the background task write, never block the caller
+                self._loop.call_soon_threadsafe(self._wakeup.set)
+            else:
+                self.flush()
+        return True
+
+    def flush(self) -> int:
+        """
+        Write buffered views to the database
+
+        Returns:
+            Number of views written
+        """
+        with self._flush_lock:
+            with self._lock:
+                counts, self._pending = self._pending, {}
+                self._pending_total = 0
+            if not counts:
+                return 0
+
+            try:
+                self._writer(counts)
+            except Exception as e:
+                logger.error(f"Failed to flush product views: {e}")
+                # Keep the views for the next attempt
+                with self._lock:
+                    for product_id, count in counts.items():
+                        self._pending[product_id] = self._pending.get(product_id, 0) + count
+                        self._pending_total += count
+                return 0
+            return sum(counts.values())
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await run_blocking(self.flush)
+
+    def start(self):
+        """Start periodic flushing (call from the running event loop)"""
+        if self._task is None:
+            self._loop = asyncio.get_running_loop()
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop periodic flushing and write whatever is still buffered"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._loop = None
+        self.flush()
+
+
+view_counter = ViewCounter()
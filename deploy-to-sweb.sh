@@ -46,6 +46,14 @@ if [ -f "migrate_add_articles_to_products.py" ]; then
     echo "   Применение миграции: добавление артикулов товарам..."
     python3 migrate_add_articles_to_products.py
 fi
+if [ -f "migrate_add_upload_references.py" ]; then
+    echo "   Применение миграции: учёт использования загруженных файлов..."
+    python3 migrate_add_upload_references.py
+fi
+if [ -f "reconcile_uploads.py" ]; then
+    echo "   Синхронизация каталога загруженных файлов с uploads/..."
+    python3 reconcile_uploads.py
+fi
 
 # Перезапуск backend через supervisor
 echo "🔄 Перезапуск Backend..."
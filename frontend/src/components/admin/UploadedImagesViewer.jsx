@@ -4,9 +4,22 @@ import { Image as ImageIcon, Trash2, Copy, Download, X, Loader2, Check, AlertCir
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
+const PER_PAGE = 100;
+
+// owner_type of upload references returned with a 409 on delete
+const OWNER_LABELS = {
+  product: 'товар',
+  category: 'категория',
+  portfolio: 'портфолио',
+  settings: 'настройки сайта'
+};
 
 const UploadedImagesViewer = () => {
   const [files, setFiles] = useState([]);
+  const [total, setTotal] = useState(0);
+  const [totalSize, setTotalSize] = useState(0);
+  const [page, setPage] = useState(1);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [loading, setLoading] = useState(true);
   const [selectedImage, setSelectedImage] = useState(null);
   const [message, setMessage] = useState({ type: '', text: '' });
@@ -16,16 +29,23 @@ const UploadedImagesViewer = () => {
     fetchFiles();
   }, []);
 
-  const fetchFiles = async () => {
+  const fetchFiles = async (nextPage = 1) => {
     try {
-      setLoading(true);
-      const response = await axios.get(`${API}/admin/uploaded-files`);
-      setFiles(response.data.files || []);
+      if (nextPage === 1) setLoading(true); else setLoadingMore(true);
+      const response = await axios.get(`${API}/admin/uploaded-files`, {
+        params: { page: nextPage, per_page: PER_PAGE }
+      });
+      const pageFiles = response.data.files || [];
+      setFiles((previous) => (nextPage === 1 ? pageFiles : [...previous, ...pageFiles]));
+      setTotal(response.data.total || 0);
+      setTotalSize(response.data.total_size || 0);
+      setPage(nextPage);
     } catch (error) {
       console.error('Failed to fetch files:', error);
       setMessage({ type: 'error', text: 'Ошибка загрузки списка файлов' });
     } finally {
       setLoading(false);
+      setLoadingMore(false);
     }
   };
 
@@ -52,16 +72,36 @@ const UploadedImagesViewer = () => {
     setTimeout(() => setMessage({ type: '', text: '' }), 3000);
   };
 
+  const describeReferences = (references = []) =>
+    references.map((ref) => `${OWNER_LABELS[ref.owner_type] || ref.owner_type} ${ref.owner_id}`);
+
+  const deleteFile = async (filename, force = false) => {
+    const response = await axios.delete(`${API}/admin/uploaded-files/${filename}`, {
+      params: force ? { force: true } : undefined
+    });
+    if (response.data.success) {
+      setMessage({ type: 'success', text: 'Файл успешно удален' });
+      await fetchFiles();
+    }
+  };
+
   const handleDelete = async (filename) => {
     if (!window.confirm(`Удалить файл ${filename}?`)) return;
 
     try {
       setDeletingFile(filename);
-      const response = await axios.delete(`${API}/admin/uploaded-files/${filename}`);
-      
-      if (response.data.success) {
-        setMessage({ type: 'success', text: 'Файл успешно удален' });
-        await fetchFiles();
+      try {
+        await deleteFile(filename);
+      } catch (error) {
+        // 409: the file is still used by products, categories, portfolio or settings
+        if (error.response?.status !== 409) throw error;
+        const detail = error.response.data?.detail || {};
+        const reason = detail.message || 'Файл используется';
+        const owners = describeReferences(detail.references);
+        setMessage({ type: 'error', text: `${reason}: ${owners.join(', ')}` });
+        if (window.confirm(`${reason}:\n${owners.join('\n')}\n\nВсё равно удалить файл ${filename}?`)) {
+          await deleteFile(filename, true);
+        }
       }
     } catch (error) {
       console.error('Failed to delete file:', error);
@@ -86,11 +126,11 @@ const UploadedImagesViewer = () => {
         <div>
           <h2 className="text-2xl font-bold text-gray-900">Загруженные изображения</h2>
           <p className="text-gray-600 mt-1">
-            Всего файлов: {files.length} ({formatFileSize(files.reduce((sum, f) => sum + f.size, 0))})
+            Всего файлов: {total} ({formatFileSize(totalSize)})
           </p>
         </div>
         <button
-          onClick={fetchFiles}
+          onClick={() => fetchFiles()}
           className="bg-navy hover:bg-navy-hover text-white px-4 py-2 rounded-lg transition-colors"
         >
           Обновить
@@ -153,6 +193,10 @@ const UploadedImagesViewer = () => {
                   <span>{formatFileSize(file.size)}</span>
                   <span>{formatDate(file.modified)}</span>
                 </div>
+                <div className="flex items-center justify-between text-xs text-gray-500">
+                  <span>{file.width && file.height ? `${file.width}×${file.height}` : ''}</span>
+                  <span>{file.usage_count ? `Используется: ${file.usage_count}` : 'Не используется'}</span>
+                </div>
 
                 {/* Actions */}
                 <div className="flex gap-2 pt-2">
@@ -192,6 +236,19 @@ const UploadedImagesViewer = () => {
         </div>
       )}
 
+      {files.length < total && (
+        <div className="flex justify-center">
+          <button
+            onClick={() => fetchFiles(page + 1)}
+            disabled={loadingMore}
+            className="flex items-center gap-2 px-4 py-2 text-navy border border-navy rounded-lg hover:bg-gray-50 transition-colors disabled:opacity-50"
+          >
+            {loadingMore && <Loader2 className="w-4 h-4 animate-spin" />}
+            Показать ещё
+          </button>
+        </div>
+      )}
+
       {/* Full image modal */}
       {selectedImage && (
         <div
@@ -0,0 +1,154 @@
+"""
+Concurrency benchmark: latency of a cheap endpoint while heavy catalog
+queries run in parallel.
+
+Starts the API under uvicorn on a throwaway SQLite database, measures
+/api/health latency on an idle server, then again while worker threads keep
+hitting uncached heavy endpoints. With blocking work kept off the event loop
+the p99 under load should stay close to the idle one.
+
+Usage (from the repository root):
+    python -m tests.benchmarks.bench_concurrency [--products 3000] [--workers 8]
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT / "backend"))
+sys.path.insert(0, str(ROOT))
+
+_DB_DIR = tempfile.mkdtemp(prefix="uniform-factory-bench-")
+os.environ.setdefault("SQLITE_DATABASE_URL", f"sqlite:///{_DB_DIR}/bench.db")
+os.chdir(_DB_DIR)
+
+import requests  # noqa: E402
+
+HEAVY_PATHS = [
+    "/api/admin/products",
+    "/api/analytics/overview",
+    "/api/products?limit=200",
+]
+
+
+def seed(products: int):
+    from database_sqlite import Base, SessionLocal, engine
+    from tests.factories import seed_catalog
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        seed_catalog(db, products, categories=10)
+    finally:
+        db.close()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+# Runs the API in its own process so the load generator does not share its GIL.
+# Rate limiting is lifted, otherwise the load generator only gets 429s.
+SERVER_SCRIPT = """
+import sys
+import uvicorn
+uvicorn.run("server:app", host="127.0.0.1", port=int(sys.argv[1]),
+            log_level="warning", timeout_keep_alive=60)
+"""
+
+
+def start_server(port: int, pool_size: int) -> subprocess.Popen:
+    env = dict(os.environ, PYTHONPATH=str(ROOT / "backend"), THREAD_POOL_SIZE=str(pool_size),
+               RATE_LIMIT_ENABLED="false")
+    process = subprocess.Popen([sys.executable, "-c", SERVER_SCRIPT, str(port)], env=env, cwd=_DB_DIR)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            requests.get(f"http://127.0.0.1:{port}/api/health", timeout=1)
+            return process
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("API server did not start")
+
+
+def measure(base_url: str, samples: int) -> list:
+    session = requests.Session()
+    latencies = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        session.get(f"{base_url}/api/health").raise_for_status()
+        latencies.append((time.perf_counter() - started) * 1000)
+        time.sleep(0.005)
+    return latencies
+
+
+def heavy_load(base_url: str, stop: threading.Event, counter: list):
+    session = requests.Session()
+    i = 0
+    while not stop.is_set():
+        session.get(f"{base_url}{HEAVY_PATHS[i % len(HEAVY_PATHS)]}")
+        counter.append(1)
+        i += 1
+
+
+def report(label: str, latencies: list):
+    latencies = sorted(latencies)
+    p50 = statistics.median(latencies)
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"{label:<12} p50 {p50:7.2f} ms   p99 {p99:7.2f} ms   max {latencies[-1]:7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--products", type=int, default=3000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--pool", type=int, default=int(os.getenv("THREAD_POOL_SIZE", "40")),
+                        help="THREAD_POOL_SIZE for the server")
+    parser.add_argument("--samples", type=int, default=300)
+    args = parser.parse_args()
+
+    print(f"Seeding {args.products} products...")
+    seed(args.products)
+    port = free_port()
+    server = start_server(port, args.pool)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        run(base_url, args)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def run(base_url: str, args):
+    report("idle", measure(base_url, args.samples))
+
+    stop = threading.Event()
+    done = []
+    workers = [
+        threading.Thread(target=heavy_load, args=(base_url, stop, done), daemon=True)
+        for _ in range(args.workers)
+    ]
+    for worker in workers:
+        worker.start()
+    time.sleep(1)
+    loaded = measure(base_url, args.samples)
+    stop.set()
+    for worker in workers:
+        worker.join()
+
+    report(f"{args.workers} heavy", loaded)
+    print(f"heavy requests completed: {len(done)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Middleware overhead benchmark: requests/sec on /api/health.
+
+Builds the API with the previous BaseHTTPMiddleware-based security and rate
+limit middlewares and with the pure-ASGI ones, then drives each app directly
+through the ASGI interface (no sockets, so only framework and middleware
+cost is measured).
+
+Usage (from the repository root):
+    python -m tests.benchmarks.bench_middleware [--requests 20000]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT / "backend"))
+
+os.chdir(tempfile.mkdtemp(prefix="uniform-factory-bench-"))
+
+from fastapi import FastAPI, Request  # noqa: E402
+from fastapi.middleware.cors import CORSMiddleware  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from starlette.middleware.base import BaseHTTPMiddleware  # noqa: E402
+
+import security_middleware  # noqa: E402
+from rate_limiter import InMemoryRateLimiter, RateLimit  # noqa: E402
+from server import api_router  # noqa: E402
+
+# Never deny during the run
+security_middleware.DEFAULT_RATE_LIMIT = RateLimit(10 ** 9, 60)
+
+
+class LegacySecurityHeadersMiddleware(BaseHTTPMiddleware):
+    """Previous implementation: BaseHTTPMiddleware, CSP joined per response"""
+
+    async def dispatch(self, request: Request, call_next):
+        response = await call_next(request)
+        response.headers['X-Content-Type-Options'] = 'nosniff'
+        response.headers['X-Frame-Options'] = 'DENY'
+        response.headers['X-XSS-Protection'] = '1; mode=block'
+        response.headers['Strict-Transport-Security'] = 'max-age=31536000; includeSubDomains'
+        response.headers['Content-Security-Policy'] = "; ".join(list(security_middleware.CSP_DIRECTIVES))
+        return response
+
+
+class LegacyRateLimitMiddleware(BaseHTTPMiddleware):
+    """Previous implementation shape: BaseHTTPMiddleware around the same limiter"""
+
+    async def dispatch(self, request: Request, call_next):
+        client_ip = request.client.host if request.client else 'unknown'
+        bucket, rule = security_middleware.get_rate_limit_rule(request.url.path)
+        result = security_middleware.rate_limiter.hit(f"{bucket}:{client_ip}", rule)
+        if not result.allowed:
+            return JSONResponse(status_code=429, content={"detail": "Too many requests"})
+        response = await call_next(request)
+        response.headers['X-RateLimit-Limit'] = str(result.limit)
+        response.headers['X-RateLimit-Remaining'] = str(result.remaining)
+        response.headers['X-RateLimit-Reset'] = str(int(result.reset))
+        return response
+
+
+def build_app(security_cls, rate_limit_cls) -> FastAPI:
+    app = FastAPI()
+    app.include_router(api_router)
+    app.add_middleware(rate_limit_cls)
+    app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_credentials=True,
+                       allow_methods=["*"], allow_headers=["*"])
+    app.add_middleware(security_cls)
+    return app
+
+
+async def drive(app, requests: int) -> float:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": "/api/health", "raw_path": b"/api/health", "root_path": "",
+        "query_string": b"", "headers": [(b"host", b"localhost")],
+        "client": ("127.0.0.1", 50000), "server": ("localhost", 80),
+    }
+
+    never = asyncio.Event()
+
+    async def request():
+        # Like a server: the body once, then block until the client disconnects
+        sent = False
+
+        async def receive():
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            await never.wait()
+
+        await app(dict(scope), receive, send)
+
+    async def send(message):
+        pass
+
+    for _ in range(200):  # warm up
+        await request()
+    started = time.perf_counter()
+    for _ in range(requests):
+        await request()
+    return requests / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+
+    stacks = {
+        "BaseHTTPMiddleware": build_app(LegacySecurityHeadersMiddleware, LegacyRateLimitMiddleware),
+        "pure ASGI": build_app(security_middleware.SecurityHeadersMiddleware, security_middleware.RateLimitMiddleware),
+    }
+    results = {}
+    for name, app in stacks.items():
+        security_middleware.rate_limiter = InMemoryRateLimiter()
+        results[name] = asyncio.run(drive(app, args.requests))
+        print(f"{name:<20} {results[name]:10,.0f} req/s")
+    print(f"speedup x{results['pure ASGI'] / results['BaseHTTPMiddleware']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
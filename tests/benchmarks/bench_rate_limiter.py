@@ -0,0 +1,102 @@
+"""
+Rate limiter microbenchmark at 10k and 100k distinct clients.
+
+Compares the per-request cost of the previous limiter (rebuilding the whole
+store dict to expire entries on every request) with the sliding-window
+limiter on each storage backend (memory, mmap, and redis against the local
+RESP stand-in from the tests). The store is pre-filled with N active clients,
+then requests from random clients are timed.
+
+Usage (from the repository root):
+    python -m tests.benchmarks.bench_rate_limiter [--clients 10000 100000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT / "backend"))
+sys.path.insert(0, str(ROOT))
+
+from rate_limiter import InMemoryRateLimiter, MmapRateLimiter, RateLimit, RedisRateLimiter  # noqa: E402
+from tests.resp_server import FakeRespServer  # noqa: E402
+
+WINDOW = 60
+LIMIT = 60
+
+
+class DictRebuildLimiter:
+    """The previous RateLimitMiddleware algorithm, without the HTTP parts"""
+
+    def __init__(self):
+        self.store = {}
+
+    def hit(self, client_ip: str, now: float) -> bool:
+        self.store = {
+            ip: (count, timestamp)
+            for ip, (count, timestamp) in self.store.items()
+            if now - timestamp < WINDOW
+        }
+        if client_ip in self.store:
+            count, first_request_time = self.store[client_ip]
+            if count >= LIMIT:
+                return False
+            self.store[client_ip] = (count + 1, first_request_time)
+        else:
+            self.store[client_ip] = (1, now)
+        return True
+
+
+def bench_dict_rebuild(clients: list, requests: int) -> float:
+    limiter = DictRebuildLimiter()
+    now = time.time()
+    limiter.store = {ip: (1, now) for ip in clients}
+    sample = [random.choice(clients) for _ in range(requests)]
+    started = time.perf_counter()
+    for ip in sample:
+        limiter.hit(ip, now)
+    return (time.perf_counter() - started) / requests
+
+
+def bench_sliding_window(limiter, clients: list, requests: int) -> float:
+    rule = RateLimit(LIMIT, WINDOW)
+    now = time.time()
+    for ip in clients:
+        limiter.hit(f"default:{ip}", rule, now)
+    sample = [f"default:{random.choice(clients)}" for _ in range(requests)]
+    started = time.perf_counter()
+    for key in sample:
+        limiter.hit(key, rule, now)
+    elapsed = time.perf_counter() - started
+    limiter.close()
+    return elapsed / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--clients", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--requests", type=int, default=200_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp, FakeRespServer() as resp_server:
+        for count in args.clients:
+            clients = [f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}" for i in range(count)]
+            # The old algorithm is O(clients) per request, so it gets fewer samples
+            old = bench_dict_rebuild(clients, max(50, 2_000_000 // count))
+            print(f"{count:>7} clients   dict rebuild   {old * 1e6:10.1f} us/req")
+            backends = {
+                "memory": InMemoryRateLimiter(max_keys=count * 2),
+                "mmap": MmapRateLimiter(os.path.join(tmp, f"rl-{count}"), slots=count * 2),
+                "redis": RedisRateLimiter(resp_server.url),
+            }
+            for name, limiter in backends.items():
+                new = bench_sliding_window(limiter, clients, args.requests)
+                print(f"{'':>15} sliding/{name:<6} {new * 1e6:10.2f} us/req   x{old / new:,.0f}")
+
+
+if __name__ == "__main__":
+    main()
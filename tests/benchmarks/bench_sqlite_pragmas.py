@@ -0,0 +1,122 @@
+"""
+SQLite PRAGMA profile benchmark: mixed read/write throughput.
+
+Runs the same workload against two fresh database files: one with SQLite
+defaults (rollback journal, synchronous=FULL) and one with the profile from
+database_sqlite.SQLITE_PRAGMAS. Reader threads fetch catalog pages while
+writer threads insert quote requests and web-vitals rows, like the public site
+under load.
+
+Usage (from the repository root):
+    python -m tests.benchmarks.bench_sqlite_pragmas [--seconds 5] [--readers 8] [--writers 2]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT / "backend"))
+sys.path.insert(0, str(ROOT))
+
+_DB_DIR = tempfile.mkdtemp(prefix="uniform-factory-bench-")
+os.environ.setdefault("SQLITE_DATABASE_URL", f"sqlite:///{_DB_DIR}/app.db")
+
+from sqlalchemy import create_engine, event  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from database_sqlite import SQLITE_PRAGMAS, Base, QuoteRequest, WebVitals, apply_sqlite_pragmas  # noqa: E402
+from services_sqlite import ProductService  # noqa: E402
+from tests.factories import seed_catalog  # noqa: E402
+
+# Only the busy timeout, so the baseline waits for locks instead of failing at once
+DEFAULT_PROFILE = {"busy_timeout": SQLITE_PRAGMAS["busy_timeout"]}
+
+
+def make_sessionmaker(name: str, pragmas: dict, products: int):
+    engine = create_engine(
+        f"sqlite:///{_DB_DIR}/{name}.db", connect_args={"check_same_thread": False}
+    )
+    event.listen(engine, "connect", lambda dbapi_connection, record: apply_sqlite_pragmas(dbapi_connection, pragmas))
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = factory()
+    try:
+        seed_catalog(db, products, categories=10)
+    finally:
+        db.close()
+    return factory
+
+
+def reader(factory, stop: threading.Event, stats: dict):
+    card = ProductService.CARD_FIELDS
+    while not stop.is_set():
+        db = factory()
+        try:
+            cursor = None
+            for _ in range(3):
+                _, cursor = ProductService._get_products_page(db, 24, cursor, card)
+            stats["reads"] += 1
+        except OperationalError:
+            stats["errors"] += 1
+        finally:
+            db.close()
+
+
+def writer(factory, stop: threading.Event, stats: dict):
+    while not stop.is_set():
+        db = factory()
+        try:
+            db.add(QuoteRequest(
+                request_id=f"REQ-BENCH-{uuid.uuid4().hex[:8]}", name="Bench", email="bench@example.com",
+                phone="+70000000000", category="shirts", quantity="10", fabric="cotton",
+                branding="none", estimated_price=1000, status="new"
+            ))
+            db.add(WebVitals(name="LCP", value=1234.5, rating="good", page="/catalog"))
+            db.commit()
+            stats["writes"] += 1
+        except OperationalError:
+            db.rollback()
+            stats["errors"] += 1
+        finally:
+            db.close()
+
+
+def run_profile(label: str, factory, args):
+    stats = {"reads": 0, "writes": 0, "errors": 0}
+    stop = threading.Event()
+    threads = [threading.Thread(target=reader, args=(factory, stop, stats)) for _ in range(args.readers)]
+    threads += [threading.Thread(target=writer, args=(factory, stop, stats)) for _ in range(args.writers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    print(
+        f"{label:<10} reads/s {stats['reads'] / args.seconds:8.1f}   "
+        f"writes/s {stats['writes'] / args.seconds:8.1f}   lock errors {stats['errors']}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    args = parser.parse_args()
+
+    print(f"Profile: {SQLITE_PRAGMAS}")
+    run_profile("defaults", make_sessionmaker("defaults", DEFAULT_PROFILE, args.products), args)
+    run_profile("tuned", make_sessionmaker("tuned", SQLITE_PRAGMAS, args.products), args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+# Point the SQLite layer at a throwaway database before anything imports it,
+# and run from a scratch directory so relative paths (uploads/) stay out of the repo
+_TEST_DB_DIR = tempfile.mkdtemp(prefix="uniform-factory-tests-")
+os.environ.setdefault("SQLITE_DATABASE_URL", f"sqlite:///{_TEST_DB_DIR}/test.db")
+os.chdir(_TEST_DB_DIR)
+
+
+@pytest.fixture
+def db_session():
+    """Fresh schema for every test, yields an open session"""
+    from catalog_cache import bump_catalog_version
+    from database_sqlite import Base, SessionLocal, engine
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    bump_catalog_version()
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def client(db_session):
+    """TestClient for the API app (lifespan is not run, schema comes from db_session)"""
+    from fastapi.testclient import TestClient
+    import security_middleware
+    from server import app
+
+    security_middleware.rate_limiter.clear()
+    return TestClient(app)
@@ -0,0 +1,55 @@
+"""
+Helpers for filling a test database with catalog data
+"""
+import json
+import uuid
+
+
+def seed_catalog(db, products: int, categories: int = 3, images: int = 2, characteristics: int = 3):
+    """Insert `products` products spread across `categories` categories"""
+    from database_sqlite import ProductCategory, SQLProduct, SQLProductImage, SQLProductCharacteristic
+
+    category_ids = []
+    for c in range(categories):
+        category = ProductCategory(
+            id=str(uuid.uuid4()),
+            title=f"Категория {c + 1}",
+            description="Описание категории",
+            slug=f"category-{c + 1}-{uuid.uuid4().hex[:6]}"
+        )
+        db.add(category)
+        category_ids.append(category.id)
+
+    for p in range(products):
+        product = SQLProduct(
+            id=str(uuid.uuid4()),
+            category_id=category_ids[p % categories],
+            name=f"Рубашка модель {p + 1}",
+            article=f"ART-{p + 1:05d}",
+            description="Классическая рубашка из хлопка",
+            short_description="Рубашка из хлопка",
+            price_from=1000 + p,
+            price_to=2000 + p,
+            material="Хлопок 100%",
+            sizes=json.dumps(["S", "M", "L"]),
+            colors=json.dumps(["белый"]),
+            is_available=True
+        )
+        db.add(product)
+        for i in range(images):
+            db.add(SQLProductImage(
+                product_id=product.id,
+                image_url=f"/api/uploads/{product.id}-{i}.jpg",
+                alt_text=f"{product.name} - изображение {i + 1}",
+                order=i + 1
+            ))
+        for i in range(characteristics):
+            db.add(SQLProductCharacteristic(
+                product_id=product.id,
+                name=f"Параметр {i + 1}",
+                value=f"Значение {i + 1}",
+                order=i + 1
+            ))
+
+    db.commit()
+    return category_ids
@@ -0,0 +1,66 @@
+"""
+Local stand-in for Redis in tests: a threaded RESP2 server with the few
+commands the rate limiter uses
+"""
+import socketserver
+import threading
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        assert line[:1] == b"*", line
+        args = []
+        for _ in range(int(line[1:-2])):
+            length = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(length + 2)[:-2].decode("utf-8"))
+        return args
+
+    def handle(self):
+        server = self.server
+        while True:
+            command = self._read_command()
+            if command is None:
+                return
+            name, args = command[0].upper(), command[1:]
+            with server.lock:
+                server.commands.append(command)
+                if name == "PING":
+                    reply = b"+PONG\r\n"
+                elif name == "INCRBY":
+                    server.data[args[0]] = int(server.data.get(args[0], 0)) + int(args[1])
+                    reply = b":%d\r\n" % server.data[args[0]]
+                elif name == "EXPIRE":
+                    reply = b":%d\r\n" % (1 if args[0] in server.data else 0)
+                elif name == "GET":
+                    value = server.data.get(args[0])
+                    reply = b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(str(value)), str(value).encode())
+                else:
+                    reply = b"-ERR unknown command '%s'\r\n" % name.encode()
+            self.wfile.write(reply)
+
+
+class FakeRespServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.data = {}
+        self.commands = []
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address
+        return f"redis://{host}:{port}/0"
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,88 @@
+import asyncio
+
+from tests.factories import seed_catalog
+
+
+def run(coro):
+    """Run coroutine on a fresh loop and close the async engine's connections with it"""
+    from database_sqlite import dispose_async_engine
+
+    async def main():
+        try:
+            return await coro
+        finally:
+            await dispose_async_engine()
+
+    return asyncio.run(main())
+
+
+def test_async_product_reads_match_sync_path(db_session):
+    from services_async import AsyncProductService
+    from services_sqlite import ProductService
+
+    seed_catalog(db_session, 7, categories=2)
+    card = ProductService.parse_fields("card")
+
+    assert run(AsyncProductService.get_products_page(limit=3, fields=card)) == \
+        ProductService.get_products_page(limit=3, fields=card)
+    assert run(AsyncProductService.search_products_page(query="рубашка", limit=4)) == \
+        ProductService.search_products_page(query="рубашка", limit=4)
+
+    product = ProductService.get_all_products()[0]
+    assert run(AsyncProductService.get_product_by_id(product["id"])) == product
+    assert run(AsyncProductService.get_products_by_category(product["category_id"])) == \
+        ProductService.get_products_by_category(product["category_id"])
+    assert run(AsyncProductService.get_product_by_id("missing")) is None
+
+
+def test_async_writes(db_session):
+    from database_sqlite import QuoteRequest
+    from models import ProductCreate, QuoteRequestCreate
+    from services_async import AsyncProductService, AsyncQuoteService
+    from services_sqlite import ProductService
+
+    category_id = seed_catalog(db_session, 1, categories=1)[0]
+
+    created = run(AsyncProductService.create_product(ProductCreate(
+        category_id=category_id, name="Китель поварской", description="Поварской китель", price_from=1500,
+        images=["/api/uploads/a.jpg"], characteristics=[{"name": "Ткань", "value": "Хлопок"}]
+    )))
+    product = ProductService.get_product_by_id(created["product_id"])
+    assert product["name"] == "Китель поварской"
+    assert [img["image_url"] for img in product["images"]] == ["/api/uploads/a.jpg"]
+
+    run(AsyncProductService.add_views({created["product_id"]: 5}))
+    assert ProductService.get_product_by_id(created["product_id"])["views_count"] == 5
+
+    response = run(AsyncQuoteService.create_quote_request(QuoteRequestCreate(
+        name="Иван", email="ivan@example.com", phone="+79990000000",
+        category="Рубашки", quantity="10", fabric="cotton", branding="none", estimated_price=10000
+    )))
+    assert response.request_id.startswith("REQ-")
+    assert db_session.query(QuoteRequest).filter_by(request_id=response.request_id).count() == 1
+
+
+def test_endpoints_use_async_engine_when_enabled(client, db_session, monkeypatch):
+    import database_sqlite
+    import services_async
+
+    seed_catalog(db_session, 2, categories=1)
+    product_id = client.get("/api/products").json()[0]["id"]
+
+    calls = []
+    get_product = services_async.AsyncProductService.get_product_by_id
+
+    async def tracked(product_id):
+        calls.append(product_id)
+        try:
+            return await get_product(product_id)
+        finally:
+            await database_sqlite.dispose_async_engine()
+
+    monkeypatch.setattr(database_sqlite, "USE_ASYNC_DB", True)
+    monkeypatch.setattr(services_async.AsyncProductService, "get_product_by_id", staticmethod(tracked))
+
+    response = client.get(f"/api/products/{product_id}")
+    assert response.status_code == 200
+    assert response.json()["id"] == product_id
+    assert calls == [product_id]
@@ -0,0 +1,82 @@
+from tests.factories import seed_catalog
+
+
+def test_snapshot_is_reused_until_version_bump():
+    from catalog_cache import CatalogCache
+
+    cache = CatalogCache()
+    builds = []
+
+    def builder():
+        builds.append(1)
+        return [len(builds)]
+
+    assert cache.get_or_build(("products",), builder) == [1]
+    assert cache.get_or_build(("products",), builder) == [1]
+    assert len(builds) == 1
+
+    cache.bump_version()
+    assert cache.get_or_build(("products",), builder) == [2]
+    assert len(builds) == 2
+
+
+def test_snapshot_count_is_bounded():
+    from catalog_cache import CatalogCache
+
+    cache = CatalogCache(max_snapshots=2)
+    for key in range(5):
+        cache.get_or_build(("category", key), lambda: [])
+    assert len(cache._snapshots) == 2
+
+
+def test_admin_write_invalidates_public_listing(client, db_session):
+    seed_catalog(db_session, 3, categories=1)
+
+    products = client.get("/api/products").json()
+    assert len(products) == 3
+
+    response = client.delete(f"/api/admin/products/{products[0]['id']}")
+    assert response.status_code == 200
+
+    assert len(client.get("/api/products").json()) == 2
+
+
+def test_catalog_endpoint_revalidates_with_etag(client, db_session):
+    seed_catalog(db_session, 2, categories=1)
+
+    response = client.get("/api/products")
+    etag = response.headers["etag"]
+    assert response.status_code == 200
+    assert etag.startswith('"')
+
+    response = client.get("/api/products", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+    client.delete(f"/api/admin/products/{client.get('/api/products').json()[0]['id']}")
+    response = client.get("/api/products", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+def test_pre_encoded_body_matches_default_encoder(db_session):
+    from fastapi.encoders import jsonable_encoder
+    import json
+
+    from http_cache import dumps_json
+    from services_sqlite import ProductService
+
+    seed_catalog(db_session, 2, categories=1)
+    products = ProductService.get_all_products()
+    assert json.loads(dumps_json(products)) == jsonable_encoder(products)
+
+
+def test_etag_matching():
+    from http_cache import etag_matches
+
+    assert etag_matches('"a", "b"', '"b"')
+    assert etag_matches('W/"b"', '"b"')
+    assert etag_matches("*", '"b"')
+    assert not etag_matches(None, '"b"')
+    assert not etag_matches('"a"', '"b"')
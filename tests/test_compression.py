@@ -0,0 +1,111 @@
+import gzip
+import json
+
+import brotli
+
+from tests.factories import seed_catalog
+
+
+def test_negotiate_encoding():
+    from compression import negotiate_encoding
+
+    assert negotiate_encoding("gzip, deflate, br") == "br"
+    assert negotiate_encoding("gzip, br;q=0.5") == "gzip"
+    assert negotiate_encoding("br;q=0, gzip") == "gzip"
+    assert negotiate_encoding("*") == "br"
+    assert negotiate_encoding("identity") is None
+    assert negotiate_encoding("gzip;q=0") is None
+    assert negotiate_encoding(None) is None
+
+
+def test_catalog_listing_is_compressed_once_per_version(client, db_session, monkeypatch):
+    import catalog_cache as catalog_cache_module
+
+    seed_catalog(db_session, 40, categories=2)
+    plain = client.get("/api/products", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+
+    calls = []
+    real_compress = catalog_cache_module.compress
+    monkeypatch.setattr(catalog_cache_module, "compress", lambda *a, **kw: calls.append(a[1]) or real_compress(*a, **kw))
+
+    for encoding, decode in (("br", brotli.decompress), ("gzip", gzip.decompress)):
+        for _ in range(3):
+            response, raw = get_raw(client, "/api/products", encoding)
+            assert response.headers["content-encoding"] == encoding
+            assert "Accept-Encoding" in response.headers["vary"]
+            assert response.headers["etag"] == plain.headers["etag"][:-1] + f'-{encoding}"'
+            assert json.loads(decode(raw)) == plain.json()
+    assert calls == ["br", "gzip"]
+
+    revalidated = client.get("/api/products", headers={
+        "Accept-Encoding": "gzip", "If-None-Match": plain.headers["etag"][:-1] + '-gzip"'
+    })
+    assert revalidated.status_code == 304
+
+
+def get_raw(client, url, encoding):
+    """Response and its body as sent on the wire (httpx would decode it)"""
+    with client.stream("GET", url, headers={"Accept-Encoding": encoding}) as response:
+        return response, b"".join(response.iter_raw())
+
+
+def test_dynamic_response_is_compressed_by_middleware(client, db_session):
+    seed_catalog(db_session, 40, categories=2)
+
+    response, raw = get_raw(client, "/api/products?limit=30", "gzip")
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["content-length"] == str(len(raw))
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert len(json.loads(gzip.decompress(raw))) == 30
+
+
+def test_small_and_exempt_responses_are_not_compressed(client):
+    from pathlib import Path
+
+    response = client.get("/api/health", headers={"Accept-Encoding": "gzip, br"})
+    assert "content-encoding" not in response.headers
+
+    uploads = Path("uploads")
+    uploads.mkdir(exist_ok=True)
+    (uploads / "compression-test.svg").write_bytes(b"<svg>" + b" " * 4096 + b"</svg>")
+    response = client.get("/api/uploads/compression-test.svg", headers={"Accept-Encoding": "gzip, br"})
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+
+
+def test_large_bodies_are_compressed_off_the_event_loop(monkeypatch):
+    import asyncio
+
+    import compression
+    from compression import CompressionMiddleware
+
+    offloaded = []
+    real_run_blocking = compression.run_blocking
+
+    async def run_blocking(func, *args):
+        offloaded.append(len(args[0]))
+        return await real_run_blocking(func, *args)
+
+    monkeypatch.setattr(compression, "run_blocking", run_blocking)
+
+    def respond(body):
+        async def app(scope, receive, send):
+            await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+            await send({"type": "http.response.body", "body": body})
+        return app
+
+    async def call(body):
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {"type": "http", "method": "GET", "path": "/api/orders", "headers": [(b"accept-encoding", b"gzip")]}
+        await CompressionMiddleware(respond(body), offload_size=4096)(scope, None, send)
+        return gzip.decompress(messages[1]["body"])
+
+    small, large = b"[1]" * 500, b"[1]" * 5000
+    assert asyncio.run(call(small)) == small
+    assert asyncio.run(call(large)) == large
+    assert offloaded == [len(large)]
@@ -0,0 +1,116 @@
+import socket
+
+import pytest
+from aiosmtpd.controller import Controller
+from aiosmtpd.smtp import AuthResult
+
+
+class SinkHandler:
+    """Collects delivered messages; rejects recipients at reject.example.com"""
+
+    def __init__(self):
+        self.messages = []
+        self.logins = 0
+        self.noops = 0
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.endswith("@reject.example.com"):
+            return "550 No such user"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append((envelope.rcpt_tos, envelope.content))
+        return "250 Message accepted"
+
+    async def handle_NOOP(self, server, session, envelope, arg):
+        self.noops += 1
+        return "250 OK"
+
+    def authenticate(self, server, session, envelope, mechanism, auth_data):
+        self.logins += 1
+        return AuthResult(success=auth_data.password == b"secret")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_sink(monkeypatch):
+    """Local SMTP server with AUTH (no TLS) that the module-level pool points at"""
+    import email_service
+
+    handler = SinkHandler()
+    controller = Controller(
+        handler, hostname="127.0.0.1", port=free_port(),
+        authenticator=handler.authenticate, auth_require_tls=False
+    )
+    controller.start()
+    pool = email_service.SMTPConnectionPool(host="127.0.0.1", port=controller.port, starttls=False, size=2)
+    monkeypatch.setattr(email_service, "smtp_pool", pool)
+    monkeypatch.setenv("SENDER_EMAIL", "shop@example.com")
+    monkeypatch.setenv("EMAIL_PASSWORD", "secret")
+    handler.pool = pool
+    try:
+        yield handler
+    finally:
+        pool.close()
+        controller.stop()
+
+
+def test_notifications_reuse_one_authenticated_session(smtp_sink):
+    from email_service import send_callback_notification_email
+
+    for i in range(5):
+        assert send_callback_notification_email({"name": f"Client {i}", "phone": "+7 999 000-00-00"}) is True
+    assert len(smtp_sink.messages) == 5
+    assert smtp_sink.logins == 1
+
+
+def test_send_many_uses_one_session_and_reports_per_message(smtp_sink):
+    from email_service import build_message, send_many
+
+    recipients = ["a@example.com", "b@reject.example.com", "c@example.com"]
+    messages = [build_message(to, "Batch", "<p>hi</p>", "hi") for to in recipients]
+    assert send_many(messages) == [True, False, True]
+    assert [rcpt for rcpt, _ in smtp_sink.messages] == [["a@example.com"], ["c@example.com"]]
+    assert smtp_sink.logins == 1
+
+
+def test_dropped_session_is_replaced(smtp_sink):
+    from email_service import send_email
+
+    send_email("admin@example.com", "First", "<p>1</p>")
+    # Simulate the server closing the idle connection
+    server, _, _ = smtp_sink.pool._idle[0]
+    server.sock.shutdown(socket.SHUT_RDWR)
+
+    assert send_email("admin@example.com", "Second", "<p>2</p>") is True
+    assert len(smtp_sink.messages) == 2
+    assert smtp_sink.logins == 2
+
+
+def test_idle_sessions_are_checked_with_noop_or_closed(smtp_sink):
+    from email_service import send_email
+
+    smtp_sink.pool.noop_after = 0
+    send_email("admin@example.com", "First", "<p>1</p>")
+    send_email("admin@example.com", "Second", "<p>2</p>")
+    assert smtp_sink.noops == 1
+    assert smtp_sink.logins == 1
+
+    smtp_sink.pool.max_idle = 0
+    send_email("admin@example.com", "Third", "<p>3</p>")
+    assert smtp_sink.logins == 2
+
+
+def test_unreachable_server_raises_delivery_error(smtp_sink):
+    from email_service import EmailDeliveryError, send_email
+
+    smtp_sink.pool.port = free_port()  # nothing listens there
+    with pytest.raises(EmailDeliveryError):
+        send_email("admin@example.com", "Subject", "<p>x</p>")
+    assert smtp_sink.messages == []
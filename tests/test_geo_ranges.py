@@ -0,0 +1,76 @@
+import asyncio
+import ipaddress
+
+RANGES_CSV = """network,country_code,region,city
+5.0.0.0/8,RU,,
+5.18.0.0/16,RU,Saint Petersburg,Saint Petersburg
+5.18.4.0/24,RU,Leningrad Oblast,Gatchina
+5.19.0.0/16,RU,Saint Petersburg,Saint Petersburg
+95.24.0.0/14,RU,Moscow,Moscow
+2a02:6b8::/32,RU,Moscow,Moscow
+"""
+
+
+def write_csv(tmp_path):
+    path = tmp_path / "ranges.csv"
+    path.write_text(RANGES_CSV, encoding="utf-8")
+    return str(path)
+
+
+def lookup(database, address):
+    return database.lookup(ipaddress.ip_address(address))
+
+
+def test_nested_ranges_resolve_to_most_specific(tmp_path):
+    from geo_ranges import GeoRangeDatabase
+
+    database = GeoRangeDatabase.open(write_csv(tmp_path))
+    assert lookup(database, "5.18.4.200") == ("Gatchina", "Leningrad Oblast", "RU")
+    assert lookup(database, "5.18.3.1") == ("Saint Petersburg", "Saint Petersburg", "RU")
+    assert lookup(database, "5.18.5.0") == ("Saint Petersburg", "Saint Petersburg", "RU")
+    assert lookup(database, "5.200.1.1") == ("", "", "RU")
+    assert lookup(database, "95.27.255.255") == ("Moscow", "Moscow", "RU")
+    assert lookup(database, "95.28.0.0") is None
+    assert lookup(database, "4.255.255.255") is None
+    assert lookup(database, "2a02:6b8:0:1::feed") == ("Moscow", "Moscow", "RU")
+    assert lookup(database, "::ffff:95.24.1.1") == ("Moscow", "Moscow", "RU")
+    assert lookup(database, "2001:db8::1") is None
+    # 5.18.0.0/16 and 5.19.0.0/16 are adjacent with the same location: merged around the /24
+    assert len(database) == 7
+
+
+def test_compiled_file_is_memory_mapped(tmp_path):
+    from geo_ranges import GeoRangeDatabase, build_geo_database, load_geo_database
+
+    output = str(tmp_path / "geo_ranges.bin")
+    built = build_geo_database(write_csv(tmp_path), output)
+    mapped = GeoRangeDatabase.open(output)
+    assert mapped.locations == built.locations
+    for address in ("5.18.4.1", "95.25.0.1", "2a02:6b8::1", "1.1.1.1"):
+        assert lookup(mapped, address) == lookup(built, address)
+
+    assert load_geo_database(str(tmp_path / "missing.bin")) is None
+    (tmp_path / "broken.bin").write_bytes(b"not a database" * 4)
+    assert load_geo_database(str(tmp_path / "broken.bin")) is None
+
+
+def test_resolver_prefers_local_database(tmp_path):
+    from geo_ranges import GeoRangeDatabase
+    from geo_service import REGIONAL_PHONES, GeoResolver
+
+    # Nothing listens on the discard port: a miss falls through to a failed upstream call
+    resolver = GeoResolver(api_url="http://127.0.0.1:9/{ip}/json/", ranges=GeoRangeDatabase.open(write_csv(tmp_path)))
+
+    async def main():
+        try:
+            return await asyncio.gather(*(resolver.lookup(ip) for ip in ("5.18.4.7", "95.24.1.1", "5.1.1.1", "1.1.1.1")))
+        finally:
+            await resolver.close()
+
+    gatchina, moscow, country_only, miss = asyncio.run(main())
+    assert gatchina["source"] == "geodb"
+    assert gatchina["phone"] == REGIONAL_PHONES["Saint Petersburg"]
+    assert moscow["phone"] == REGIONAL_PHONES["Moscow"]
+    assert country_only["city"] == "Unknown"
+    assert country_only["phone"] == REGIONAL_PHONES["default"]
+    assert miss["source"] == "fallback"
@@ -0,0 +1,122 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+
+class GeoStub:
+    """Local stand-in for ipapi.co: records requested IPs, configurable status and delay"""
+
+    def __init__(self, status: int = 200, delay: float = 0.0):
+        self.status = status
+        self.delay = delay
+        self.requests = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.requests.append(self.path.split("/")[1])
+                time.sleep(stub.delay)
+                body = json.dumps({"city": "Moscow", "region": "Moscow", "country_code": "RU"}).encode()
+                self.send_response(stub.status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/{{ip}}/json/"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def geo_stub():
+    with GeoStub() as stub:
+        yield stub
+
+
+def lookup(resolver, *ips):
+    async def main():
+        try:
+            return await asyncio.gather(*(resolver.lookup(ip) for ip in ips))
+        finally:
+            await resolver.close()
+    return asyncio.run(main())
+
+
+def test_lookup_is_cached_by_ip_and_subnet(geo_stub):
+    from geo_service import REGIONAL_PHONES, GeoResolver
+
+    resolver = GeoResolver(api_url=geo_stub.url)
+    first, = lookup(resolver, "93.184.216.34")
+    assert first["phone"] == REGIONAL_PHONES["Moscow"]
+    assert first["source"] == "ipapi"
+
+    again, neighbour = lookup(resolver, "93.184.216.34"), lookup(resolver, "93.184.216.99")
+    assert again[0] == first
+    assert neighbour[0]["ip"] == "93.184.216.99"
+    assert neighbour[0]["city"] == "Moscow"
+    assert geo_stub.requests == ["93.184.216.34"]
+
+
+def test_concurrent_lookups_share_one_upstream_call(geo_stub):
+    from geo_service import GeoResolver
+
+    geo_stub.delay = 0.2
+    resolver = GeoResolver(api_url=geo_stub.url)
+    results = lookup(resolver, *[f"81.2.69.{i}" for i in range(20)])
+    assert len(geo_stub.requests) == 1
+    assert {result["city"] for result in results} == {"Moscow"}
+    assert [result["ip"] for result in results] == [f"81.2.69.{i}" for i in range(20)]
+
+
+def test_failures_are_cached_briefly(geo_stub):
+    from geo_service import REGIONAL_PHONES, GeoResolver
+
+    geo_stub.status = 429
+    resolver = GeoResolver(api_url=geo_stub.url, negative_ttl=0.2)
+    result, = lookup(resolver, "8.8.8.8")
+    assert result["source"] == "fallback"
+    assert result["phone"] == REGIONAL_PHONES["fallback"]
+    lookup(resolver, "8.8.8.9")
+    assert len(geo_stub.requests) == 1
+
+    time.sleep(0.25)
+    geo_stub.status = 200
+    result, = lookup(resolver, "8.8.8.8")
+    assert result["source"] == "ipapi"
+    assert len(geo_stub.requests) == 2
+
+
+def test_local_and_invalid_addresses_skip_upstream(geo_stub):
+    from geo_service import GeoResolver
+
+    resolver = GeoResolver(api_url=geo_stub.url)
+    local, private, invalid = lookup(resolver, "127.0.0.1", "172.16.5.4", "../admin")
+    assert local["source"] == private["source"] == "local"
+    assert invalid["source"] == "fallback"
+    assert geo_stub.requests == []
+
+
+def test_region_endpoint_uses_resolver(client, geo_stub, monkeypatch):
+    import geo_service
+
+    monkeypatch.setattr(geo_service, "geo_resolver", geo_service.GeoResolver(api_url=geo_stub.url))
+    for path in ("/api/region", "/api/geo/regional-phone"):
+        response = client.get(path, headers={"X-Forwarded-For": "5.255.255.5, 10.0.0.1"})
+        assert response.status_code == 200
+        assert response.json()["phone"] == geo_service.REGIONAL_PHONES["Moscow"]
+    assert geo_stub.requests == ["5.255.255.5"]
@@ -0,0 +1,98 @@
+import io
+import json
+
+import pytest
+from PIL import Image
+
+
+def image_bytes(size=(1000, 500), mode="RGB", fmt="JPEG", **save_options) -> bytes:
+    buffer = io.BytesIO()
+    Image.new(mode, size, (200, 30, 30, 128) if mode == "RGBA" else (200, 30, 30)).save(buffer, fmt, **save_options)
+    return buffer.getvalue()
+
+
+def test_variants_are_resized_without_upscaling(tmp_path):
+    from image_variants import generate_variants, supported_formats
+
+    source = tmp_path / "photo.png"
+    source.write_bytes(image_bytes(mode="RGBA", fmt="PNG"))
+    manifest = generate_variants(str(source), str(tmp_path / "variants"), widths=[320, 640, 2000])
+
+    assert manifest["widths"] == [320, 640, 1000]
+    assert manifest["formats"] == supported_formats()
+    assert json.loads((tmp_path / "variants" / "photo.json").read_text()) == manifest
+    with Image.open(tmp_path / "variants" / "photo-320w.webp") as variant:
+        assert variant.size == (320, 160)
+        assert variant.mode == "RGBA"
+    with Image.open(tmp_path / "variants" / "photo-1000w.jpg") as fallback:
+        assert fallback.mode == "RGB"  # transparency flattened for JPEG
+
+
+def test_exif_is_stripped_after_applying_orientation(tmp_path):
+    from image_variants import generate_variants
+
+    exif = Image.Exif()
+    exif[0x0112] = 6  # rotated 90 degrees clockwise
+    exif[0x010F] = "Camera maker"
+    source = tmp_path / "portrait.jpg"
+    source.write_bytes(image_bytes(size=(400, 200), exif=exif.tobytes()))
+
+    generate_variants(str(source), str(tmp_path), widths=[], formats=["jpeg"])
+    with Image.open(tmp_path / "portrait-200w.jpg") as variant:
+        assert variant.size == (200, 400)
+        assert not variant.getexif()
+
+
+def test_variant_selection(tmp_path):
+    from image_variants import ImagePipeline, generate_variants
+
+    source = tmp_path / "shirt.jpg"
+    source.write_bytes(image_bytes())
+    generate_variants(str(source), str(tmp_path / "variants"), widths=[320, 640], formats=["webp", "jpeg"])
+    pipeline = ImagePipeline(variants_dir=tmp_path / "variants")
+
+    path, media_type = pipeline.select("shirt.jpg", 400, None, "image/avif,image/webp,*/*")
+    assert (path.name, media_type) == ("shirt-640w.webp", "image/webp")
+    assert pipeline.select("shirt.jpg", 100, None, "*/*")[0].name == "shirt-320w.jpg"
+    assert pipeline.select("shirt.jpg", 5000, "jpg", None)[0].name == "shirt-1000w.jpg"
+    assert pipeline.select("shirt.jpg", None, "avif", None) is None  # not generated: original
+    assert pipeline.select("missing.jpg", 320, None, None) is None
+
+
+@pytest.fixture
+def pipeline():
+    from image_variants import image_pipeline
+
+    try:
+        yield image_pipeline
+    finally:
+        image_pipeline.close()
+
+
+def test_upload_produces_variants_in_process_pool(client, pipeline):
+    original = image_bytes(size=(800, 600))
+    response = client.post(
+        "/api/admin/upload-image", files={"file": ("photo.jpg", original, "image/jpeg")}
+    )
+    assert response.status_code == 200
+    url = response.json()["url"]
+
+    pipeline.wait(timeout=120)
+    response = client.get(f"{url}?w=300", headers={"Accept": "image/webp,*/*"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/webp"
+    assert response.headers["vary"] == "Accept"
+    with Image.open(io.BytesIO(response.content)) as variant:
+        assert variant.size == (320, 240)
+
+    response = client.get(f"{url}?format=jpeg")
+    assert response.headers["content-type"] == "image/jpeg"
+    with Image.open(io.BytesIO(response.content)) as variant:
+        assert variant.size == (800, 600)
+
+    assert client.get(url).content == original
+    assert client.get(f"{url}?format=tiff").status_code == 422
+
+    filename = url.rsplit("/", 1)[1]
+    assert client.delete(f"/api/admin/uploaded-files/{filename}").status_code == 200
+    assert pipeline.manifest(filename) is None
@@ -0,0 +1,133 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+
+@pytest.fixture
+def channels(monkeypatch):
+    """Both notification channels configured (nothing is actually sent)"""
+    import telegram_service
+
+    monkeypatch.setattr(telegram_service, "TELEGRAM_BOT_TOKEN", "token")
+    monkeypatch.setattr(telegram_service, "TELEGRAM_CHAT_ID", "42")
+    monkeypatch.setenv("SENDER_EMAIL", "shop@example.com")
+    monkeypatch.setenv("EMAIL_PASSWORD", "secret")
+
+
+def outbox_rows(db_session):
+    from database_sqlite import NotificationOutbox
+
+    db_session.expire_all()
+    return db_session.query(NotificationOutbox).order_by(NotificationOutbox.channel).all()
+
+
+def test_form_endpoints_queue_notifications_in_outbox(client, db_session, channels):
+    import json
+
+    response = client.post("/api/contact/callback-request", json={"name": "Ivan", "phone": "+79991234567"})
+    assert response.status_code == 200
+    rows = outbox_rows(db_session)
+    assert [(row.channel, row.kind, row.status) for row in rows] == [
+        ("email", "callback_request", "pending"), ("telegram", "callback_request", "pending")
+    ]
+    assert json.loads(rows[0].payload)["name"] == "Ivan"
+
+    response = client.post("/api/cart/submit-order", json={
+        "customer_name": "Ivan", "customer_phone": "+79991234567", "customer_email": "ivan@example.com",
+        "items": [{"product_id": "p1", "product_name": "Китель", "quantity": 10, "price_from": 1500}],
+        "total_amount": 15000
+    })
+    assert response.status_code == 200
+    cart = {row.channel: json.loads(row.payload) for row in outbox_rows(db_session) if row.kind == "cart_order"}
+    assert cart["telegram"]["items"][0]["name"] == "Китель"
+    assert cart["email"]["category"] == "Заказ из корзины"
+
+
+def test_no_outbox_rows_without_configured_channels(client, db_session, monkeypatch):
+    import telegram_service
+
+    monkeypatch.setattr(telegram_service, "TELEGRAM_BOT_TOKEN", None)
+    monkeypatch.delenv("SENDER_EMAIL", raising=False)
+    response = client.post("/api/contact/callback-request", json={"name": "Ivan", "phone": "+79991234567"})
+    assert response.status_code == 200
+    assert outbox_rows(db_session) == []
+
+
+def enqueue(db_session, count: int):
+    from notification_outbox import enqueue_notifications
+
+    for i in range(count):
+        enqueue_notifications(db_session, "contact_message", {"name": f"client {i}"})
+    db_session.commit()
+
+
+def test_dispatcher_retries_with_backoff_and_dead_letters(client, db_session, channels):
+    from datetime import datetime
+    from notification_outbox import OutboxDispatcher
+
+    enqueue(db_session, 1)
+    sent = []
+
+    def flaky_email(payload):
+        raise ConnectionError("SMTP down")
+
+    dispatcher = OutboxDispatcher(max_attempts=2, handlers={
+        ("telegram", "contact_message"): lambda payload: sent.append(payload) or True,
+        ("email", "contact_message"): flaky_email,
+    })
+    assert asyncio.run(dispatcher.dispatch_due()) == 2
+    email, telegram = outbox_rows(db_session)
+    assert telegram.status == "sent" and sent == [{"name": "client 0"}]
+    assert email.status == "pending" and email.attempts == 1
+    assert email.last_error == "SMTP down"
+    assert email.next_attempt_at > datetime.utcnow()
+
+    # Not due yet: nothing to do until the backoff expires
+    assert asyncio.run(dispatcher.dispatch_due()) == 0
+    email.next_attempt_at = datetime.utcnow()
+    db_session.commit()
+    assert asyncio.run(dispatcher.dispatch_due()) == 1
+    email, _ = outbox_rows(db_session)
+    assert email.status == "dead" and email.attempts == 2
+
+    assert [entry["id"] for entry in client.get("/api/admin/notifications").json()] == [email.id]
+    assert client.post(f"/api/admin/notifications/{email.id}/retry").status_code == 200
+    email, _ = outbox_rows(db_session)
+    assert email.status == "pending" and email.attempts == 0
+    assert client.post(f"/api/admin/notifications/{email.id}/retry").status_code == 404
+
+
+def test_dispatcher_limits_concurrency(db_session, channels):
+    from notification_outbox import OutboxDispatcher
+
+    enqueue(db_session, 6)
+    lock = threading.Lock()
+    state = {"active": 0, "peak": 0}
+
+    def slow_send(payload):
+        with lock:
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+        time.sleep(0.05)
+        with lock:
+            state["active"] -= 1
+
+    handlers = {(channel, "contact_message"): slow_send for channel in ("telegram", "email")}
+    dispatcher = OutboxDispatcher(concurrency=3, batch_size=50, handlers=handlers)
+    assert asyncio.run(dispatcher.dispatch_due()) == 12
+    assert state["peak"] == 3
+    assert {row.status for row in outbox_rows(db_session)} == {"sent"}
+
+
+def test_claimed_entries_are_leased(db_session, channels):
+    from notification_outbox import claim_due
+
+    enqueue(db_session, 2)
+    # A lease that has already run out, as if the sender had crashed
+    assert len(claim_due(10, lease=-1)) == 4
+    again = claim_due(10)
+    assert len(again) == 4
+    assert {entry["attempts"] for entry in again} == {2}
+    assert claim_due(10) == []
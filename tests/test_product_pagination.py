@@ -0,0 +1,71 @@
+from tests.factories import seed_catalog
+from tests.test_product_queries import count_queries
+
+
+def test_keyset_pages_cover_catalog_once(client, db_session):
+    seed_catalog(db_session, 25, categories=2)
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 10, "fields": "card"}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/api/products", params=params)
+        assert response.status_code == 200
+        page = response.json()
+        seen.extend(item["id"] for item in page)
+        cursor = response.headers.get("x-next-cursor")
+        if not cursor:
+            break
+
+    assert len(seen) == 25
+    assert len(set(seen)) == 25
+
+
+def test_card_projection_skips_characteristics(db_session):
+    from services_sqlite import ProductService
+
+    seed_catalog(db_session, 30)
+
+    with count_queries() as statements:
+        items, next_cursor = ProductService.get_products_page(limit=10, fields=ProductService.CARD_FIELDS)
+
+    # products + category (joined), images
+    assert len(statements) == 2
+    assert next_cursor is not None
+    assert set(items[0]) == set(ProductService.CARD_FIELDS)
+    assert items[0]["image"].endswith("-0.jpg")
+
+
+def test_search_pagination_and_fields(client, db_session):
+    seed_catalog(db_session, 12, categories=1)
+
+    response = client.get("/api/products/search", params={"q": "ART-", "limit": 5, "fields": "id,name"})
+    assert response.status_code == 200
+    assert [set(item) for item in response.json()] == [{"id", "name"}] * 5
+    assert response.headers["x-next-cursor"]
+
+
+def test_invalid_parameters_are_rejected(client, db_session):
+    assert client.get("/api/products", params={"fields": "id,password"}).status_code == 400
+    assert client.get("/api/products", params={"limit": 5, "cursor": "not-a-cursor"}).status_code == 400
+    for limit in (0, -1, 201):
+        assert client.get("/api/products", params={"limit": limit}).status_code == 422
+
+
+def test_search_page_size_is_bounded(client, db_session):
+    from services_sqlite import ProductService
+
+    seed_catalog(db_session, 3, categories=1)
+    for limit in (-1, 0, ProductService.MAX_PAGE_SIZE + 1, 1000):
+        assert client.get("/api/products/search", params={"q": "ART-", "limit": limit}).status_code == 422
+
+    # Direct callers are clamped to 1..MAX_PAGE_SIZE
+    first, cursor = ProductService.search_products_page(query="ART-", limit=0)
+    assert len(first) == 1
+    rest, _ = ProductService.search_products_page(query="ART-", limit=-1, cursor=cursor)
+    assert len(rest) == 1 and rest[0]["id"] != first[0]["id"]  # no row skipped or repeated
+    everything, next_cursor = ProductService.search_products_page(query="ART-", limit=1000)
+    assert len(everything) == 3 and next_cursor is None
+    assert [item["id"] for item in everything[:2]] == [first[0]["id"], rest[0]["id"]]
@@ -0,0 +1,65 @@
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+from tests.factories import seed_catalog
+
+
+@contextmanager
+def count_queries():
+    from database_sqlite import engine
+
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+@pytest.mark.parametrize("catalog_size", [5, 50, 300])
+def test_get_all_products_query_count_is_constant(db_session, catalog_size):
+    from services_sqlite import ProductService
+
+    seed_catalog(db_session, catalog_size)
+
+    with count_queries() as statements:
+        products = ProductService.get_all_products()
+
+    assert len(products) == catalog_size
+    # products + category (joined), images, characteristics
+    assert len(statements) == 3
+
+
+@pytest.mark.parametrize("catalog_size", [5, 300])
+def test_category_and_search_query_count_is_constant(db_session, catalog_size):
+    from services_sqlite import ProductService
+
+    category_ids = seed_catalog(db_session, catalog_size)
+
+    with count_queries() as statements:
+        ProductService.get_products_by_category(category_ids[0])
+    assert len(statements) == 3
+
+    ProductService.search_products(query="art-", limit=1)  # warm up the one-time FTS5 lookup
+    with count_queries() as statements:
+        ProductService.search_products(query="art-", limit=1000)
+    assert len(statements) == 3
+
+
+def test_serialized_product_shape(db_session):
+    from services_sqlite import ProductService
+
+    seed_catalog(db_session, 1, categories=1)
+    product = ProductService.get_all_products()[0]
+
+    assert product["category_name"] == "Категория 1"
+    assert product["sizes"] == ["S", "M", "L"]
+    assert [img["order"] for img in product["images"]] == [1, 2]
+    assert [char["name"] for char in product["characteristics"]] == ["Параметр 1", "Параметр 2", "Параметр 3"]
+    assert ProductService.get_product_by_id(product["id"])["id"] == product["id"]
@@ -0,0 +1,127 @@
+import json
+import uuid
+
+from tests.factories import seed_catalog
+
+
+def add_product(db, category_id, name, article, characteristics=()):
+    from database_sqlite import SQLProduct, SQLProductCharacteristic
+
+    product = SQLProduct(
+        id=str(uuid.uuid4()),
+        category_id=category_id,
+        name=name,
+        article=article,
+        description="Описание",
+        price_from=1000,
+        sizes=json.dumps([])
+    )
+    db.add(product)
+    for i, value in enumerate(characteristics):
+        db.add(SQLProductCharacteristic(product_id=product.id, name=f"Параметр {i}", value=value, order=i + 1))
+    db.commit()
+    return product
+
+
+def names(products):
+    return [product["name"] for product in products]
+
+
+def test_search_folds_cyrillic_case_and_prefixes(db_session):
+    from services_sqlite import ProductService
+
+    category_id = seed_catalog(db_session, 0, categories=1)[0]
+    add_product(db_session, category_id, "СОРОЧКА мужская", "4A.48A-1")
+    add_product(db_session, category_id, "Блуза женская", "4A.490E")
+
+    assert names(ProductService.search_products("сорочк")) == ["СОРОЧКА мужская"]
+    assert names(ProductService.search_products("БЛУЗА")) == ["Блуза женская"]
+    assert names(ProductService.search_products("4A.490")) == ["Блуза женская"]
+    assert ProductService.search_products("!!!") == []
+
+
+def test_search_index_follows_writes(db_session):
+    from database_sqlite import SQLProductCharacteristic
+    from services_sqlite import ProductService
+
+    category_id = seed_catalog(db_session, 0, categories=1)[0]
+    product = add_product(db_session, category_id, "Китель повара", "K-1", ["Чёрный габардин"])
+
+    assert names(ProductService.search_products("черный")) == ["Китель повара"]
+
+    product.name = "Куртка повара"
+    db_session.commit()
+    assert names(ProductService.search_products("куртка")) == ["Куртка повара"]
+    assert ProductService.search_products("китель") == []
+
+    db_session.query(SQLProductCharacteristic).delete()
+    db_session.commit()
+    assert ProductService.search_products("габардин") == []
+
+    db_session.delete(product)
+    db_session.commit()
+    assert ProductService.search_products("куртка") == []
+
+
+def test_search_ranks_name_matches_first_and_paginates(db_session):
+    from services_sqlite import ProductService
+
+    category_id = seed_catalog(db_session, 0, categories=1)[0]
+    add_product(db_session, category_id, "Фартук", "F-1", ["Носится с кителем"])
+    add_product(db_session, category_id, "Китель", "K-2")
+    for i in range(4):
+        add_product(db_session, category_id, f"Китель {i}", f"K-3{i}")
+
+    first_page, cursor = ProductService.search_products_page("кител", limit=3)
+    second_page, last_cursor = ProductService.search_products_page("кител", limit=3, cursor=cursor)
+
+    assert first_page[0]["name"].startswith("Китель")
+    assert names(second_page)[-1] == "Фартук"
+    assert last_cursor is None
+    assert len({p["id"] for p in first_page + second_page}) == 6
+
+
+def test_search_index_survives_rowid_renumbering(db_session):
+    from sqlalchemy import text
+    from database_sqlite import SQLProduct
+    from services_sqlite import ProductService
+
+    category_id = seed_catalog(db_session, 0, categories=1)[0]
+    for name, article in (("Китель повара", "K-1"), ("Фартук официанта", "F-1"), ("Брюки поварские", "B-1")):
+        add_product(db_session, category_id, name, article)
+    db_session.delete(db_session.query(SQLProduct).filter_by(article="K-1").one())
+    db_session.commit()
+
+    # What VACUUM may do to a table without an INTEGER PRIMARY KEY
+    db_session.execute(text("UPDATE products SET rowid = -rowid"))
+    db_session.execute(text("UPDATE products SET rowid = -rowid - 1"))
+    db_session.commit()
+
+    assert names(ProductService.search_products("фартук")) == ["Фартук официанта"]
+    assert names(ProductService.search_products("брюки")) == ["Брюки поварские"]
+    add_product(db_session, category_id, "Китель шефа", "K-2")  # key does not collide with renumbered rows
+    assert names(ProductService.search_products("китель")) == ["Китель шефа"]
+    assert names(ProductService.search_products("фартук")) == ["Фартук официанта"]
+
+
+def test_legacy_rowid_keyed_index_is_rebuilt(db_session):
+    from sqlalchemy import text
+    from database_sqlite import engine, init_product_search_index
+    from services_sqlite import ProductService
+
+    category_id = seed_catalog(db_session, 0, categories=1)[0]
+    add_product(db_session, category_id, "Китель повара", "K-1")
+    db_session.close()
+    with engine.begin() as connection:
+        for (trigger,) in connection.execute(text("SELECT name FROM sqlite_master WHERE type = 'trigger'")).all():
+            connection.execute(text(f"DROP TRIGGER {trigger}"))
+        connection.execute(text("DROP INDEX ix_products_search_rowid"))
+        connection.execute(text("ALTER TABLE products DROP COLUMN search_rowid"))
+        connection.execute(text("DELETE FROM products_fts"))
+        connection.execute(text("INSERT INTO products_fts(rowid, name) VALUES (999, 'Устаревшая запись')"))
+
+        init_product_search_index(connection)
+        assert connection.execute(text("SELECT count(*) FROM products_fts")).scalar() == 1
+
+    assert names(ProductService.search_products("китель")) == ["Китель повара"]
+    assert ProductService.search_products("устаревшая") == []
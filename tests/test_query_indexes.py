@@ -0,0 +1,52 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import select
+
+
+def _hot_queries():
+    from database_sqlite import QuoteRequest, SQLProduct, SQLProductCharacteristic, SQLProductImage, WebVitals
+
+    return [
+        ("ix_products_category_id", select(SQLProduct).where(SQLProduct.category_id == "c1")),
+        ("ix_products_is_available", select(SQLProduct).where(SQLProduct.is_available == True)),  # noqa: E712
+        ("ix_products_featured", select(SQLProduct).where(SQLProduct.featured == True)),  # noqa: E712
+        ("ix_products_views_count", select(SQLProduct).order_by(SQLProduct.views_count.desc()).limit(10)),
+        ("ix_products_created_at_id",
+         select(SQLProduct).where(SQLProduct.created_at > datetime(2024, 1, 1))
+         .order_by(SQLProduct.created_at, SQLProduct.id).limit(25)),
+        ("ix_product_images_product_id",
+         select(SQLProductImage).where(SQLProductImage.product_id.in_(["p1", "p2"]))),
+        ("ix_product_characteristics_product_id",
+         select(SQLProductCharacteristic).where(SQLProductCharacteristic.product_id.in_(["p1", "p2"]))),
+        ("ix_quote_requests_status", select(QuoteRequest).where(QuoteRequest.status == "new")),
+        ("ix_quote_requests_created_at", select(QuoteRequest).order_by(QuoteRequest.created_at.desc())),
+        ("ix_web_vitals_timestamp",
+         select(WebVitals).where(WebVitals.timestamp >= datetime(2024, 1, 1)).order_by(WebVitals.timestamp.desc())),
+        ("ix_web_vitals_name", select(WebVitals).where(WebVitals.name == "LCP")),
+    ]
+
+
+@pytest.mark.parametrize("index_name, statement", _hot_queries(), ids=lambda value: value if isinstance(value, str) else "")
+def test_hot_query_uses_index(db_session, index_name, statement):
+    from sqlalchemy import text
+
+    sql = str(statement.compile(dialect=db_session.bind.dialect, compile_kwargs={"literal_binds": True}))
+    plan = " | ".join(row[-1] for row in db_session.execute(text(f"EXPLAIN QUERY PLAN {sql}")))
+    assert index_name in plan, plan
+
+
+def test_ensure_indexes_adds_missing_indexes(db_session):
+    from sqlalchemy import text
+    from database_sqlite import engine, ensure_indexes
+
+    with engine.begin() as connection:
+        connection.execute(text("DROP INDEX ix_products_category_id"))
+        connection.execute(text("DROP INDEX ix_web_vitals_name"))
+
+    results = ensure_indexes(engine)
+    assert results["ix_products_category_id"] == "created"
+    assert results["ix_web_vitals_name"] == "created"
+    assert results["ix_quote_requests_status"] == "exists"
+    assert "ix_products_article" not in results  # unique, left to its own migration
+    assert set(ensure_indexes(engine).values()) == {"exists"}
@@ -0,0 +1,145 @@
+def test_sliding_window_allows_limit_then_denies():
+    from rate_limiter import InMemoryRateLimiter, RateLimit
+
+    limiter = InMemoryRateLimiter()
+    rule = RateLimit(3, 60)
+    results = [limiter.hit("ip", rule, now=1200.0) for _ in range(4)]
+    assert [r.allowed for r in results] == [True, True, True, False]
+    assert [r.remaining for r in results[:3]] == [2, 1, 0]
+    assert results[3].retry_after == 60
+
+
+def test_previous_window_is_weighted_by_overlap():
+    from rate_limiter import InMemoryRateLimiter, RateLimit
+
+    limiter = InMemoryRateLimiter()
+    rule = RateLimit(10, 60)
+    for _ in range(10):
+        assert limiter.hit("ip", rule, now=1200.0).allowed
+
+    # Just after the window boundary almost all of the previous count still applies
+    assert not limiter.hit("ip", rule, now=1263.0).allowed
+    # Halfway through, 5 of the 10 old requests still count: 5 new ones fit
+    assert [limiter.hit("ip", rule, now=1290.0).allowed for _ in range(6)] == [True] * 5 + [False]
+    # Two windows later everything has expired
+    assert limiter.hit("ip", rule, now=1500.0).remaining == 9
+
+
+def test_idle_keys_expire_and_key_count_is_capped():
+    from rate_limiter import InMemoryRateLimiter, RateLimit
+
+    rule = RateLimit(5, 60)
+    limiter = InMemoryRateLimiter()
+    for i in range(100):
+        limiter.hit(f"ip-{i}", rule, now=1200.0)
+    assert len(limiter) == 100
+    limiter.hit("late", rule, now=1200.0 + 180)
+    assert len(limiter) == 1
+
+    limiter = InMemoryRateLimiter(max_keys=10)
+    for i in range(50):
+        limiter.hit(f"ip-{i}", rule, now=1200.0)
+    assert len(limiter) == 10
+
+
+def test_contact_form_has_stricter_limit_than_catalog(client, db_session, monkeypatch):
+    import security_middleware
+    from rate_limiter import RateLimit
+
+    monkeypatch.setattr(security_middleware, "RATE_LIMIT_RULES", [
+        ("/api/contact/", "forms", RateLimit(2, 60)),
+        ("/api/products", "catalog", RateLimit(100, 60)),
+    ])
+    payload = {"name": "Иван", "phone": "+79990000000"}
+    statuses = [client.post("/api/contact/callback-request", json=payload).status_code for _ in range(3)]
+    assert statuses[:2] != [429, 429]
+    assert statuses[2] == 429
+
+    limited = client.post("/api/contact/callback-request", json=payload)
+    assert limited.json()["detail"].startswith("Слишком много запросов")
+    assert int(limited.headers["Retry-After"]) >= 1
+    assert limited.headers["X-RateLimit-Remaining"] == "0"
+
+    response = client.get("/api/products")
+    assert response.status_code == 200
+    assert response.headers["X-RateLimit-Limit"] == "100"
+
+
+def test_mmap_backend_shares_counts_between_workers(tmp_path):
+    from rate_limiter import MmapRateLimiter, RateLimit
+
+    path = str(tmp_path / "ratelimit")
+    worker_a = MmapRateLimiter(path, slots=64)
+    worker_b = MmapRateLimiter(path, slots=1024)  # table size comes from the file
+    assert worker_b.slots == 64
+
+    rule = RateLimit(4, 60)
+    results = [limiter.hit("forms:10.0.0.1", rule, now=1200.0) for limiter in (worker_a, worker_b) * 3]
+    assert [r.allowed for r in results] == [True, True, True, True, False, False]
+    assert worker_a.hit("forms:10.0.0.2", rule, now=1200.0).allowed
+
+    # More clients than slots: old entries are reused, memory stays fixed
+    for i in range(500):
+        worker_a.hit(f"catalog:ip-{i}", rule, now=1200.0)
+    assert worker_a.hit("forms:new-client", rule, now=1200.0).remaining == 3
+
+    worker_a.close()
+    worker_b.close()
+
+
+def test_redis_backend_aggregates_locally_and_syncs_between_workers():
+    from rate_limiter import RateLimit, RedisRateLimiter
+    from tests.resp_server import FakeRespServer
+
+    rule = RateLimit(6, 60)
+    with FakeRespServer() as server:
+        worker_a = RedisRateLimiter(server.url, background=False)
+        worker_b = RedisRateLimiter(server.url, background=False)
+
+        for _ in range(3):
+            assert worker_a.hit("forms:10.0.0.1", rule, now=1200.0).allowed
+        # Nothing reached the server on the request path
+        assert server.commands == []
+
+        assert worker_a.sync()
+        assert server.data == {"ratelimit:forms:10.0.0.1:20": 3}
+
+        # Worker B learns A's count on its first sync
+        assert worker_b.hit("forms:10.0.0.1", rule, now=1200.0).remaining == 5
+        assert worker_b.sync()
+        assert [worker_b.hit("forms:10.0.0.1", rule, now=1200.0).allowed for _ in range(3)] == [True, True, False]
+
+        worker_a.close()
+        worker_b.close()
+        assert server.data["ratelimit:forms:10.0.0.1:20"] == 6
+
+
+def test_redis_backend_keeps_limiting_when_server_is_down():
+    from rate_limiter import RateLimit, RedisRateLimiter
+    from tests.resp_server import FakeRespServer
+
+    with FakeRespServer() as server:
+        url = server.url
+    limiter = RedisRateLimiter(url, background=False)
+    rule = RateLimit(2, 60)
+    assert [limiter.hit("orders:ip", rule, now=1200.0).allowed for _ in range(3)] == [True, True, False]
+    assert not limiter.sync()
+    assert not limiter.hit("orders:ip", rule, now=1200.0).allowed
+    assert limiter._pending == {"ratelimit:orders:ip:20": [2, 120]}
+
+
+def test_redis_backend_syncs_hits_of_evicted_keys():
+    from rate_limiter import RateLimit, RedisRateLimiter
+    from tests.resp_server import FakeRespServer
+
+    rule = RateLimit(10, 60)
+    with FakeRespServer() as server:
+        limiter = RedisRateLimiter(server.url, background=False, max_keys=1)
+        for _ in range(3):
+            limiter.hit("forms:10.0.0.1", rule, now=1200.0)
+        limiter.hit("forms:10.0.0.2", rule, now=1200.0)  # evicts 10.0.0.1 before it was synced
+        assert list(limiter._entries) == ["forms:10.0.0.2"]
+
+        assert limiter.sync()
+        assert server.data == {"ratelimit:forms:10.0.0.1:20": 3, "ratelimit:forms:10.0.0.2:20": 1}
+        limiter.close()
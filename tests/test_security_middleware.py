@@ -0,0 +1,27 @@
+def test_security_headers_on_json_response(client):
+    from security_middleware import CSP_DIRECTIVES
+
+    response = client.get("/api/health")
+    assert response.status_code == 200
+    assert response.headers["X-Frame-Options"] == "DENY"
+    assert response.headers["X-Content-Type-Options"] == "nosniff"
+    assert response.headers["Content-Security-Policy"] == "; ".join(CSP_DIRECTIVES)
+    assert response.headers["X-RateLimit-Limit"] == "60"
+    # Headers are replaced, not duplicated
+    assert len(response.headers.get_list("x-frame-options")) == 1
+
+
+def test_uploaded_file_is_streamed_with_headers(client):
+    from pathlib import Path
+
+    uploads = Path("uploads")
+    uploads.mkdir(exist_ok=True)
+    body = bytes(range(256)) * 1024
+    (uploads / "middleware-test.jpg").write_bytes(body)
+
+    response = client.get("/api/uploads/middleware-test.jpg")
+    assert response.status_code == 200
+    assert response.content == body
+    assert response.headers["content-length"] == str(len(body))
+    assert response.headers["X-Content-Type-Options"] == "nosniff"
+    assert "X-RateLimit-Limit" not in response.headers  # uploads are not rate limited
@@ -0,0 +1,189 @@
+from datetime import datetime
+from xml.etree import ElementTree
+
+import pytest
+
+from tests.factories import seed_catalog
+
+NS = {"sm": "http://www.sitemaps.org/schemas/sitemap/0.9", "image": "http://www.google.com/schemas/sitemap-image/1.1"}
+
+
+def urls(body: bytes) -> dict:
+    """loc -> <url> element of a child sitemap"""
+    root = ElementTree.fromstring(body)
+    return {url.findtext("sm:loc", namespaces=NS): url for url in root.findall("sm:url", NS)}
+
+
+def index_locs(body: bytes) -> list:
+    root = ElementTree.fromstring(body)
+    return [sitemap.findtext("sm:loc", namespaces=NS) for sitemap in root.findall("sm:sitemap", NS)]
+
+
+@pytest.fixture
+def sitemap_dir(tmp_path, monkeypatch):
+    import server
+    from generate_sitemap import SitemapStore
+
+    monkeypatch.setattr(server, "sitemap_store", SitemapStore(tmp_path))
+    return tmp_path
+
+
+def test_product_lastmod_comes_from_updated_at(db_session, tmp_path):
+    from database_sqlite import SQLProduct
+    from generate_sitemap import write_sitemaps
+
+    seed_catalog(db_session, 2, categories=1)
+    first, second = db_session.query(SQLProduct).order_by(SQLProduct.id).all()
+    first.updated_at = datetime(2024, 3, 1, 12, 30)
+    second.updated_at = datetime(2025, 1, 15, 8, 0)
+    db_session.commit()
+
+    write_sitemaps(tmp_path, base_url="https://example.com")
+    products = urls((tmp_path / "sitemap-products-1.xml").read_bytes())
+    assert products[f"https://example.com/product/{first.id}"].findtext("sm:lastmod", namespaces=NS) == "2024-03-01T12:30:00+00:00"
+    assert products[f"https://example.com/product/{second.id}"].findtext("sm:lastmod", namespaces=NS) == "2025-01-15T08:00:00+00:00"
+    pages = urls((tmp_path / "sitemap-pages-1.xml").read_bytes())
+    assert pages["https://example.com/about"].find("sm:lastmod", NS) is None
+
+
+def test_sections_are_split_at_url_limit(db_session, tmp_path):
+    from generate_sitemap import write_sitemaps
+
+    seed_catalog(db_session, 5, categories=2, images=2)
+    names = write_sitemaps(tmp_path, base_url="https://example.com", sitemap_url="https://example.com/maps", max_urls=2)
+    assert names == [
+        "sitemap.xml", "sitemap-pages-1.xml", "sitemap-pages-2.xml", "sitemap-pages-3.xml",
+        "sitemap-pages-4.xml", "sitemap-pages-5.xml", "sitemap-categories-1.xml",
+        "sitemap-products-1.xml", "sitemap-products-2.xml", "sitemap-products-3.xml",
+        "sitemap-images-1.xml", "sitemap-images-2.xml", "sitemap-images-3.xml",
+    ]
+    assert index_locs((tmp_path / "sitemap.xml").read_bytes()) == [f"https://example.com/maps/{name}" for name in names[1:]]
+    product_urls = [loc for name in names if "products" in name for loc in urls((tmp_path / name).read_bytes())]
+    assert len(product_urls) == len(set(product_urls)) == 5
+
+
+def test_sections_are_split_at_size_limit(db_session, tmp_path):
+    from generate_sitemap import SitemapWriter
+
+    writer = SitemapWriter(tmp_path, "products", max_bytes=600)
+    for i in range(10):
+        writer.add(f"https://example.com/product/{i}", datetime(2025, 1, 1), "weekly", "0.7")
+    files = writer.close()
+    assert len(files) > 1
+    for name, _ in files:
+        assert (tmp_path / name).stat().st_size <= 600
+    assert sum(len(urls((tmp_path / name).read_bytes())) for name, _ in files) == 10
+
+
+def test_image_sitemap_lists_product_images(db_session, tmp_path):
+    from database_sqlite import SQLProduct
+    from generate_sitemap import write_sitemaps
+
+    seed_catalog(db_session, 1, categories=1, images=3)
+    product = db_session.query(SQLProduct).one()
+    write_sitemaps(tmp_path, base_url="https://example.com")
+
+    entry = urls((tmp_path / "sitemap-images-1.xml").read_bytes())[f"https://example.com/product/{product.id}"]
+    images = [image.findtext("image:loc", namespaces=NS) for image in entry.findall("image:image", NS)]
+    assert images == [f"https://example.com/api/uploads/{product.id}-{i}.jpg" for i in range(3)]
+    assert entry.find("image:image/image:caption", NS).text.endswith("изображение 1")
+
+
+def test_sitemap_is_cached_per_catalog_version(client, db_session, sitemap_dir):
+    seed_catalog(db_session, 3, categories=1)
+
+    response = client.get("/api/sitemap.xml")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/xml"
+    children = index_locs(response.content)
+    assert all(loc.startswith("https://uniformfactory.ru/api/sitemaps/") for loc in children)
+
+    response = client.get("/api/sitemaps/sitemap-products-1.xml")
+    assert response.status_code == 200
+    assert len(urls(response.content)) == 3
+    builds = sorted(sitemap_dir.iterdir())
+    client.get("/api/sitemap.xml")
+    assert sorted(sitemap_dir.iterdir()) == builds
+
+    product_id = client.get("/api/products").json()[0]["id"]
+    client.delete(f"/api/admin/products/{product_id}")
+    response = client.get("/api/sitemaps/sitemap-products-1.xml")
+    assert f"/product/{product_id}" not in response.text
+    assert len(list(sitemap_dir.iterdir())) == 2  # the previous build is kept for in-flight responses
+
+    assert client.get("/api/sitemaps/sitemap-missing-1.xml").status_code == 404
+    assert client.get("/api/sitemaps/..%2Fsitemap.xml").status_code == 404
+
+
+def test_sitemap_revalidates_with_etag_and_last_modified(client, db_session, sitemap_dir):
+    seed_catalog(db_session, 1, categories=1)
+
+    for url in ("/api/sitemap.xml", "/api/sitemaps/sitemap-products-1.xml"):
+        response = client.get(url)
+        etag, last_modified = response.headers["etag"], response.headers["last-modified"]
+
+        assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+        response = client.get(url, headers={"If-Modified-Since": last_modified})
+        assert response.status_code == 304
+        assert response.headers["etag"] == etag
+        # A stale ETag wins over a matching date
+        response = client.get(url, headers={"If-None-Match": '"old"', "If-Modified-Since": last_modified})
+        assert response.status_code == 200
+        assert client.get(url, headers={"If-Modified-Since": "Mon, 01 Jan 2001 00:00:00 GMT"}).status_code == 200
+
+
+def test_child_sitemap_is_served_precompressed_and_revalidates(client, db_session, sitemap_dir):
+    seed_catalog(db_session, 20, categories=1)
+    url = "/api/sitemaps/sitemap-products-1.xml"
+
+    plain = client.get(url, headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert len(plain.content) > 1024  # large enough that the middleware would compress it
+
+    response = client.get(url, headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.content == plain.content
+    etag = response.headers["etag"]
+    assert etag != plain.headers["etag"]
+
+    assert client.get(url, headers={"Accept-Encoding": "gzip", "If-None-Match": etag}).status_code == 304
+    assert client.get(url, headers={"Accept-Encoding": "identity", "If-None-Match": etag}).status_code == 200
+    assert client.get(url, headers={"Accept-Encoding": "identity", "If-None-Match": plain.headers["etag"]}).status_code == 304
+
+
+def test_store_prunes_only_its_own_and_orphaned_builds(db_session, tmp_path):
+    from generate_sitemap import SitemapStore
+
+    seed_catalog(db_session, 1, categories=1)
+    orphan = tmp_path / "build-4194305-gone"  # above Linux pid_max: no such process
+    orphan.mkdir()
+    first_worker, second_worker = SitemapStore(tmp_path, grace=0), SitemapStore(tmp_path, grace=0)
+
+    served = first_worker.build()
+    for _ in range(3):
+        second_worker.build()
+    assert all(path.exists() for path in served.values())  # the other worker's build is left alone
+    assert not orphan.exists()
+    assert len(list(tmp_path.iterdir())) == 3  # first worker's build + second worker's last two
+
+
+def test_replaced_builds_outlive_the_grace_period(db_session, tmp_path, monkeypatch):
+    import generate_sitemap
+    from generate_sitemap import SitemapStore
+
+    now = [1000.0]
+    monkeypatch.setattr(generate_sitemap.time, "monotonic", lambda: now[0])
+    seed_catalog(db_session, 1, categories=1)
+    store = SitemapStore(tmp_path, keep=2, grace=60)
+
+    resolved = store.build()  # a request resolves these paths...
+    store.build()
+    store.build()  # ...and two quick rebuilds replace them
+    assert all(path.exists() for path in resolved.values())
+
+    now[0] += 61
+    latest = store.build()
+    assert not any(path.exists() for path in resolved.values())
+    assert len(list(tmp_path.iterdir())) == 2
+    assert all(path.exists() for path in latest.values())
@@ -0,0 +1,38 @@
+import sqlite3
+
+import pytest
+
+
+def test_pragma_profile_is_applied_to_pooled_connections(db_session):
+    from sqlalchemy import text
+
+    assert db_session.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+    assert db_session.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+    assert db_session.execute(text("PRAGMA temp_store")).scalar() == 2  # MEMORY
+    assert db_session.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+    assert db_session.execute(text("PRAGMA cache_size")).scalar() == -65536
+
+
+def test_pragma_profile_is_applied_to_async_engine(db_session):
+    from sqlalchemy import text
+    from tests.test_async_services import run
+
+    async def read_pragma():
+        from database_sqlite import get_async_engine
+
+        async with get_async_engine().connect() as connection:
+            return (await connection.execute(text("PRAGMA synchronous"))).scalar()
+
+    assert run(read_pragma()) == 1
+
+
+def test_empty_value_keeps_default_and_bad_value_is_rejected():
+    from database_sqlite import apply_sqlite_pragmas
+
+    connection = sqlite3.connect(":memory:")
+    apply_sqlite_pragmas(connection, {"synchronous": "", "cache_size": "-1024"})
+    assert connection.execute("PRAGMA synchronous").fetchone()[0] == 2  # FULL
+    assert connection.execute("PRAGMA cache_size").fetchone()[0] == -1024
+
+    with pytest.raises(ValueError):
+        apply_sqlite_pragmas(connection, {"cache_size": "1; DROP TABLE products"})
@@ -0,0 +1,147 @@
+import asyncio
+import hashlib
+import os
+from pathlib import Path
+
+import pytest
+
+BODY = bytes(range(256)) * 40  # 10 KiB
+
+
+@pytest.fixture
+def upload(client):
+    """A legacy (uuid-named) upload, with a clean stat cache"""
+    from static_files import stat_cache
+
+    stat_cache.invalidate()
+    Path("uploads").mkdir(exist_ok=True)
+    path = Path("uploads") / "static-test.jpg"
+    path.write_bytes(BODY)
+    yield "/api/uploads/static-test.jpg"
+    stat_cache.invalidate()
+
+
+def test_content_hash_etag_and_conditional_requests(client, upload):
+    response = client.get(upload)
+    assert response.status_code == 200
+    assert response.content == BODY
+    etag = response.headers["etag"]
+    assert etag == f'"{hashlib.sha256(BODY).hexdigest()}"'
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.headers["cache-control"] == "public, max-age=31536000"
+
+    response = client.get(upload, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+    assert response.headers["access-control-allow-origin"] == "*"
+
+    last_modified = response.headers["last-modified"]
+    assert client.get(upload, headers={"If-Modified-Since": last_modified}).status_code == 304
+    assert client.get(upload, headers={"If-None-Match": '"other"', "If-Modified-Since": last_modified}).status_code == 200
+
+
+def test_content_addressed_upload_uses_name_as_etag(client):
+    digest = hashlib.sha256(b"x").hexdigest()
+    Path("uploads").mkdir(exist_ok=True)
+    (Path("uploads") / f"{digest}.png").write_bytes(b"x")
+    assert client.get(f"/api/uploads/{digest}.png").headers["etag"] == f'"{digest}"'
+
+
+@pytest.mark.parametrize("header, status, expected", [
+    ("bytes=0-9", 206, BODY[:10]),
+    ("bytes=10230-", 206, BODY[10230:]),
+    ("bytes=-5", 206, BODY[-5:]),
+    ("bytes=100-999999", 206, BODY[100:]),
+    ("bytes=0-1,5-6", 200, BODY),  # multiple ranges: whole file
+    ("items=0-1", 200, BODY),
+])
+def test_range_requests(client, upload, header, status, expected):
+    response = client.get(upload, headers={"Range": header})
+    assert response.status_code == status
+    assert response.content == expected
+    if status == 206:
+        start = len(BODY) - len(expected)
+        if header == "bytes=0-9":
+            start = 0
+        assert response.headers["content-range"] == f"bytes {start}-{start + len(expected) - 1}/{len(BODY)}"
+        assert response.headers["content-length"] == str(len(expected))
+
+
+def test_unsatisfiable_and_stale_if_range(client, upload):
+    response = client.get(upload, headers={"Range": f"bytes={len(BODY)}-"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(BODY)}"
+
+    etag = client.get(upload).headers["etag"]
+    assert client.get(upload, headers={"Range": "bytes=0-3", "If-Range": etag}).status_code == 206
+    response = client.get(upload, headers={"Range": "bytes=0-3", "If-Range": '"stale"'})
+    assert response.status_code == 200
+    assert response.content == BODY
+
+
+def test_pathsend_is_used_when_the_server_offers_it(client, upload):
+    from server import app
+
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": upload, "raw_path": upload.encode(), "query_string": b"",
+        "root_path": "", "headers": [(b"host", b"testserver"), (b"accept-encoding", b"gzip")],
+        "client": ("127.0.0.1", 1234), "server": ("testserver", 80),
+        "extensions": {"http.response.pathsend": {}},
+    }
+    asyncio.run(app(scope, receive, send))
+    assert [message["type"] for message in messages] == ["http.response.start", "http.response.pathsend"]
+    assert messages[0]["status"] == 200
+    assert messages[1]["path"].endswith("static-test.jpg")
+
+
+def test_stat_cache_revalidates_changed_files(tmp_path):
+    from static_files import StatCache
+
+    path = tmp_path / "photo.jpg"
+    path.write_bytes(b"one")
+    cache = StatCache(ttl=60)
+    first = cache.stat(path)
+    assert cache.cached(path) is first
+
+    path.write_bytes(b"two!")
+    os.utime(path, (first.mtime + 5, first.mtime + 5))
+    assert cache.cached(path) is first  # trusted within the TTL
+    cache.ttl = 0
+    assert cache.cached(path) is None
+    second = cache.stat(path)
+    assert second.size == 4 and second.etag != first.etag
+
+    path.unlink()
+    assert cache.stat(path) is None
+
+
+def test_admin_uploads_share_the_handler(client, upload):
+    response = client.get("/api/admin/uploads/static-test.jpg", headers={"Range": "bytes=0-0"})
+    assert response.status_code == 206
+    assert response.content == BODY[:1]
+    assert response.headers["cache-control"] == "public, max-age=31536000"
+    etag = response.headers["etag"]
+    assert client.get("/api/admin/uploads/static-test.jpg", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/api/admin/uploads/missing.jpg").status_code == 404
+
+
+@pytest.mark.parametrize("url", ["/api/uploads/static-test.jpg", "/api/admin/uploads/static-test.jpg"])
+def test_head_sends_headers_without_body(client, upload, url):
+    etag = client.get(url).headers["etag"]
+    response = client.head(url)
+    assert response.status_code == 200
+    assert response.content == b""
+    assert response.headers["content-length"] == str(len(BODY))
+    assert response.headers["etag"] == etag
+    assert client.head(url, headers={"If-None-Match": etag}).status_code == 304
+    assert client.head("/api/uploads/missing.jpg").status_code == 404
@@ -0,0 +1,144 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+
+class FakeBotApi:
+    """Local stand-in for the Bot API: records sendMessage calls, replays queued error responses"""
+
+    def __init__(self):
+        self.messages = []  # (arrival time, payload)
+        self.responses = []  # (status, body) served before the default 200
+        self.lock = threading.Lock()
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with api.lock:
+                    api.messages.append((time.monotonic(), payload))
+                    status, body = api.responses.pop(0) if api.responses else (200, {"ok": True, "result": {}})
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def rate_limit_once(self, retry_after: float):
+        self.responses.append((429, {"ok": False, "error_code": 429, "parameters": {"retry_after": retry_after}}))
+
+    @property
+    def texts(self):
+        return [payload["text"] for _, payload in self.messages]
+
+
+@pytest.fixture
+def bot_api():
+    api = FakeBotApi()
+    threading.Thread(target=api.server.serve_forever, args=(0.05,), daemon=True).start()
+    try:
+        yield api
+    finally:
+        api.server.shutdown()
+        api.server.server_close()
+
+
+def make_client(bot_api, **kwargs):
+    from telegram_service import TelegramClient
+
+    options = {"chat_interval": 0, "coalesce_window": 0}
+    options.update(kwargs)
+    return TelegramClient(token="TEST", chat_id="42", api_url=bot_api.url, **options)
+
+
+def run(client, make_coro):
+    async def main():
+        try:
+            return await make_coro()
+        finally:
+            await client.close()
+    return asyncio.run(main())
+
+
+def test_burst_is_coalesced_into_one_digest(bot_api):
+    client = make_client(bot_api, coalesce_window=0.1)
+    results = run(client, lambda: asyncio.gather(*(client.notify(f"lead {i}") for i in range(5))))
+    assert results == [True] * 5
+    assert len(bot_api.messages) == 1
+    digest = bot_api.texts[0]
+    assert digest.startswith("📬 <b>Новые заявки: 5</b>")
+    positions = [digest.index(f"lead {i}") for i in range(5)]
+    assert positions == sorted(positions)
+
+
+def test_single_notification_is_sent_as_is(bot_api):
+    client = make_client(bot_api, coalesce_window=0.05)
+    assert run(client, lambda: client.notify("only lead")) is True
+    assert bot_api.texts == ["only lead"]
+
+
+def test_digests_respect_message_length_limit():
+    from telegram_service import TELEGRAM_MESSAGE_LIMIT, TelegramClient
+
+    texts = [f"{i}" + "x" * 1500 for i in range(7)]
+    digests = TelegramClient.build_digests(texts)
+    assert sum(count for _, count in digests) == 7
+    assert all(len(text) <= TELEGRAM_MESSAGE_LIMIT for text, _ in digests)
+    assert len(digests) == 4
+
+
+def test_messages_to_one_chat_are_paced(bot_api):
+    client = make_client(bot_api, chat_interval=0.2)
+    results = run(client, lambda: asyncio.gather(*(client.send_message(f"m{i}") for i in range(3))))
+    assert results == [True] * 3
+    times = [arrived for arrived, _ in bot_api.messages]
+    assert all(later - earlier >= 0.19 for earlier, later in zip(times, times[1:]))
+
+
+def test_retry_after_is_honoured(bot_api):
+    bot_api.rate_limit_once(0.3)
+    client = make_client(bot_api)
+    assert run(client, lambda: client.send_message("hello")) is True
+    (first, _), (second, _) = bot_api.messages
+    assert second - first >= 0.29
+
+
+def test_long_retry_after_fails_for_outbox_retry(bot_api):
+    bot_api.rate_limit_once(120)
+    client = make_client(bot_api, max_retry_after=30)
+    started = time.monotonic()
+    assert run(client, lambda: client.send_message("hello")) is False
+    assert time.monotonic() - started < 5
+    assert len(bot_api.messages) == 1
+
+
+def test_outbox_burst_becomes_one_telegram_message(db_session, bot_api, monkeypatch):
+    import telegram_service
+    from notification_outbox import OutboxDispatcher, enqueue_notifications
+
+    monkeypatch.setattr(telegram_service, "TELEGRAM_BOT_TOKEN", "TEST")
+    monkeypatch.setattr(telegram_service, "TELEGRAM_CHAT_ID", "42")
+    monkeypatch.delenv("SENDER_EMAIL", raising=False)
+    client = make_client(bot_api, coalesce_window=0.1)
+    monkeypatch.setattr(telegram_service, "telegram_client", client)
+
+    for i in range(4):
+        enqueue_notifications(db_session, "callback_request", {"name": f"Client {i}", "phone": "+7"})
+    db_session.commit()
+
+    assert run(client, lambda: OutboxDispatcher(concurrency=1).dispatch_due()) == 4
+    assert len(bot_api.messages) == 1
+    assert "Новые заявки: 4" in bot_api.texts[0]
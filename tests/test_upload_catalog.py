@@ -0,0 +1,99 @@
+import hashlib
+import io
+import os
+from concurrent.futures import Future
+from pathlib import Path
+
+from PIL import Image
+
+
+def png_bytes(size) -> bytes:
+    buffer = io.BytesIO()
+    Image.effect_noise(size, 64).convert("RGB").save(buffer, "PNG")  # noise: stays above MIN_LISTED_SIZE
+    return buffer.getvalue()
+
+
+def upload(client, body, name="photo.png"):
+    return client.post("/api/admin/upload-image", files={"file": (name, body, "image/png")}).json()
+
+
+def test_uploads_are_catalogued_and_listed_with_usage(client, monkeypatch):
+    from image_variants import image_pipeline
+
+    monkeypatch.setattr(image_pipeline, "submit", lambda path: None)
+    small, large = png_bytes((40, 30)), png_bytes((120, 90))
+    small_url = upload(client, small)["url"]
+    large_url = upload(client, large)["url"]
+    client.post("/api/admin/categories", data={
+        "title": "Кители", "description": "d", "products_count": 0, "slug": "kiteli", "image": small_url
+    })
+
+    listing = client.get("/api/admin/uploaded-files").json()
+    assert (listing["total"], listing["total_size"]) == (2, len(small) + len(large))
+    files = {file["url"]: file for file in listing["files"]}
+    assert (files[small_url]["width"], files[small_url]["height"]) == (40, 30)
+    assert files[large_url]["hash"] == hashlib.sha256(large).hexdigest()
+    assert (files[small_url]["usage_count"], files[large_url]["usage_count"]) == (1, 0)
+
+    by_size = client.get("/api/admin/uploaded-files?sort=size&order=asc&per_page=1").json()
+    assert [file["url"] for file in by_size["files"]] == [small_url]
+    assert client.get("/api/admin/uploaded-files?sort=size&order=asc&per_page=1&page=2").json()["files"][0]["url"] == large_url
+    assert client.get("/api/admin/uploaded-files?sort=usage").json()["files"][0]["url"] == small_url
+    assert client.get("/api/admin/uploaded-files?sort=mtime").status_code == 422
+
+    filename = large_url.rsplit("/", 1)[1]
+    assert client.delete(f"/api/admin/uploaded-files/{filename}").status_code == 200
+    assert client.get("/api/admin/uploaded-files").json()["total"] == 1
+
+
+def test_finished_variants_are_recorded(client, db_session, monkeypatch):
+    from database_sqlite import UploadedFile
+    from image_variants import image_pipeline
+    from upload_catalog import variants_done
+
+    futures = []
+
+    def submit(path):
+        futures.append(Future())
+        return futures[-1]
+
+    monkeypatch.setattr(image_pipeline, "submit", submit)
+    filename = upload(client, png_bytes((64, 64)))["url"].rsplit("/", 1)[1]
+    assert db_session.get(UploadedFile, filename).variants is None
+
+    futures[0].set_result({"widths": [64], "formats": ["webp", "jpeg"]})  # runs variants_done
+    db_session.expire_all()
+    listed = client.get("/api/admin/uploaded-files").json()["files"][0]
+    assert listed["variants"] == {"widths": [64], "formats": ["webp", "jpeg"]}
+
+    failed = Future()
+    failed.set_exception(RuntimeError("encoder crashed"))
+    variants_done(filename, failed)  # ignored, the pipeline logs it
+
+
+def test_reconcile_rebuilds_catalog_from_disk(db_session, tmp_path):
+    from database_sqlite import UploadedFile
+    from upload_catalog import reconcile
+
+    for name, size in (("a.jpg", (30, 20)), ("b.png", (50, 50))):
+        Image.new("RGB", size).save(tmp_path / name)
+    (tmp_path / ".upload-partial").write_bytes(b"x")
+    (tmp_path / "notes.txt").write_bytes(b"x")
+    (tmp_path / "variants").mkdir()
+    (tmp_path / "variants" / "a-320w.webp").write_bytes(b"x")
+
+    assert tuple(reconcile(db_session, tmp_path)) == (2, 0, 0, 0)
+    row = db_session.get(UploadedFile, "a.jpg")
+    assert (row.width, row.height) == (30, 20)
+    assert row.content_hash == hashlib.sha256((tmp_path / "a.jpg").read_bytes()).hexdigest()
+
+    Image.new("RGB", (10, 10)).save(tmp_path / "a.jpg")
+    os.utime(tmp_path / "a.jpg", (row.modified + 10, row.modified + 10))
+    (tmp_path / "b.png").unlink()
+    Image.new("RGB", (5, 5)).save(tmp_path / "c.webp")
+    assert tuple(reconcile(db_session, tmp_path)) == (1, 1, 1, 0)
+    assert db_session.get(UploadedFile, "a.jpg").width == 10
+    assert sorted(name for (name,) in db_session.query(UploadedFile.filename)) == ["a.jpg", "c.webp"]
+
+    assert tuple(reconcile(db_session, tmp_path)) == (0, 0, 0, 2)
+    assert tuple(reconcile(db_session, Path(tmp_path / "missing"))) == (0, 0, 2, 0)
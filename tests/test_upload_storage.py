@@ -0,0 +1,120 @@
+import hashlib
+import io
+import os
+import time
+
+from PIL import Image
+
+from tests.factories import seed_catalog
+
+
+def jpeg_bytes(color=(10, 120, 200)) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 48), color).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+def test_store_upload_names_files_by_content(tmp_path, monkeypatch):
+    import upload_storage
+    from upload_storage import store_upload
+
+    monkeypatch.setattr(upload_storage, "UPLOAD_CHUNK_SIZE", 100)  # hash across many chunks
+    body = jpeg_bytes()
+    first = store_upload(io.BytesIO(body), "JPEG", tmp_path)
+    second = store_upload(io.BytesIO(body), "jpg", tmp_path)
+
+    assert first.filename == f"{hashlib.sha256(body).hexdigest()}.jpg"
+    assert (first.created, second.created) == (True, False)
+    assert second.filename == first.filename and second.size == len(body)
+    assert [path.name for path in tmp_path.iterdir()] == [first.filename]
+    assert first.path.read_bytes() == body
+
+
+def test_duplicate_upload_returns_existing_url(client, monkeypatch):
+    from image_variants import image_pipeline
+
+    submitted = []
+    monkeypatch.setattr(image_pipeline, "submit", submitted.append)
+    body = jpeg_bytes((1, 2, 3))
+    responses = [
+        client.post("/api/admin/upload-image", files={"file": (name, body, "image/jpeg")}).json()
+        for name in ("front.jpg", "front-copy.jpeg")
+    ]
+    assert responses[0]["url"] == responses[1]["url"] == f"/api/uploads/{hashlib.sha256(body).hexdigest()}.jpg"
+    assert [response["duplicate"] for response in responses] == [False, True]
+    assert len(submitted) == 1  # variants are encoded once
+
+
+def reference_rows(db_session):
+    from database_sqlite import UploadReference
+
+    db_session.expire_all()
+    return sorted(
+        (row.filename, row.owner_type) for row in db_session.query(UploadReference).all()
+    )
+
+
+def test_admin_writes_maintain_references(client, db_session):
+    category_id = client.post("/api/admin/categories", data={
+        "title": "Кители", "description": "d", "products_count": 0, "slug": "kiteli",
+        "image": "/api/uploads/cat.jpg"
+    }).json()["id"]
+    assert reference_rows(db_session) == [("cat.jpg", "category")]
+
+    product = {
+        "category_id": category_id, "name": "Китель", "description": "d", "price_from": 1000,
+        "images": ["/api/uploads/a.jpg", "https://uniformfactory.ru/api/uploads/b.jpg?w=640"],
+    }
+    product_id = client.post("/api/admin/products", json=product).json()["product_id"]
+    assert reference_rows(db_session) == [("a.jpg", "product"), ("b.jpg", "product"), ("cat.jpg", "category")]
+
+    product["images"] = ["/api/uploads/c.jpg"]
+    product["color_images"] = [{"color": "белый", "image": "/api/uploads/white.jpg", "preview": "/api/uploads/c.jpg"}]
+    assert client.put(f"/api/admin/products/{product_id}", json=product).status_code == 200
+    assert reference_rows(db_session) == [("c.jpg", "product"), ("cat.jpg", "category"), ("white.jpg", "product")]
+
+    product["color_images"] = []
+    client.put(f"/api/admin/products/{product_id}", json=product)
+    assert reference_rows(db_session) == [("c.jpg", "product"), ("cat.jpg", "category")]
+
+    client.put("/api/admin/settings", data={"about_image": "/api/uploads/c.jpg"})
+    assert reference_rows(db_session) == [("c.jpg", "product"), ("c.jpg", "settings"), ("cat.jpg", "category")]
+
+    client.delete(f"/api/admin/products/{product_id}")
+    client.delete(f"/api/admin/categories/{category_id}")
+    assert reference_rows(db_session) == [("c.jpg", "settings")]
+
+
+def test_referenced_file_is_not_deleted_without_force(client, db_session):
+    from pathlib import Path
+
+    Path("uploads").mkdir(exist_ok=True)
+    Path("uploads/in-use.jpg").write_bytes(jpeg_bytes())
+    client.post("/api/admin/portfolio", data={
+        "company": "ООО", "description": "d", "category": "c", "items_count": 1, "year": 2025,
+        "image": "/api/uploads/in-use.jpg"
+    })
+
+    response = client.delete("/api/admin/uploaded-files/in-use.jpg")
+    assert response.status_code == 409
+    assert response.json()["detail"]["references"][0]["owner_type"] == "portfolio"
+    assert client.delete("/api/admin/uploaded-files/in-use.jpg?force=true").status_code == 200
+    assert not Path("uploads/in-use.jpg").exists()
+
+
+def test_garbage_collection_keeps_referenced_and_recent_files(db_session, tmp_path):
+    from database_sqlite import SQLProductImage
+    from upload_storage import collect_garbage
+
+    seed_catalog(db_session, 1, categories=1, images=1)
+    used = db_session.query(SQLProductImage).one().image_url.rsplit("/", 1)[1]
+    old = time.time() - 3 * 24 * 3600
+    for name in (used, "orphan.jpg", ".upload-crashed"):
+        (tmp_path / name).write_bytes(b"x")
+        os.utime(tmp_path / name, (old, old))
+    (tmp_path / "fresh.jpg").write_bytes(b"x")
+
+    assert collect_garbage(tmp_path, grace=3600, dry_run=True) == [".upload-crashed", "orphan.jpg"]
+    assert (tmp_path / "orphan.jpg").exists()
+    assert collect_garbage(tmp_path, grace=3600) == [".upload-crashed", "orphan.jpg"]
+    assert sorted(path.name for path in tmp_path.iterdir()) == sorted([used, "fresh.jpg"])
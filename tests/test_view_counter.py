@@ -0,0 +1,87 @@
+from tests.factories import seed_catalog
+
+
+def _views(db, product_id):
+    from database_sqlite import SQLProduct
+
+    db.expire_all()
+    return db.query(SQLProduct).filter(SQLProduct.id == product_id).one().views_count
+
+
+def test_buffered_views_are_written_in_one_batch(db_session):
+    from database_sqlite import SQLProduct
+    from view_counter import ViewCounter
+    from tests.test_product_queries import count_queries
+
+    seed_catalog(db_session, 2, categories=1)
+    first, second = [p.id for p in db_session.query(SQLProduct).order_by(SQLProduct.article)]
+
+    counter = ViewCounter(flush_threshold=1000, dedup_window=0)
+    for _ in range(3):
+        counter.record(first)
+    counter.record(second)
+    assert _views(db_session, first) == 0
+
+    with count_queries() as queries:
+        assert counter.flush() == 4
+    assert len([q for q in queries if q.lstrip().upper().startswith("UPDATE")]) == 1
+    assert _views(db_session, first) == 3
+    assert _views(db_session, second) == 1
+    assert counter.flush() == 0
+
+
+def test_threshold_triggers_flush_and_failed_flush_keeps_views():
+    from view_counter import ViewCounter
+
+    written = []
+    counter = ViewCounter(flush_threshold=3, dedup_window=0, writer=written.append)
+    counter.record("a")
+    counter.record("b")
+    assert written == []
+    counter.record("a")
+    assert written == [{"a": 2, "b": 1}]
+
+    def failing_writer(counts):
+        raise RuntimeError("database is locked")
+
+    counter = ViewCounter(flush_threshold=100, dedup_window=0, writer=failing_writer)
+    counter.record("a")
+    assert counter.flush() == 0
+    counter._writer = written.append
+    assert counter.flush() == 1
+    assert written[-1] == {"a": 1}
+
+
+def test_repeat_views_from_same_ip_are_deduplicated(monkeypatch):
+    import view_counter
+    from view_counter import ViewCounter
+
+    now = [1000.0]
+    monkeypatch.setattr(view_counter.time, "monotonic", lambda: now[0])
+
+    written = []
+    counter = ViewCounter(flush_threshold=100, dedup_window=60, writer=written.append)
+    assert counter.record("a", "10.0.0.1")
+    assert not counter.record("a", "10.0.0.1")
+    assert counter.record("a", "10.0.0.2")
+    assert counter.record("b", "10.0.0.1")
+
+    now[0] += 61
+    assert counter.record("a", "10.0.0.1")
+    counter.flush()
+    assert written == [{"a": 3, "b": 1}]
+
+
+def test_product_page_view_is_buffered(client, db_session):
+    from view_counter import view_counter
+
+    seed_catalog(db_session, 1, categories=1)
+    product_id = client.get("/api/products").json()[0]["id"]
+    view_counter.flush()
+
+    response = client.get(f"/api/products/{product_id}")
+    assert response.status_code == 200
+    assert _views(db_session, product_id) == 0
+
+    view_counter.flush()
+    assert _views(db_session, product_id) == 1
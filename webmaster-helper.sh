@@ -42,15 +42,23 @@ create_google_verification() {
     echo "📍 URL: https://uniformfactory.ru/$filename"
 }
 
+# Количество страниц во всех дочерних sitemap (image-sitemap повторяет страницы товаров)
+count_sitemap_urls() {
+    ls /app/frontend/public/sitemap-*.xml 2>/dev/null | grep -v -- '-images-' | xargs -r cat | grep -c '<url>'
+}
+
 # Функция для обновления sitemap
 update_sitemap() {
     echo "🔄 Обновление sitemap.xml..."
     cd /app/backend
     python generate_sitemap.py
-    cp sitemap.xml /app/frontend/public/sitemap.xml
+    # sitemap.xml is an index: the child sitemaps it lists are published next to it
+    rm -f /app/frontend/public/sitemap-*.xml
+    cp sitemap.xml sitemap-*.xml /app/frontend/public/
     echo "✅ Sitemap обновлен"
     echo "📍 URL: https://uniformfactory.ru/sitemap.xml"
-    echo "📍 Количество URL: $(grep -c '<url>' /app/frontend/public/sitemap.xml)"
+    echo "📍 Дочерних sitemap: $(grep -c '<sitemap>' /app/frontend/public/sitemap.xml)"
+    echo "📍 Количество URL: $(count_sitemap_urls)"
 }
 
 # Функция для проверки файлов
@@ -65,7 +73,7 @@ check_files() {
     fi
     
     if [ -f "/app/frontend/public/sitemap.xml" ]; then
-        echo "✅ sitemap.xml найден ($(grep -c '<url>' /app/frontend/public/sitemap.xml) URLs)"
+        echo "✅ sitemap.xml найден ($(grep -c '<sitemap>' /app/frontend/public/sitemap.xml) дочерних sitemap, $(count_sitemap_urls) URLs)"
     else
         echo "❌ sitemap.xml не найден"
     fi